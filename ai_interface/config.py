@@ -1 +1,40 @@
+import os
+
+
 key = open("secrets/openai_secret.txt", "r").read()
+
+# upper bound for simultaneous requests to OpenAI from the async interface
+max_concurrent_requests = int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "10"))
+
+# persistent cache of successful initial meal estimates
+estimate_cache_enabled = os.getenv("AI_ESTIMATE_CACHE_ENABLED", "true").lower() == "true"
+estimate_cache_ttl_hours = float(os.getenv("AI_ESTIMATE_CACHE_TTL_HOURS", str(24 * 30)))
+estimate_cache_max_entries = int(os.getenv("AI_ESTIMATE_CACHE_MAX_ENTRIES", "10000"))
+
+# images are sent with "low" detail, the model receives at most 512x512 pixels
+image_max_side = 512
+image_jpeg_quality = int(os.getenv("AI_IMAGE_JPEG_QUALITY", "85"))
+
+# OPENAI_BASE_URL allows pointing the clients to a different server, e.g. a local fake API
+base_url = os.getenv("OPENAI_BASE_URL") or None
+
+# time limit of one request attempt and of all attempts of one request together
+request_timeout_seconds = float(os.getenv("OPENAI_REQUEST_TIMEOUT_SECONDS", "30"))
+request_deadline_seconds = float(os.getenv("OPENAI_REQUEST_DEADLINE_SECONDS", "60"))
+
+# rate limit, server and connection errors are retried with jittered exponential backoff
+max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+retry_base_delay_seconds = float(os.getenv("OPENAI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+retry_max_delay_seconds = float(os.getenv("OPENAI_RETRY_MAX_DELAY_SECONDS", "8"))
+
+# the circuit breaker rejects requests for breaker_open_seconds
+# when at least breaker_failure_rate of the last breaker_window_size attempts failed
+breaker_window_size = int(os.getenv("OPENAI_BREAKER_WINDOW_SIZE", "20"))
+breaker_min_attempts = int(os.getenv("OPENAI_BREAKER_MIN_ATTEMPTS", "5"))
+breaker_failure_rate = float(os.getenv("OPENAI_BREAKER_FAILURE_RATE", "0.5"))
+breaker_open_seconds = float(os.getenv("OPENAI_BREAKER_OPEN_SECONDS", "30"))
+
+# clarification requests resend a compacted history:
+# the system prompt, the original request, the last corrections and the latest estimate
+history_max_corrections = int(os.getenv("OPENAI_HISTORY_MAX_CORRECTIONS", "3"))
+history_token_budget = int(os.getenv("OPENAI_HISTORY_TOKEN_BUDGET", "2000"))
@@ -0,0 +1,21 @@
+from PIL import Image, ImageOps
+from ai_interface import config
+import io
+
+
+def downscale_to_jpeg(image_bytes, max_side=None, quality=None):
+    # the model does not see more than max_side pixels in low detail mode,
+    # larger images only increase the upload size
+    if max_side is None:
+        max_side = config.image_max_side
+    if quality is None:
+        quality = config.image_jpeg_quality
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # phone cameras often store rotation in EXIF instead of rotating pixels
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        with io.BytesIO() as bytes_io:
+            image.save(bytes_io, format="JPEG", quality=quality, optimize=True)
+            return bytes_io.getvalue()
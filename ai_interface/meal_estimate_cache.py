@@ -0,0 +1,155 @@
+from PIL import Image
+import asyncio
+import base64
+import datetime
+import hashlib
+import io
+import logging
+import re
+import threading
+import unicodedata
+
+from ai_interface import config
+from database import common_sql
+from database.select import select_ai_cache
+from database.update import update_ai_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
+
+
+counters = CacheCounters()
+
+
+def get_cache_counters():
+    return counters.as_dict()
+
+
+def normalize_description(description):
+    if description is None:
+        return ""
+    description = unicodedata.normalize("NFKC", description).casefold()
+    description = re.sub(r"\s+", " ", description)
+    return description.strip(" .,;!?")
+
+
+def get_image_dhash(image_data):
+    # difference hash: similar images (e.g. the same photo re-sent or re-compressed)
+    # produce the same 64-bit value
+    if image_data is None:
+        return ""
+    image_bytes = base64.b64decode(image_data.image_b64_string)
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+        pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def get_cache_key(description, image_data, request_version):
+    key_source = "\n".join([
+        request_version,
+        normalize_description(description),
+        get_image_dhash(image_data)
+    ])
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+def get_expiration_datetime():
+    return (
+        datetime.datetime.now(datetime.UTC) -
+        datetime.timedelta(hours=config.estimate_cache_ttl_hours)
+    )
+
+
+async def get_cache_key_async(description, image_data, request_version):
+    if image_data is None:
+        return get_cache_key(description, image_data, request_version)
+    # image decoding is CPU work, keep it off the event loop
+    return await asyncio.to_thread(get_cache_key, description, image_data, request_version)
+
+
+def get_cached_meal_data_json_in_session(session, cache_key):
+    entry = select_ai_cache.select_ai_meal_estimate(
+        session, cache_key, get_expiration_datetime()
+    )
+    if entry is None:
+        counters.increment("misses")
+        logger.info(f"meal estimates cache miss, counters {get_cache_counters()}")
+        return None
+
+    update_ai_cache.record_ai_meal_estimate_hit(session, entry.id)
+    counters.increment("hits")
+    logger.info(f"meal estimates cache hit, counters {get_cache_counters()}")
+    return entry.meal_data_json
+
+
+def add_meal_data_json_in_session(session, cache_key, meal_data_json):
+    update_ai_cache.add_ai_meal_estimate(session, cache_key, meal_data_json)
+    update_ai_cache.evict_ai_meal_estimates(
+        session, get_expiration_datetime(), config.estimate_cache_max_entries
+    )
+
+
+def get_cached_meal_data_json(cache_key):
+    try:
+        with common_sql.get_session() as session:
+            return get_cached_meal_data_json_in_session(session, cache_key)
+    except Exception as e:
+        return on_cache_error(e)
+
+
+async def get_cached_meal_data_json_async(cache_key):
+    try:
+        return await common_sql.run_in_session(get_cached_meal_data_json_in_session, cache_key)
+    except Exception as e:
+        return on_cache_error(e)
+
+
+def add_meal_data_json(cache_key, meal_data_json):
+    try:
+        with common_sql.get_session() as session:
+            add_meal_data_json_in_session(session, cache_key, meal_data_json)
+    except Exception as e:
+        on_cache_error(e)
+
+
+async def add_meal_data_json_async(cache_key, meal_data_json):
+    try:
+        await common_sql.run_in_session(add_meal_data_json_in_session, cache_key, meal_data_json)
+    except Exception as e:
+        on_cache_error(e)
+
+
+def on_cache_error(e):
+    # the cache is an optimization, estimates are requested from the API when it fails
+    counters.increment("errors")
+    logger.exception(e)
+    return None
@@ -1,16 +1,31 @@
 from pydantic import BaseModel
-from openai import OpenAI, OpenAIError
+from pydantic.json_schema import SkipJsonSchema
+from openai import OpenAI, AsyncOpenAI, OpenAIError
+import asyncio
 import base64
-from ai_interface import config
+from ai_interface import config, meal_estimate_cache, request_policy
 import logging
-import copy
+import hashlib
+import json
 from pathlib import Path
 
 from database.food_database_model import MealEaten
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=config.key)
+# retries are made by request_policy, the client's own retries are disabled
+client = OpenAI(
+    api_key=config.key, base_url=config.base_url,
+    timeout=config.request_timeout_seconds, max_retries=0
+)
+async_client = AsyncOpenAI(
+    api_key=config.key, base_url=config.base_url,
+    timeout=config.request_timeout_seconds, max_retries=0
+)
+
+# limits the number of simultaneous requests made through the async interface
+# extra requests wait for a free slot without blocking the event loop
+async_request_semaphore = asyncio.Semaphore(config.max_concurrent_requests)
 
 
 model = "gpt-4o"
@@ -75,6 +90,44 @@ class MealDataOutput(BaseModel):
         )
 
 
+ingredients_system_prompt = (
+    "You are a nutrition analysis assistant. "
+    "The user provides a list of ingredients of one meal in a single message. "
+    "Make a separate entry for each ingredient, in the order of the list. "
+    "Give each ingredient a short name. "
+    "Give one sentence for a simple, concise ingredient description. "
+    "Make a reasonable estimation for the nutrition value of each ingredient. "
+    "When the amount of an ingredient is not given, assume a typical serving. "
+    "Use grams for the protein, fat, carbohydrate values. "
+    "Use kcal for the calories energy value. "
+    "Use grams for the total weight. "
+    "Set the success flag of each ingredient and of the whole output to true. "
+    "\n"
+    "In case of an error, return an empty list of ingredients, "
+    "set the success flag to false, and fill the error_message field. "
+    "Potential errors: "
+    "the message is not a list of food items, "
+    "the request does not make sense, "
+    "other errors. "
+)
+
+
+class IngredientsDataOutput(BaseModel):
+    ingredients: list[MealDataOutput]
+    success_flag: bool
+    error_message: str
+    # set when the request is rejected by the circuit breaker,
+    # not a part of the response format sent to the model
+    ai_unavailable: SkipJsonSchema[bool] = False
+
+    @staticmethod
+    def default(success_flag=False, error_message="", ai_unavailable=False):
+        return IngredientsDataOutput(
+            ingredients=[], success_flag=success_flag, error_message=error_message,
+            ai_unavailable=ai_unavailable
+        )
+
+
 class ImageData(BaseModel):
     image_b64_string: str
     extension: str
@@ -105,6 +158,17 @@ class ImageData(BaseModel):
 class AiResponse(BaseModel):
     meal_data: MealDataOutput
     message_list: list
+    # requests are rejected without being sent while the circuit breaker is open
+    ai_unavailable: bool = False
+
+
+# part of the estimates cache key, changes together with the model, the prompt or the output format
+estimate_request_version = hashlib.sha256(
+    "\n".join([
+        model, system_prompt,
+        json.dumps(MealDataOutput.model_json_schema(), sort_keys=True)
+    ]).encode("utf-8")
+).hexdigest()
 
 
 def get_initial_messages(description=None, image_data=None):
@@ -162,17 +226,149 @@ def get_assistant_message_from_eaten_meal(meal_obj: MealEaten):
     return data_message
 
 def get_meal_estimate(description=None, image_data=None):
+    messages = get_meal_estimate_messages(description, image_data)
+    if not config.estimate_cache_enabled:
+        return get_ai_response(messages)
+
+    cache_key = meal_estimate_cache.get_cache_key(
+        description, image_data, estimate_request_version
+    )
+    meal_data_json = meal_estimate_cache.get_cached_meal_data_json(cache_key)
+    if meal_data_json is not None:
+        return get_ai_response_from_cached_json(meal_data_json, messages)
+
+    ai_response = get_ai_response(messages)
+    if ai_response.meal_data.success_flag:
+        meal_estimate_cache.add_meal_data_json(
+            cache_key, ai_response.meal_data.model_dump_json()
+        )
+    return ai_response
+
+
+async def get_meal_estimate_async(description=None, image_data=None, on_partial=None):
+    messages = get_meal_estimate_messages(description, image_data)
+    if not config.estimate_cache_enabled:
+        return await get_ai_response_async(messages, on_partial)
+
+    cache_key = await meal_estimate_cache.get_cache_key_async(
+        description, image_data, estimate_request_version
+    )
+    meal_data_json = await meal_estimate_cache.get_cached_meal_data_json_async(cache_key)
+    if meal_data_json is not None:
+        return get_ai_response_from_cached_json(meal_data_json, messages)
+
+    ai_response = await get_ai_response_async(messages, on_partial)
+    if ai_response.meal_data.success_flag:
+        await meal_estimate_cache.add_meal_data_json_async(
+            cache_key, ai_response.meal_data.model_dump_json()
+        )
+    return ai_response
+
+
+def get_ingredients_estimate(ingredients_text):
+    messages = get_ingredients_estimate_messages(ingredients_text)
+    try:
+        completion = get_message_completion(messages, response_format=IngredientsDataOutput)
+    except OpenAIError as e:
+        return get_error_ingredients_output(e)
+    return parse_ingredients_completion(completion)
+
+
+async def get_ingredients_estimate_async(ingredients_text):
+    # one structured completion for all the ingredients of the list
+    messages = get_ingredients_estimate_messages(ingredients_text)
+    try:
+        completion = await get_message_completion_async(
+            messages, response_format=IngredientsDataOutput
+        )
+    except OpenAIError as e:
+        return get_error_ingredients_output(e)
+    return parse_ingredients_completion(completion)
+
+
+def get_ingredients_estimate_messages(ingredients_text):
+    return [
+        {"role": "system", "content": ingredients_system_prompt},
+        {"role": "user", "content": [get_text_content(ingredients_text)]}
+    ]
+
+
+def get_meal_estimate_messages(description=None, image_data=None):
     if description is None and image_data is None:
         raise TypeError("Both description and image data are missing")
-    messages = get_initial_messages(description, image_data)
-    return get_ai_response(messages)
+    return get_initial_messages(description, image_data)
 
 
 def update_meal_estimate(previous_message_list, update_request):
-    messages = remove_non_text_messages(previous_message_list)
+    messages = get_update_meal_estimate_messages(previous_message_list, update_request)
+    return get_ai_response(messages)
+
+
+async def update_meal_estimate_async(previous_message_list, update_request, on_partial=None):
+    messages = get_update_meal_estimate_messages(previous_message_list, update_request)
+    return await get_ai_response_async(messages, on_partial)
+
+
+def get_update_meal_estimate_messages(previous_message_list, update_request):
     update_request_message = get_update_request_message(update_request)
+    messages = compact_message_history(
+        remove_non_text_messages(previous_message_list),
+        reserved_tokens=estimate_message_tokens(update_request_message)
+    )
     messages.append(update_request_message)
-    return get_ai_response(messages)
+    return messages
+
+
+def compact_message_history(messages, max_corrections=None, token_budget=None, reserved_tokens=0):
+    # every assistant message contains the complete estimate, so only the latest one is needed
+    # the system prompt and the latest estimate are always kept,
+    # the oldest corrections and then the original request are dropped to fit the token budget
+    if max_corrections is None:
+        max_corrections = config.history_max_corrections
+    if token_budget is None:
+        token_budget = config.history_token_budget
+
+    system_messages = [m for m in messages if m.get("role") == "system"]
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    assistant_messages = [m for m in messages if m.get("role") == "assistant"]
+    if len(assistant_messages) == 0:
+        return list(messages)
+
+    original_request = user_messages[:1]
+    corrections = user_messages[1:]
+    corrections = corrections[max(0, len(corrections) - max_corrections):]
+    latest_estimate = assistant_messages[-1:]
+
+    def tokens(message_list):
+        return sum(estimate_message_tokens(m) for m in message_list)
+
+    required_tokens = tokens(system_messages) + tokens(latest_estimate) + reserved_tokens
+    while len(corrections) > 0 and \
+            required_tokens + tokens(original_request) + tokens(corrections) > token_budget:
+        corrections = corrections[1:]
+    if required_tokens + tokens(original_request) > token_budget:
+        original_request = []
+
+    compacted = system_messages + original_request + corrections + latest_estimate
+    if len(compacted) < len(messages):
+        logger.info(
+            f"message history compacted from {len(messages)} to {len(compacted)} messages, "
+            f"estimated tokens {tokens(messages)} -> {tokens(compacted)}"
+        )
+    return compacted
+
+
+def estimate_message_tokens(message):
+    # about 4 characters per token for english text, plus the message overhead
+    content = message.get("content", "")
+    if isinstance(content, str):
+        text_length = len(content)
+    else:
+        text_length = sum(
+            len(c) if isinstance(c, str) else len(c.get("text", ""))
+            for c in content
+        )
+    return text_length // 4 + 4
 
 
 def get_ai_response(messages):
@@ -180,16 +376,74 @@ def get_ai_response(messages):
     try:
         completion = get_message_completion(messages)
     except OpenAIError as e:
-        error_message = f"OpenAIError exception: {e}"
+        return get_error_ai_response(e, messages)
+    return get_ai_response_from_completion(completion, messages)
+
+
+async def get_ai_response_async(messages, on_partial=None):
+    # on_partial(partial_output_dict) is called while the response is streamed,
+    # it should return quickly, since the stream is not read while it runs
+    messages = list(messages)
+    try:
+        if on_partial is None:
+            completion = await get_message_completion_async(messages)
+        else:
+            completion = await get_message_completion_stream_async(messages, on_partial)
+    except OpenAIError as e:
+        return get_error_ai_response(e, messages)
+    return get_ai_response_from_completion(completion, messages)
+
+
+def get_ai_response_from_completion(completion, messages):
+    meal_data = parse_completion(completion)
+    assistant_message = get_assistant_message(completion)
+    messages.append(assistant_message)
+    return AiResponse(meal_data=meal_data, message_list=messages)
+
+
+def get_ai_response_from_cached_json(meal_data_json, messages):
+    logger.info("meal estimate served from cache")
+    meal_data = MealDataOutput.model_validate_json(meal_data_json)
+    messages = list(messages)
+    messages.append({
+        "role": "assistant",
+        "content": meal_data_json
+    })
+    return AiResponse(meal_data=meal_data, message_list=messages)
+
+
+def get_error_ai_response(e, messages):
+    error_message = f"OpenAIError exception: {e}"
+    logger.error(error_message)
+    meal_data = MealDataOutput.default(
+        success_flag=False, error_message=error_message
+    )
+    return AiResponse(
+        meal_data=meal_data, message_list=messages,
+        ai_unavailable=isinstance(e, request_policy.CircuitOpenError)
+    )
+
+
+def get_error_ingredients_output(e):
+    error_message = f"OpenAIError exception: {e}"
+    logger.error(error_message)
+    return IngredientsDataOutput.default(
+        success_flag=False, error_message=error_message,
+        ai_unavailable=isinstance(e, request_policy.CircuitOpenError)
+    )
+
+
+def parse_ingredients_completion(completion):
+    parsed_output = completion.choices[0].message.parsed
+    if parsed_output is not None:
+        return parsed_output
+    else:
+        refusal = completion.choices[0].message.refusal
+        error_message = f"OpenAI parsing failed with the following message: {refusal}"
         logger.error(error_message)
-        meal_data = MealDataOutput.default(
+        return IngredientsDataOutput.default(
             success_flag=False, error_message=error_message
         )
-    else:
-        meal_data = parse_completion(completion)
-        assistant_message = get_assistant_message(completion)
-        messages.append(assistant_message)
-    return AiResponse(meal_data=meal_data, message_list=messages)
 
 
 def parse_completion(completion):
@@ -216,7 +470,8 @@ def get_assistant_message(completion):
 def remove_non_text_messages(messages):
     new_messages = []
     for message in messages:
-        message = copy.deepcopy(message)
+        # content parts are not modified, a shallow copy of the message is enough
+        message = dict(message)
         old_content = message.get("content", list())
 
         if isinstance(old_content, str):
@@ -239,12 +494,67 @@ def get_text_content(text):
     return {"type": "text", "text": text}
 
 
-def get_message_completion(messages):
-    logger.info("get_message_completion, messages", remove_non_text_messages(messages))
-    completion = client.beta.chat.completions.parse(
-        response_format=MealDataOutput,
-        model=model,
-        messages=messages
-    )
-    logger.info(f"openai request total token usage: {completion.usage.total_tokens}")
+def get_message_completion(messages, response_format=MealDataOutput):
+    logger.info(f"get_message_completion, messages {remove_non_text_messages(messages)}")
+
+    def request(timeout):
+        return client.beta.chat.completions.parse(
+            response_format=response_format,
+            model=model,
+            messages=messages,
+            timeout=timeout
+        )
+
+    completion = request_policy.run_with_policy(request)
+    log_usage(completion, messages)
+    return completion
+
+
+async def get_message_completion_async(messages, response_format=MealDataOutput):
+    logger.info(f"get_message_completion_async, messages {remove_non_text_messages(messages)}")
+
+    async def request(timeout):
+        return await async_client.beta.chat.completions.parse(
+            response_format=response_format,
+            model=model,
+            messages=messages,
+            timeout=timeout
+        )
+
+    completion = await request_policy.run_with_policy_async(request, async_request_semaphore)
+    log_usage(completion, messages)
     return completion
+
+
+async def get_message_completion_stream_async(messages, on_partial):
+    logger.info(f"get_message_completion_stream_async, messages {remove_non_text_messages(messages)}")
+
+    async def request(timeout):
+        async with async_client.beta.chat.completions.stream(
+            response_format=MealDataOutput,
+            model=model,
+            messages=messages,
+            stream_options={"include_usage": True},
+            timeout=timeout
+        ) as stream:
+            async for event in stream:
+                # parsed is a dict with the fields of MealDataOutput received so far
+                if event.type == "content.delta" and isinstance(event.parsed, dict):
+                    on_partial(event.parsed)
+            # same ParsedChatCompletion type as returned by the parse method
+            return await stream.get_final_completion()
+
+    completion = await request_policy.run_with_policy_async(request, async_request_semaphore)
+    log_usage(completion, messages)
+    return completion
+
+
+def log_usage(completion, messages):
+    usage = completion.usage
+    if usage is None:
+        return
+    logger.info(
+        f"openai request token usage: prompt {usage.prompt_tokens}, "
+        f"completion {usage.completion_tokens}, total {usage.total_tokens}, "
+        f"messages {len(messages)}"
+    )
@@ -0,0 +1,230 @@
+from openai import (
+    OpenAIError, APIStatusError, APITimeoutError, APIConnectionError, RateLimitError
+)
+from collections import deque
+from enum import Enum
+from ai_interface import config
+import asyncio
+import contextlib
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(OpenAIError):
+    pass
+
+
+class DeadlineExceededError(OpenAIError):
+    pass
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    # stops sending requests for open_seconds when the failure rate of the recent attempts is too high,
+    # after that a single trial attempt decides whether the circuit is closed again
+    def __init__(self, window_size, min_attempts, failure_rate, open_seconds):
+        self.min_attempts = min_attempts
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+
+        self.total_attempts = 0
+        self.total_failures = 0
+        self.total_retries = 0
+        self.rejected_requests = 0
+        self.times_opened = 0
+
+    def allow_attempt(self):
+        with self._lock:
+            if self._state == CircuitState.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected_requests += 1
+                    return False
+                self._set_state(CircuitState.HALF_OPEN)
+
+            if self._state == CircuitState.HALF_OPEN:
+                if self._trial_in_progress:
+                    self.rejected_requests += 1
+                    return False
+                self._trial_in_progress = True
+
+            self.total_attempts += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state == CircuitState.HALF_OPEN:
+                self._trial_in_progress = False
+                self._outcomes.clear()
+                self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self._outcomes.append(False)
+            if self._state == CircuitState.HALF_OPEN:
+                self._trial_in_progress = False
+                self._open()
+            elif self._state == CircuitState.CLOSED and self._failure_rate_exceeded():
+                self._open()
+
+    def record_retry(self):
+        with self._lock:
+            self.total_retries += 1
+
+    def release_trial(self):
+        # the trial attempt ended with an error which says nothing about the upstream state
+        with self._lock:
+            self._trial_in_progress = False
+
+    def _failure_rate_exceeded(self):
+        if len(self._outcomes) < self.min_attempts:
+            return False
+        failures = sum(1 for o in self._outcomes if not o)
+        return failures / len(self._outcomes) >= self.failure_rate
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state):
+        if state != self._state:
+            # the counters are logged with every transition to make the breaker state observable
+            logger.warning(
+                f"openai circuit breaker state changed: {self._state.value} -> {state.value}, "
+                f"metrics {self._metrics()}"
+            )
+        self._state = state
+
+    def _metrics(self):
+        # called with the lock held
+        failures = sum(1 for o in self._outcomes if not o)
+        return {
+            "window_failure_rate": failures / len(self._outcomes) if len(self._outcomes) > 0 else 0.0,
+            "total_attempts": self.total_attempts,
+            "total_failures": self.total_failures,
+            "total_retries": self.total_retries,
+            "rejected_requests": self.rejected_requests,
+            "times_opened": self.times_opened,
+        }
+
+
+breaker = CircuitBreaker(
+    window_size=config.breaker_window_size,
+    min_attempts=config.breaker_min_attempts,
+    failure_rate=config.breaker_failure_rate,
+    open_seconds=config.breaker_open_seconds
+)
+
+
+def is_retryable(e):
+    if isinstance(e, (APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def get_retry_delay(e, attempt):
+    # "full jitter" spreads the retries of concurrent requests
+    delay = random.uniform(
+        0, min(config.retry_max_delay_seconds, config.retry_base_delay_seconds * 2 ** attempt)
+    )
+    if isinstance(e, APIStatusError):
+        retry_after = e.response.headers.get("retry-after", None)
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def before_attempt():
+    if not breaker.allow_attempt():
+        raise CircuitOpenError("OpenAI requests are temporarily suspended after repeated failures")
+
+
+def after_failed_attempt(e, attempt, deadline):
+    # returns the delay before the next attempt or raises the error if it should not be retried
+    if not is_retryable(e):
+        breaker.release_trial()
+        raise e
+    breaker.record_failure()
+
+    delay = get_retry_delay(e, attempt)
+    if attempt >= config.max_retries or time.monotonic() + delay >= deadline:
+        raise e
+
+    logger.warning(f"openai request attempt {attempt + 1} failed, retrying in {delay:.2f}s: {e}")
+    breaker.record_retry()
+    return delay
+
+
+def get_attempt_timeout(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError(
+            f"OpenAI request deadline of {config.request_deadline_seconds}s exceeded"
+        )
+    return min(config.request_timeout_seconds, remaining)
+
+
+def run_with_policy(request_func):
+    # request_func(timeout) makes one request attempt
+    deadline = time.monotonic() + config.request_deadline_seconds
+    attempt = 0
+    while True:
+        timeout = get_attempt_timeout(deadline)
+        before_attempt()
+        try:
+            result = request_func(timeout)
+        except OpenAIError as e:
+            time.sleep(after_failed_attempt(e, attempt, deadline))
+            attempt += 1
+            continue
+        except BaseException:
+            breaker.release_trial()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def run_with_policy_async(request_func, semaphore=None):
+    # request_func(timeout) returns a coroutine making one request attempt
+    # the wait for a semaphore slot is local queueing, the attempt timeout starts once a slot is held
+    # and the slot is released during the delay before a retry
+    deadline = time.monotonic() + config.request_deadline_seconds
+    attempt = 0
+    while True:
+        async with (semaphore if semaphore is not None else contextlib.nullcontext()):
+            timeout = get_attempt_timeout(deadline)
+            before_attempt()
+            try:
+                # streamed responses are not limited by the http client timeout as a whole
+                async with asyncio.timeout(timeout):
+                    result = await request_func(timeout)
+            except TimeoutError:
+                delay = after_failed_attempt(APITimeoutError(request=None), attempt, deadline)
+            except OpenAIError as e:
+                delay = after_failed_attempt(e, attempt, deadline)
+            except BaseException:
+                breaker.release_trial()
+                raise
+            else:
+                breaker.record_success()
+                return result
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor
+from barcode_reader import config, ean_decoder
+from pathlib import Path
+import argparse
+import time
+
+
+image_suffixes = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def decode_file(path):
+    start = time.perf_counter()
+    code = ean_decoder.decode_image_bytes(path.read_bytes(), config.decoder_max_width)
+    return code, time.perf_counter() - start
+
+
+def get_expected_code(path):
+    # sample images can be named after the barcode they contain, e.g. 4006381333931.jpg
+    stem = path.stem.split("_")[0]
+    return stem if stem.isdigit() else None
+
+
+def run_benchmark(folder, processes):
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in image_suffixes)
+    if len(paths) == 0:
+        print(f"no images found in {folder}")
+        return
+
+    n_decoded = 0
+    n_correct = 0
+    n_expected = 0
+    durations = []
+    for path in paths:
+        code, duration = decode_file(path)
+        durations.append(duration)
+        expected = get_expected_code(path)
+        n_decoded += code is not None
+        if expected is not None:
+            n_expected += 1
+            n_correct += code == expected
+        print(f"{path.name}: {code} ({duration * 1000:.1f} ms)")
+
+    durations.sort()
+    print(
+        f"\n{len(paths)} images, decoded {n_decoded}, "
+        f"correct {n_correct} of {n_expected} with expected code in the file name"
+    )
+    print(
+        f"single process: mean {sum(durations) / len(durations) * 1000:.1f} ms, "
+        f"median {durations[len(durations) // 2] * 1000:.1f} ms, "
+        f"max {durations[-1] * 1000:.1f} ms"
+    )
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # start the worker processes before measuring
+        list(pool.map(decode_file, paths[:processes]))
+        start = time.perf_counter()
+        list(pool.map(decode_file, paths))
+        elapsed = time.perf_counter() - start
+    print(f"{processes} processes: {len(paths) / elapsed:.1f} images per second")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark barcode decoding over a folder of images")
+    parser.add_argument("folder")
+    parser.add_argument("--processes", type=int, default=config.decoder_processes)
+    args = parser.parse_args()
+    run_benchmark(args.folder, args.processes)
@@ -0,0 +1,8 @@
+import os
+
+
+# processes decoding barcodes from photos, decoding is CPU bound and runs outside of the bot process
+decoder_processes = int(os.getenv("BARCODE_DECODER_PROCESSES", "2"))
+
+# photos are downscaled to this width before decoding
+decoder_max_width = int(os.getenv("BARCODE_DECODER_MAX_WIDTH", "1000"))
@@ -0,0 +1,164 @@
+from PIL import Image, ImageOps
+import numpy as np
+import io
+
+
+# widths of (space, bar, space, bar) of the left half "L" digit codes,
+# the right half "R" codes have the same widths starting with a bar
+L_CODE_WIDTHS = [
+    (3, 2, 1, 1), (2, 2, 2, 1), (2, 1, 2, 2), (1, 4, 1, 1), (1, 1, 3, 2),
+    (1, 2, 3, 1), (1, 1, 1, 4), (1, 3, 1, 2), (1, 2, 1, 3), (3, 1, 1, 2),
+]
+# "G" codes are the mirrored "R" codes
+G_CODE_WIDTHS = [tuple(reversed(w)) for w in L_CODE_WIDTHS]
+
+# parity of the six left digits (0 - L, 1 - G) encodes the first digit of EAN-13
+FIRST_DIGIT_PARITY = {
+    (0, 0, 0, 0, 0, 0): 0, (0, 0, 1, 0, 1, 1): 1, (0, 0, 1, 1, 0, 1): 2,
+    (0, 0, 1, 1, 1, 0): 3, (0, 1, 0, 0, 1, 1): 4, (0, 1, 1, 0, 0, 1): 5,
+    (0, 1, 1, 1, 0, 0): 6, (0, 1, 0, 1, 0, 1): 7, (0, 1, 0, 1, 1, 0): 8,
+    (0, 1, 1, 0, 1, 0): 9,
+}
+
+# the largest acceptable mean squared deviation of normalized digit widths from a code
+MAX_DIGIT_ERROR = 0.25
+
+N_SCANLINES = 24
+
+
+def decode_image_bytes(image_bytes, max_width=1000):
+    # returns EAN-13 (UPC-A as EAN-13 with leading zero) or EAN-8 digits, or None
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image).convert("L")
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32)
+    return decode_pixels(pixels)
+
+
+def decode_pixels(pixels):
+    # horizontal barcodes first, then vertical ones
+    for array in (pixels, pixels.T):
+        code = decode_scanlines(array)
+        if code is not None:
+            return code
+    return None
+
+
+def decode_scanlines(pixels):
+    height = pixels.shape[0]
+    # start from the middle of the image, where barcodes are usually centered
+    offsets = sorted(range(N_SCANLINES), key=lambda i: abs(i - N_SCANLINES / 2))
+    for i in offsets:
+        y = int((i + 0.5) * height / N_SCANLINES)
+        # a few adjacent rows are averaged to reduce noise
+        row = pixels[max(0, y - 1):y + 2].mean(axis=0)
+        widths, is_dark = row_to_runs(row)
+        for runs in ((widths, is_dark), (widths[::-1], is_dark[::-1])):
+            code = decode_runs(*runs)
+            if code is not None:
+                return code
+    return None
+
+
+def row_to_runs(row):
+    low, high = np.percentile(row, [5, 95])
+    if high - low < 20:
+        return np.array([], dtype=np.int64), np.array([], dtype=bool)
+    dark = row < (low + high) / 2
+    changes = np.flatnonzero(np.diff(dark.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], changes, [len(row)]))
+    return np.diff(bounds), dark[bounds[:-1]]
+
+
+def decode_runs(widths, is_dark):
+    widths = widths.tolist()
+    is_dark = is_dark.tolist()
+    for start in range(1, len(widths) - 3):
+        if not is_dark[start] or not is_guard(widths, start, quiet_zone_index=start - 1):
+            continue
+        for decode in (decode_ean13_at, decode_ean8_at):
+            code = decode(widths, start)
+            if code is not None:
+                return code
+    return None
+
+
+def is_guard(widths, start, quiet_zone_index=None):
+    guard = widths[start:start + 3]
+    module = sum(guard) / 3
+    if any(abs(w - module) > module * 0.6 + 1 for w in guard):
+        return False
+    if quiet_zone_index is not None and widths[quiet_zone_index] < module * 3:
+        return False
+    return True
+
+
+def decode_ean13_at(widths, start):
+    digits = decode_half(widths, start + 3, 6, left=True)
+    if digits is None:
+        return None
+    left_digits, parity = digits
+    first_digit = FIRST_DIGIT_PARITY.get(tuple(parity), None)
+    if first_digit is None:
+        return None
+    right = decode_half(widths, start + 3 + 24 + 5, 6, left=False)
+    if right is None:
+        return None
+    code = [first_digit] + left_digits + right[0]
+    if not is_valid_checksum(code):
+        return None
+    return "".join(str(d) for d in code)
+
+
+def decode_ean8_at(widths, start):
+    left = decode_half(widths, start + 3, 4, left=True)
+    if left is None or any(left[1]):
+        return None
+    right = decode_half(widths, start + 3 + 16 + 5, 4, left=False)
+    if right is None:
+        return None
+    code = left[0] + right[0]
+    if not is_valid_checksum(code):
+        return None
+    return "".join(str(d) for d in code)
+
+
+def decode_half(widths, start, n_digits, left):
+    if start + n_digits * 4 > len(widths):
+        return None
+    digits = []
+    parity = []
+    for i in range(n_digits):
+        digit_widths = widths[start + i * 4:start + i * 4 + 4]
+        candidates = [L_CODE_WIDTHS, G_CODE_WIDTHS] if left else [L_CODE_WIDTHS]
+        decoded = decode_digit(digit_widths, candidates)
+        if decoded is None:
+            return None
+        digits.append(decoded[0])
+        parity.append(decoded[1])
+    return digits, parity
+
+
+def decode_digit(digit_widths, code_tables):
+    # a digit is 7 modules wide
+    module = sum(digit_widths) / 7
+    normalized = [w / module for w in digit_widths]
+    best = None
+    for parity, table in enumerate(code_tables):
+        for digit, code in enumerate(table):
+            error = sum((n - c) ** 2 for n, c in zip(normalized, code)) / 4
+            if best is None or error < best[0]:
+                best = (error, digit, parity)
+    if best is None or best[0] > MAX_DIGIT_ERROR:
+        return None
+    return best[1], best[2]
+
+
+def is_valid_checksum(digits):
+    # the weights alternate 3 and 1 starting from the check digit's left neighbour
+    total = 0
+    for i, d in enumerate(reversed(digits[:-1])):
+        total += d * (3 if i % 2 == 0 else 1)
+    return (10 - total % 10) % 10 == digits[-1]
@@ -0,0 +1,26 @@
+from concurrent.futures import ProcessPoolExecutor
+from barcode_reader import config, ean_decoder
+import asyncio
+import multiprocessing
+
+_process_pool: ProcessPoolExecutor = None
+
+
+def get_process_pool():
+    # created on first use, so that importing the module does not start processes
+    global _process_pool
+    if _process_pool is None:
+        # the bot process runs threads (database sessions), forking it directly is not safe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=config.decoder_processes,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _process_pool
+
+
+async def decode_barcode_async(image_bytes):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_process_pool(), ean_decoder.decode_image_bytes,
+        image_bytes, config.decoder_max_width
+    )
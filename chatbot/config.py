@@ -11,6 +11,62 @@ else:
 
 
 registration_password = open("secrets/registration_password.txt").read()
+
+# number of updates processed at the same time, updates of one user are always sequential
+# 1 disables concurrent processing
+update_workers = int(os.getenv("UPDATE_WORKERS", "1"))
+
+
+class UpdateMode(Enum):
+    POLLING = "polling"
+    WEBHOOK = "webhook"
+
+
+update_mode = UpdateMode(os.getenv("UPDATE_MODE", UpdateMode.POLLING.value).lower())
+
+# webhook_url is the public https url telegram sends updates to,
+# the local listener serves it at webhook_listen:webhook_port/webhook_path
+webhook_url = os.getenv("WEBHOOK_URL") or None
+webhook_listen = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+webhook_port = int(os.getenv("WEBHOOK_PORT", "8443"))
+webhook_path = os.getenv("WEBHOOK_PATH", "telegram")
+
+if update_mode == UpdateMode.WEBHOOK:
+    # sent by telegram in the X-Telegram-Bot-Api-Secret-Token header of every request
+    webhook_secret_token = open("secrets/telegram_webhook_secret.txt").read().strip()
+else:
+    webhook_secret_token = None
+# minimal time between edits of the message showing a streamed AI estimate
+ai_progress_edit_interval_seconds = float(os.getenv("AI_PROGRESS_EDIT_INTERVAL_SECONDS", "1.0"))
+# dialog states and user_data changed since the last write are stored in the database
+# with this interval, changes made just before a crash are lost
+persistence_update_interval_seconds = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL_SECONDS", "30"))
+# number of saved meals on one page of the inline keyboard
+saved_meals_page_size = int(os.getenv("SAVED_MEALS_PAGE_SIZE", "8"))
+# number of most used saved meals shown above the first page
+saved_meal_suggestions = int(os.getenv("SAVED_MEAL_SUGGESTIONS", "3"))
+# largest weight in grams accepted for a food product or a saved meal,
+# nutrition values computed from it have to fit the DECIMAL(10, 4) columns of meals_eaten
+max_meal_weight_grams = float(os.getenv("MAX_MEAL_WEIGHT_GRAMS", "10000"))
+# plain text messages sent within this time are merged with each other and with the next prompt
+message_coalesce_window_seconds = float(os.getenv("MESSAGE_COALESCE_WINDOW_SECONDS", "0.05"))
+# telegram bot api limits, requests over the limits are delayed
+# (about 30 messages per second overall, 1 per second in one chat with short bursts allowed,
+# 20 per minute in one group)
+global_requests_per_second = float(os.getenv("GLOBAL_REQUESTS_PER_SECOND", "30"))
+chat_messages_per_second = float(os.getenv("CHAT_MESSAGES_PER_SECOND", "1"))
+chat_message_burst = int(os.getenv("CHAT_MESSAGE_BURST", "5"))
+group_messages_per_minute = float(os.getenv("GROUP_MESSAGES_PER_MINUTE", "20"))
+# number of times a request is repeated after a flood control error
+flood_control_max_retries = int(os.getenv("FLOOD_CONTROL_MAX_RETRIES", "3"))
+# rendered day views of the meals view, the days before and after the shown day
+# are read from the database together with it
+day_view_cache_size = int(os.getenv("DAY_VIEW_CACHE_SIZE", "5000"))
+day_view_cache_ttl_seconds = float(os.getenv("DAY_VIEW_CACHE_TTL_SECONDS", "600"))
+day_view_prefetch_days = int(os.getenv("DAY_VIEW_PREFETCH_DAYS", "3"))
+# day navigation clicks of the meals view within this time are shown as one render of the final day
+day_view_navigation_debounce_seconds = float(os.getenv("DAY_VIEW_NAVIGATION_DEBOUNCE_SECONDS", "0.3"))
+
 bot_username = "maxim_food_bot"
 
 
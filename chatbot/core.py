@@ -1,6 +1,13 @@
 from telegram.ext import ApplicationBuilder, ContextTypes
-from telegram.ext import CommandHandler
-from chatbot.config import secret, Commands, is_production
+from telegram.ext import (
+    CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler
+)
+from chatbot.config import (
+    secret, Commands, is_production, update_workers, UpdateMode, update_mode,
+    webhook_url, webhook_listen, webhook_port, webhook_path, webhook_secret_token,
+    persistence_update_interval_seconds, global_requests_per_second, chat_messages_per_second,
+    chat_message_burst, group_messages_per_minute, flood_control_max_retries
+)
 from chatbot.user.new_user_data import get_new_user_update_user_conv_handlers
 from chatbot.start_menu.start_menu import get_start_menu_conversation_handler
 from chatbot.meal.new_meal.new_meal import get_new_meal_conversation_handler
@@ -13,6 +20,9 @@ import logging
 from itertools import count
 from telegram import Update
 from chatbot import dialog_utils
+from chatbot.update_processor import PerUserUpdateProcessor
+from chatbot.persistence import MysqlPersistence
+from chatbot.rate_limiter import ChatRateLimiter
 from telegram.warnings import PTBUserWarning
 from warnings import filterwarnings
 
@@ -33,7 +43,19 @@ async def start_handler(update, context):
 
 
 def run_bot():
-    app = ApplicationBuilder().token(secret).build()
+    app_builder = ApplicationBuilder().token(secret).persistence(
+        MysqlPersistence(update_interval=persistence_update_interval_seconds)
+    ).rate_limiter(
+        ChatRateLimiter(
+            global_requests_per_second, chat_messages_per_second, chat_message_burst,
+            group_messages_per_minute, flood_control_max_retries
+        )
+    )
+    if update_workers > 1:
+        app_builder = app_builder.concurrent_updates(
+            PerUserUpdateProcessor(update_workers)
+        )
+    app = app_builder.build()
 
     new_user_handler, update_user_handler = \
         get_new_user_update_user_conv_handlers()
@@ -71,8 +93,69 @@ def run_bot():
     birthday_handler = get_birthday_handler()
     app.add_handler(birthday_handler, group=1)
 
+    allowed_updates = get_allowed_updates(app)
+
     logger.warning(
-        f"starting telegram bot, is_production={is_production}"
+        f"starting telegram bot, is_production={is_production}, "
+        f"update_workers={update_workers}, update_mode={update_mode.value}, "
+        f"allowed_updates={allowed_updates}"
     )
     # Run the bot until the user presses Ctrl-C
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    if update_mode == UpdateMode.WEBHOOK:
+        if webhook_url is None:
+            raise RuntimeError("Environment variable WEBHOOK_URL is not set")
+        app.run_webhook(
+            listen=webhook_listen,
+            port=webhook_port,
+            url_path=webhook_path,
+            webhook_url=webhook_url,
+            secret_token=webhook_secret_token,
+            allowed_updates=allowed_updates
+        )
+    else:
+        app.run_polling(allowed_updates=allowed_updates)
+
+
+def get_allowed_updates(app):
+    # telegram only sends update types that at least one registered handler can process
+    update_types = set()
+    visited_handlers = set()
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            update_types.update(
+                get_handler_update_types(handler, visited_handlers)
+            )
+    return sorted(update_types)
+
+
+# update types whose message is the effective_message of the update
+message_update_types = [
+    Update.MESSAGE, Update.EDITED_MESSAGE, Update.CHANNEL_POST, Update.EDITED_CHANNEL_POST,
+    Update.BUSINESS_MESSAGE, Update.EDITED_BUSINESS_MESSAGE
+]
+
+
+def get_handler_update_types(handler, visited_handlers):
+    if id(handler) in visited_handlers:
+        return set()
+    visited_handlers.add(id(handler))
+
+    if isinstance(handler, ConversationHandler):
+        nested_handlers = handler.entry_points + handler.fallbacks + [
+            h for state_handlers in handler.states.values() for h in state_handlers
+        ]
+        update_types = set()
+        for nested_handler in nested_handlers:
+            update_types.update(
+                get_handler_update_types(nested_handler, visited_handlers)
+            )
+        return update_types
+    elif isinstance(handler, CallbackQueryHandler):
+        return {Update.CALLBACK_QUERY}
+    elif isinstance(handler, (MessageHandler, CommandHandler)):
+        # filters are applied to update.effective_message,
+        # they can match edited messages, channel posts and business messages as well
+        return set(message_update_types)
+    else:
+        # unknown handler type, do not filter anything out
+        return set(Update.ALL_TYPES)
@@ -2,32 +2,157 @@ from telegram import (
     ReplyKeyboardRemove, ReplyKeyboardMarkup, KeyboardButton,
     InlineKeyboardMarkup, InlineKeyboardButton, Update
 )
+from telegram.constants import MessageLimit
 from database.food_database_model import NutritionType
-from chatbot.config import Commands
+from chatbot.config import Commands, message_coalesce_window_seconds
 from telegram.ext import ConversationHandler
 from enum import Enum
 import telegram.error
+import contextlib
+import asyncio
+import logging
 import re
 from collections.abc import Iterable
-from database import common_sql
 from database.select import select_users
 
 
-async def no_markup_message(update: Update, message, **kwargs):
-    await update.effective_message.reply_text(
-        message, reply_markup=ReplyKeyboardRemove(),
-        **kwargs
+logger = logging.getLogger(__name__)
+
+
+class OutboundMessageQueue:
+    # one dialog step often sends a few plain text messages followed by a prompt
+    # queued plain text is prepended to the next reply to the same chat,
+    # or sent on its own after window_seconds if the dialog step sends nothing else
+    # messages with inline keyboards are never merged, they are often edited later
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        # chat id -> list of (text, remove_keyboard)
+        self._pending = dict()
+        self._flush_tasks = dict()
+        # chat id -> [lock, number of senders holding or waiting for the lock]
+        self._chat_locks = dict()
+
+    def queue(self, update: Update, text, remove_keyboard):
+        chat_id = update.effective_chat.id
+        self._pending.setdefault(chat_id, []).append((text, remove_keyboard))
+        task = self._flush_tasks.get(chat_id)
+        if task is None or task.done():
+            self._flush_tasks[chat_id] = asyncio.create_task(
+                self._flush_later(update.get_bot(), chat_id)
+            )
+
+    async def reply(self, update: Update, text, reply_markup=None, standalone=False, **kwargs):
+        if update.effective_chat is None:
+            return await update.effective_message.reply_text(
+                text, reply_markup=reply_markup, **kwargs
+            )
+
+        chat_id = update.effective_chat.id
+        async with self._chat_lock(chat_id):
+            if standalone or not can_merge_into(reply_markup, kwargs):
+                await self._send_pending(update.get_bot(), chat_id)
+            else:
+                chunks = combine_queued_texts(self._pending.pop(chat_id, []))
+                if len(chunks) > 0:
+                    last_text, remove_keyboard = chunks[-1]
+                    merged_text = last_text + "\n\n" + text
+                    if len(merged_text) <= MessageLimit.MAX_TEXT_LENGTH:
+                        chunks.pop()
+                        text = merged_text
+                        if reply_markup is None and remove_keyboard:
+                            reply_markup = ReplyKeyboardRemove()
+                    for chunk_text, chunk_remove_keyboard in chunks:
+                        await send_queued_text(
+                            update.get_bot(), chat_id, chunk_text, chunk_remove_keyboard
+                        )
+
+            return await update.effective_message.reply_text(
+                text, reply_markup=reply_markup, **kwargs
+            )
+
+    async def _flush_later(self, bot, chat_id):
+        await asyncio.sleep(self.window_seconds)
+        try:
+            async with self._chat_lock(chat_id):
+                await self._send_pending(bot, chat_id)
+        except Exception as e:
+            logger.error(f"queued messages to chat {chat_id} were not sent: {e}")
+        finally:
+            if self._flush_tasks.get(chat_id) is asyncio.current_task():
+                self._flush_tasks.pop(chat_id)
+
+    async def _send_pending(self, bot, chat_id):
+        for text, remove_keyboard in combine_queued_texts(self._pending.pop(chat_id, [])):
+            await send_queued_text(bot, chat_id, text, remove_keyboard)
+
+    @contextlib.asynccontextmanager
+    async def _chat_lock(self, chat_id):
+        # keeps the order of messages sent to the chat by the flush task and the dialog
+        lock_entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        lock_entry[1] += 1
+        try:
+            async with lock_entry[0]:
+                yield
+        finally:
+            lock_entry[1] -= 1
+            if lock_entry[1] == 0:
+                self._chat_locks.pop(chat_id, None)
+
+
+def can_merge_into(reply_markup, kwargs):
+    # formatting options of the reply would apply to the queued plain text
+    if len(kwargs) > 0:
+        return False
+    return reply_markup is None or isinstance(reply_markup, (ReplyKeyboardMarkup, ReplyKeyboardRemove))
+
+
+def combine_queued_texts(queued_texts):
+    chunks = []
+    for text, remove_keyboard in queued_texts:
+        if len(chunks) > 0:
+            last_text, last_remove_keyboard = chunks[-1]
+            merged_text = last_text + "\n\n" + text
+            if len(merged_text) <= MessageLimit.MAX_TEXT_LENGTH:
+                chunks[-1] = (merged_text, last_remove_keyboard or remove_keyboard)
+                continue
+        chunks.append((text, remove_keyboard))
+    return chunks
+
+
+async def send_queued_text(bot, chat_id, text, remove_keyboard):
+    reply_markup = ReplyKeyboardRemove() if remove_keyboard else None
+    await bot.send_message(chat_id, text, reply_markup=reply_markup)
+
+
+outbound_queue = OutboundMessageQueue(message_coalesce_window_seconds)
+
+
+async def reply_message(update: Update, message, reply_markup=None, standalone=False, **kwargs):
+    # sends the message right away, queued plain text is sent in front of it
+    # standalone messages are not merged with the queued text (for messages edited later)
+    return await outbound_queue.reply(
+        update, message, reply_markup=reply_markup, standalone=standalone, **kwargs
     )
 
 
+async def no_markup_message(update: Update, message, standalone=False, **kwargs):
+    if standalone or len(kwargs) > 0:
+        return await reply_message(
+            update, message, reply_markup=ReplyKeyboardRemove(), standalone=standalone,
+            **kwargs
+        )
+    outbound_queue.queue(update, message, remove_keyboard=True)
+
+
 async def keep_markup_message(update: Update, message, **kwargs):
     # when one command creates a new dialog while another dialog exists
     # the "exit" message from the dialog that is about to end may destroy the markup
     # of the first message of the new dialog if it is created with "no_markup_message"
     # "keep_markyp_message" should be used as an alternative
-    await update.effective_message.reply_text(
-        message, **kwargs
-    )
+    if len(kwargs) > 0:
+        await reply_message(update, message, **kwargs)
+        return
+    outbound_queue.queue(update, message, remove_keyboard=False)
 
 
 async def wrong_value_message(update: Update, extra_message=None):
@@ -146,18 +271,32 @@ async def silent_cancel(update: Update, context):
     return ConversationHandler.END
 
 
-def get_tg_user_obj(update: Update):
+def get_tg_user_id(update: Update):
     if update.message is not None:
-        tg_id = update.message.from_user.id
+        return update.message.from_user.id
     elif update.callback_query is not None:
-        tg_id = update.callback_query.from_user.id
+        return update.callback_query.from_user.id
     else:
         return None
 
-    with common_sql.get_session() as session:
-        user = select_users.select_user_by_telegram_id(
-            session, tg_id
-        )
+
+async def get_tg_user_obj(update: Update):
+    # orm object with all related objects loaded, for dialogs that edit the user
+    tg_id = get_tg_user_id(update)
+    if tg_id is None:
+        return None
+
+    user = await select_users.select_user_by_telegram_id_async(tg_id)
+    return user
+
+
+async def get_tg_user_snapshot(update: Update):
+    # cached read only copy of the user, safe to keep in context.user_data
+    tg_id = get_tg_user_id(update)
+    if tg_id is None:
+        return None
+
+    user = await select_users.select_user_snapshot_by_telegram_id_cached_async(tg_id)
     return user
 
 
@@ -1,10 +1,15 @@
-from database.common_sql import get_session
+import asyncio
+import calendar
+import datetime
+import time
 from enum import Enum, auto
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from database.food_database_model import MealEaten, NutritionType
+from database.food_database_model import MealEaten, MealSnapshot, NutritionType, UserTarget
 from database.select import select_meals
 from chatbot import dialog_utils
 from chatbot.config import DataKeys
+from chatbot import config as chatbot_config
+from database.cache import TtlLruCache
 import logging
 from chatbot import inline_key_utils
 from chatbot.inline_key_utils import (
@@ -20,6 +25,7 @@ class MealsEatenViewDataEntry(Enum):
     USER = auto()
     SINGLE_MEAL = auto()
     DATE = auto()
+    SUMMARY_PERIOD = auto()
     DATAVIEW_CHAT_ID_MESSAGE_ID = auto()
 
 
@@ -27,6 +33,12 @@ class MealViewInlineDataKey(InlineButtonDataKey):
     SINGLE_MEAL_SELECTED = auto()
     DAY_VIEW_NAVIGATION = auto()
     SINGLE_MEAL_VIEW_ACTION = auto()
+    PERIOD_VIEW_NAVIGATION = auto()
+
+
+class SummaryPeriod(Enum):
+    WEEK = "Week"
+    MONTH = "Month"
 
 
 class DayViewNavigationBtnValue(InlineButtonDataValueGroup):
@@ -37,6 +49,19 @@ class DayViewNavigationBtnValue(InlineButtonDataValueGroup):
     PREVIOUS = auto()
     ENTER_DATE = auto()
     BACK_TO_START_MENU = auto()
+    WEEK_SUMMARY = auto()
+    MONTH_SUMMARY = auto()
+
+
+class PeriodViewNavigationBtnValue(InlineButtonDataValueGroup):
+    @staticmethod
+    def class_key():
+        return MealViewInlineDataKey.PERIOD_VIEW_NAVIGATION
+    NEXT = auto()
+    PREVIOUS = auto()
+    WEEK_SUMMARY = auto()
+    MONTH_SUMMARY = auto()
+    BACK_TO_DAY_VIEW = auto()
 
 
 class SingleMealActionBtnValue(InlineButtonDataValueGroup):
@@ -49,34 +74,132 @@ class SingleMealActionBtnValue(InlineButtonDataValueGroup):
     BACK_TO_DAY_VIEW = auto()
 
 
+# (user id, date, meals eaten version) -> (text, reply markup)
+day_view_cache = TtlLruCache(chatbot_config.day_view_cache_size, chatbot_config.day_view_cache_ttl_seconds)
+
+
 async def message_day_meals(update, context, update_existing):
     dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
 
     date = dialog_data[MealsEatenViewDataEntry.DATE]
 
-    with get_session() as session:
-        meals = select_meals.get_meals_for_one_day(
-            session, date,
-            dialog_data[MealsEatenViewDataEntry.USER]
+    user = dialog_data[MealsEatenViewDataEntry.USER]
+    version = select_meals.get_meals_eaten_version(user.id)
+    day_view = day_view_cache.get((user.id, date, version))
+    if day_view is None:
+        day_view = await render_day_views(user, date, version)
+    message, reply_markup = day_view
+
+    set_parent_data(context, ConversationID.DAY_VIEW, ConversationID.NEW_MEAL, date)
+    await send_dataview_message(
+        update, context, message, reply_markup,
+        update_existing
+    )
+
+
+async def render_day_views(user, date, version):
+    # the neighbouring days are rendered as well,
+    # paging to them is answered from the cache
+    first_date = date - datetime.timedelta(days=chatbot_config.day_view_prefetch_days)
+    last_date = date + datetime.timedelta(days=chatbot_config.day_view_prefetch_days)
+    meals_by_date, daily_totals = await asyncio.gather(
+        select_meals.get_meals_for_days_include_to_async(first_date, last_date, user),
+        select_meals.select_daily_nutrition_totals_include_to_async(user.id, first_date, last_date)
+    )
+
+    day_views = dict()
+    for day, meals in meals_by_date.items():
+        nutrition_total = daily_totals.get(day, {n: 0 for n in NutritionType})
+        day_views[day] = (
+            day_meals_text(day, nutrition_total),
+            get_meals_inline_keyboard_markup(meals)
         )
+        # version was read before the data, views of a changed day are not stored with a newer version
+        day_view_cache.set((user.id, day, version), day_views[day])
+    return day_views[date]
 
-    nutrition_total = NutritionType.sum_nutrition_as_dict(meals)
+
+def day_meals_text(date, nutrition_total):
     no_weight_keys = NutritionType.without_weight()
-    message = (
+    return (
         date.strftime("%A %d %B %Y") + "\n"
         "      " + " / ".join([n.value for n in NutritionType if n != NutritionType.WEIGHT]) + "\n" +
         "Total: " + " / ".join([f"{nutrition_total[k]:.0f}" for k in no_weight_keys])
     )
 
-    reply_markup = get_meals_inline_keyboard_markup(meals, context)
 
-    await send_dataview_message(
-        update, context, message, reply_markup,
-        update_existing
+# (chat id, message id) of a day view ->
+# [render task, time of the last navigation click, shown date, message is being edited]
+pending_day_view_renders = dict()
+
+
+def schedule_day_view_render(update, context, shown_date):
+    # the date in the dialog data is changed by every click,
+    # the message is edited once the clicks stop for the debounce time
+    dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
+    message_key = dialog_data[MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID]
+
+    pending_render = pending_day_view_renders.get(message_key, None)
+    if pending_render is not None and not pending_render[0].done():
+        pending_render[1] = time.monotonic()
+        return
+
+    pending_render = [None, time.monotonic(), shown_date, False]
+    pending_render[0] = asyncio.create_task(
+        render_day_view_debounced(update, context, message_key, pending_render)
     )
+    pending_day_view_renders[message_key] = pending_render
+
+
+async def render_day_view_debounced(update, context, message_key, pending_render):
+    try:
+        while True:
+            delay = pending_render[1] + chatbot_config.day_view_navigation_debounce_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            last_click_time = pending_render[1]
+            date = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW][MealsEatenViewDataEntry.DATE]
+            pending_render[3] = True
+            try:
+                await message_day_meals(update, context, update_existing=True)
+            finally:
+                pending_render[3] = False
+            pending_render[2] = date
+            # render again if there were clicks while the message was edited,
+            # unless the render was cancelled during the edit
+            if (
+                pending_render[1] == last_click_time or
+                pending_day_view_renders.get(message_key, None) is not pending_render
+            ):
+                break
+    except Exception as e:
+        logger.error(f"day view render failed: {e}")
+    finally:
+        if pending_day_view_renders.get(message_key, None) is pending_render:
+            pending_day_view_renders.pop(message_key)
+
+
+async def cancel_day_view_render(context):
+    # other actions of the meals view replace the day view message or use its date,
+    # the clicks that are not rendered yet are dropped and the date the user sees is kept
+    dialog_data = context.user_data.get(DataKeys.MEALS_EATEN_DATAVIEW, dict())
+    message_key = dialog_data.get(MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID, None)
+    pending_render = pending_day_view_renders.pop(message_key, None)
+    if pending_render is None:
+        return
+
+    if pending_render[3]:
+        # an edit request that was sent may already be shown, it is completed
+        # so that the shown date and the parent data point to the same day
+        await asyncio.wait([pending_render[0]])
+    else:
+        pending_render[0].cancel()
+    dialog_data[MealsEatenViewDataEntry.DATE] = pending_render[2]
 
 
-def get_meals_inline_keyboard_markup(meals: list[MealEaten], context):
+def get_meals_inline_keyboard_markup(meals: list[MealEaten]):
     buttons = []
     for meal in meals:
         meal_nutrition_dict = meal.nutrition_as_dict()
@@ -110,10 +233,6 @@ def get_meals_inline_keyboard_markup(meals: list[MealEaten], context):
         )
     ]
 
-    dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
-    date = dialog_data[MealsEatenViewDataEntry.DATE]
-    set_parent_data(context, ConversationID.DAY_VIEW, ConversationID.NEW_MEAL, date)
-
     navigation_buttons = [
         InlineKeyboardButton(
             "◀", callback_data=DayViewNavigationBtnValue.PREVIOUS.to_key_value_str()
@@ -125,10 +244,138 @@ def get_meals_inline_keyboard_markup(meals: list[MealEaten], context):
             "▶", callback_data=DayViewNavigationBtnValue.NEXT.to_key_value_str()
         ),
     ]
-    button_rows = food_button_rows + [add_meal_button] + [navigation_buttons]
+    summary_buttons = [
+        InlineKeyboardButton(
+            "Week", callback_data=DayViewNavigationBtnValue.WEEK_SUMMARY.to_key_value_str()
+        ),
+        InlineKeyboardButton(
+            "Month", callback_data=DayViewNavigationBtnValue.MONTH_SUMMARY.to_key_value_str()
+        ),
+    ]
+    button_rows = food_button_rows + [add_meal_button] + [navigation_buttons] + [summary_buttons]
     return InlineKeyboardMarkup(button_rows)
 
 
+def get_period_first_last_date(date: datetime.date, period: SummaryPeriod):
+    if period == SummaryPeriod.WEEK:
+        first_date = date - datetime.timedelta(days=date.weekday())
+        return first_date, first_date + datetime.timedelta(days=6)
+    else:
+        n_days = calendar.monthrange(date.year, date.month)[1]
+        return date.replace(day=1), date.replace(day=n_days)
+
+
+def shift_period(date: datetime.date, period: SummaryPeriod, n_periods):
+    # returns the first date of the period n_periods away from the period of the date
+    first_date, _ = get_period_first_last_date(date, period)
+    if period == SummaryPeriod.WEEK:
+        return first_date + datetime.timedelta(weeks=n_periods)
+    else:
+        month_index = first_date.year * 12 + first_date.month - 1 + n_periods
+        return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def message_period_summary(update, context, update_existing):
+    dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
+    date = dialog_data[MealsEatenViewDataEntry.DATE]
+    period = dialog_data[MealsEatenViewDataEntry.SUMMARY_PERIOD]
+    user = dialog_data[MealsEatenViewDataEntry.USER]
+
+    first_date, last_date = get_period_first_last_date(date, period)
+    daily_totals = await select_meals.select_daily_nutrition_totals_include_to_async(
+        user.id, first_date, last_date
+    )
+
+    message = period_summary_text(
+        first_date, last_date, daily_totals, user.user_target_obj
+    )
+    await send_dataview_message(
+        update, context, message,
+        get_period_summary_inline_keyboard_markup(period), update_existing
+    )
+
+
+def period_summary_text(first_date, last_date, daily_totals, user_target: UserTarget):
+    no_weight_keys = NutritionType.without_weight()
+    lines = [
+        first_date.strftime("%d %B %Y") + " - " + last_date.strftime("%d %B %Y"),
+        "      " + " / ".join([n.value for n in no_weight_keys])
+    ]
+    if user_target is not None:
+        target_values = {
+            NutritionType.CALORIES: user_target.calories,
+            NutritionType.FAT: user_target.fat,
+            NutritionType.CARBS: user_target.carbs,
+            NutritionType.PROTEIN: user_target.protein,
+        }
+        lines.append(
+            "Target: " + " / ".join([f"{target_values[k]:.0f}" for k in no_weight_keys]) +
+            f" ({user_target.target_type.lower()})"
+        )
+
+    # days without meals are not in daily_totals, they are shown as "-" and not averaged
+    # days with meals of zero calories are kept
+
+    date = first_date
+    while date <= last_date:
+        day_label = date.strftime("%a %d")
+        nutrition = daily_totals.get(date, None)
+        if nutrition is None:
+            lines.append(f"{day_label}: -")
+        else:
+            lines.append(
+                f"{day_label}: " +
+                " / ".join([f"{nutrition[k]:.0f}" for k in no_weight_keys]) +
+                target_check_mark(nutrition[NutritionType.CALORIES], user_target)
+            )
+        date += datetime.timedelta(days=1)
+
+    if len(daily_totals) > 0:
+        n_days = len(daily_totals)
+        totals = {
+            k: sum([n[k] for n in daily_totals.values()]) for k in no_weight_keys
+        }
+        lines.append(
+            "Average: " + " / ".join([f"{totals[k] / n_days:.0f}" for k in no_weight_keys]) +
+            f" ({n_days} days with meals)"
+        )
+        lines.append("Total: " + " / ".join([f"{totals[k]:.0f}" for k in no_weight_keys]))
+    return "\n".join(lines)
+
+
+def target_check_mark(calories, user_target: UserTarget):
+    if user_target is None:
+        return ""
+    if user_target.target_type == UserTarget.Type.MAXIMUM.value:
+        target_met = calories <= user_target.calories
+    else:
+        target_met = calories >= user_target.calories
+    return " ✅" if target_met else " ❌"
+
+
+def get_period_summary_inline_keyboard_markup(period: SummaryPeriod):
+    if period == SummaryPeriod.WEEK:
+        other_period_button = InlineKeyboardButton(
+            "Month", callback_data=PeriodViewNavigationBtnValue.MONTH_SUMMARY.to_key_value_str()
+        )
+    else:
+        other_period_button = InlineKeyboardButton(
+            "Week", callback_data=PeriodViewNavigationBtnValue.WEEK_SUMMARY.to_key_value_str()
+        )
+    navigation_buttons = [
+        InlineKeyboardButton(
+            "◀", callback_data=PeriodViewNavigationBtnValue.PREVIOUS.to_key_value_str()
+        ),
+        InlineKeyboardButton(
+            "Days", callback_data=PeriodViewNavigationBtnValue.BACK_TO_DAY_VIEW.to_key_value_str()
+        ),
+        InlineKeyboardButton(
+            "▶", callback_data=PeriodViewNavigationBtnValue.NEXT.to_key_value_str()
+        ),
+    ]
+    return InlineKeyboardMarkup([navigation_buttons, [other_period_button]])
+
+
 async def deactivate_dataview_message(context):
     # deletes interactive keyboard
     dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
@@ -136,6 +383,7 @@ async def deactivate_dataview_message(context):
         logger.warning("dataview message data does not exist, message cannot be deactivated")
         return
 
+    await cancel_day_view_render(context)
     chat_id, message_id = dialog_data.pop(MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID)
     await dialog_utils.delete_inline_keyboard(context, chat_id, message_id)
 
@@ -145,6 +393,7 @@ async def delete_dataview_message(context):
     if MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID not in dialog_data:
         logger.warning("dataview message data does not exist, message cannot be deleted")
         return
+    await cancel_day_view_render(context)
     chat_id, message_id = dialog_data.pop(MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID)
     await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
 
@@ -156,7 +405,7 @@ async def ask_for_date(update):
     await dialog_utils.no_markup_message(update, question)
 
 
-async def show_single_meal(update, context, meal: MealEaten, update_existing=True):
+async def show_single_meal(update, context, meal: MealSnapshot, update_existing=True):
     message = meal.describe() + "\n"
     reply_markup = single_meal_inline_keyboard_markup(context, meal.id)
     await send_dataview_message(
@@ -178,7 +427,7 @@ def single_meal_inline_keyboard_markup(context, meal_id):
     )
 
 
-async def ask_for_delete_confirmation(update, context, meal: MealEaten):
+async def ask_for_delete_confirmation(update, context, meal: MealSnapshot):
     meal_description = meal.describe()
     question = "Confirm meal entry deletion?"
     message = meal_description + "\n\n" + question
@@ -209,8 +458,8 @@ async def send_dataview_message(update, context, text, reply_markup, update_exis
             text=text, reply_markup=reply_markup,
         )
     else:
-        message_obj = await update.effective_message.reply_text(
-            text, reply_markup=reply_markup
+        message_obj = await dialog_utils.reply_message(
+            update, text, reply_markup=reply_markup
         )
         dialog_data[MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID] = (
             message_obj.chat.id, message_obj.id
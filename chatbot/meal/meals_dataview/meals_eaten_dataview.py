@@ -4,18 +4,17 @@ from telegram.ext import ConversationHandler, CallbackQueryHandler, MessageHandl
 from enum import Enum, auto
 from chatbot.config import Commands
 from chatbot.inline_key_utils import InlineButtonDataKeyValue, StartConversationDataKey
-from database.food_database_model import User
+from database.food_database_model import UserSnapshot, MealSnapshot
 from database.update import update_meals
 from chatbot import dialog_utils
-from database.common_sql import get_session
 from database.select import select_meals
 from chatbot.meal.meals_dataview import meals_dataview_utils
 from chatbot.meal.meals_dataview.meals_dataview_utils import (
-    MealsEatenViewDataEntry, MealViewInlineDataKey,
-    DayViewNavigationBtnValue, SingleMealActionBtnValue
+    MealsEatenViewDataEntry, MealViewInlineDataKey, SummaryPeriod,
+    DayViewNavigationBtnValue, PeriodViewNavigationBtnValue, SingleMealActionBtnValue
 )
 from chatbot.start_menu import start_menu_utils
-from chatbot.parent_child_utils import ChildEndStage
+from chatbot.parent_child_utils import ChildEndStage, ConversationID
 from chatbot.config import DataKeys
 import dateparser
 import logging
@@ -29,6 +28,7 @@ class MealsEatenViewStages(Enum):
     DAY_VIEW = auto()
     DATE_ENTRY = auto()
     SINGLE_MEAL_VIEW = auto()
+    PERIOD_VIEW = auto()
 
 
 def get_meals_eaten_view_conversation_handler(new_meal_conversation_handler):
@@ -55,6 +55,12 @@ def get_meals_eaten_view_conversation_handler(new_meal_conversation_handler):
         MealsEatenViewStages.DAY_VIEW: day_view_handlers,
         ChildEndStage.NEW_MEAL_END: day_view_handlers,
         MealsEatenViewStages.DATE_ENTRY: [MessageHandler(text_only_filter, handle_date)],
+        MealsEatenViewStages.PERIOD_VIEW: [
+            CallbackQueryHandler(
+                handle_period_view_navigation_callback,
+                pattern=MealViewInlineDataKey.PERIOD_VIEW_NAVIGATION.value
+            )
+        ],
         MealsEatenViewStages.SINGLE_MEAL_VIEW: [
             CallbackQueryHandler(
                 handle_single_meal_callback,
@@ -74,6 +80,8 @@ def get_meals_eaten_view_conversation_handler(new_meal_conversation_handler):
         entry_points=entry_points,
         states=states,
         fallbacks=fallbacks,
+        name=ConversationID.DAY_VIEW.value,
+        persistent=True,
         map_to_parent={
             ConversationHandler.END: ChildEndStage.MEALS_EATEN_VIEW_END,
             ChildEndStage.RETURN_TO_START: ChildEndStage.RETURN_TO_START
@@ -98,7 +106,7 @@ async def open_meals_eaten_view(update, context):
     context.user_data[DataKeys.MEALS_EATEN_DATAVIEW] = dict()
     dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
 
-    user = dialog_utils.get_tg_user_obj(update)
+    user = await dialog_utils.get_tg_user_snapshot(update)
 
     if user is None:
         await dialog_utils.user_does_not_exist_message(update)
@@ -122,19 +130,24 @@ async def handle_date_view_navigation_callback(update, context):
     data_str = update.callback_query.data
     data = InlineButtonDataKeyValue.from_str(data_str)
 
-    if data.value == DayViewNavigationBtnValue.PREVIOUS.value:
-        dialog_data[MealsEatenViewDataEntry.DATE] -= datetime.timedelta(days=1)
-        await meals_dataview_utils.message_day_meals(
-            update, context, update_existing=True
-        )
-        return MealsEatenViewStages.DAY_VIEW
-    elif data.value == DayViewNavigationBtnValue.NEXT.value:
-        dialog_data[MealsEatenViewDataEntry.DATE] += datetime.timedelta(days=1)
-        await meals_dataview_utils.message_day_meals(
-            update, context, update_existing=True
-        )
+    if data.value in [DayViewNavigationBtnValue.PREVIOUS.value, DayViewNavigationBtnValue.NEXT.value]:
+        shown_date = dialog_data[MealsEatenViewDataEntry.DATE]
+        if data.value == DayViewNavigationBtnValue.PREVIOUS.value:
+            dialog_data[MealsEatenViewDataEntry.DATE] -= datetime.timedelta(days=1)
+        else:
+            dialog_data[MealsEatenViewDataEntry.DATE] += datetime.timedelta(days=1)
+
+        if MealsEatenViewDataEntry.DATAVIEW_CHAT_ID_MESSAGE_ID in dialog_data:
+            # the callback is already answered, only the final day of a series of clicks is shown
+            meals_dataview_utils.schedule_day_view_render(update, context, shown_date)
+        else:
+            await meals_dataview_utils.message_day_meals(
+                update, context, update_existing=False
+            )
         return MealsEatenViewStages.DAY_VIEW
-    elif data.value == DayViewNavigationBtnValue.ENTER_DATE.value:
+
+    await meals_dataview_utils.cancel_day_view_render(context)
+    if data.value == DayViewNavigationBtnValue.ENTER_DATE.value:
         await meals_dataview_utils.deactivate_dataview_message(context)
         await meals_dataview_utils.ask_for_date(update)
         return MealsEatenViewStages.DATE_ENTRY
@@ -145,23 +158,71 @@ async def handle_date_view_navigation_callback(update, context):
             update, user
         )
         return ConversationHandler.END
+    elif data.value == DayViewNavigationBtnValue.WEEK_SUMMARY.value:
+        return await open_period_view(update, context, SummaryPeriod.WEEK)
+    elif data.value == DayViewNavigationBtnValue.MONTH_SUMMARY.value:
+        return await open_period_view(update, context, SummaryPeriod.MONTH)
 
     # if callback was not handled by this point, there is an error
     error_message = "handle_date_view_callback Unexpected data received: " + data_str
     return await handle_exception_back_to_day_view(update, context, error_message)
 
 
+async def open_period_view(update, context, period):
+    dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
+    dialog_data[MealsEatenViewDataEntry.SUMMARY_PERIOD] = period
+    await meals_dataview_utils.message_period_summary(
+        update, context, update_existing=True
+    )
+    return MealsEatenViewStages.PERIOD_VIEW
+
+
+async def handle_period_view_navigation_callback(update, context):
+    await dialog_utils.handle_inline_keyboard_callback(
+        update
+    )
+    dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
+    period = dialog_data[MealsEatenViewDataEntry.SUMMARY_PERIOD]
+    date = dialog_data[MealsEatenViewDataEntry.DATE]
+
+    data_str = update.callback_query.data
+    data = InlineButtonDataKeyValue.from_str(data_str)
+
+    if data.value == PeriodViewNavigationBtnValue.PREVIOUS.value:
+        dialog_data[MealsEatenViewDataEntry.DATE] = meals_dataview_utils.shift_period(date, period, -1)
+        return await open_period_view(update, context, period)
+    elif data.value == PeriodViewNavigationBtnValue.NEXT.value:
+        dialog_data[MealsEatenViewDataEntry.DATE] = meals_dataview_utils.shift_period(date, period, 1)
+        return await open_period_view(update, context, period)
+    elif data.value == PeriodViewNavigationBtnValue.WEEK_SUMMARY.value:
+        return await open_period_view(update, context, SummaryPeriod.WEEK)
+    elif data.value == PeriodViewNavigationBtnValue.MONTH_SUMMARY.value:
+        return await open_period_view(update, context, SummaryPeriod.MONTH)
+    elif data.value == PeriodViewNavigationBtnValue.BACK_TO_DAY_VIEW.value:
+        dialog_data.pop(MealsEatenViewDataEntry.SUMMARY_PERIOD)
+        await meals_dataview_utils.message_day_meals(
+            update, context, update_existing=True
+        )
+        return MealsEatenViewStages.DAY_VIEW
+
+    # if callback was not handled by this point, there is an error
+    error_message = "handle_period_view_navigation_callback Unexpected data received: " + data_str
+    return await handle_exception_back_to_day_view(update, context, error_message)
+
+
 async def handle_open_single_meal_callback(update, context):
     await dialog_utils.handle_inline_keyboard_callback(
         update
     )
+    await meals_dataview_utils.cancel_day_view_render(context)
     dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
     data_str = update.callback_query.data
     data = InlineButtonDataKeyValue.from_str(data_str)
     meal_id = data.value
     try:
-        with get_session() as session:
-            meal = select_meals.select_meal_eaten_by_meal_id(session, meal_id)
+        meal = MealSnapshot.from_orm(
+            await select_meals.select_meal_eaten_by_meal_id_async(meal_id)
+        )
         if meal is None:
             error_message = f"Meal with id {meal_id} does not exist"
             logger.error(error_message)
@@ -179,7 +240,7 @@ async def handle_open_single_meal_callback(update, context):
 
 async def handle_date(update, context):
     dialog_data = context.user_data[DataKeys.MEALS_EATEN_DATAVIEW]
-    user: User = dialog_data[MealsEatenViewDataEntry.USER]
+    user: UserSnapshot = dialog_data[MealsEatenViewDataEntry.USER]
     datetime_obj = user.parse_datetime(update.message.text)
 
     if datetime_obj is None:
@@ -223,8 +284,7 @@ async def handle_single_meal_callback(update, context):
         dialog_data.pop(MealsEatenViewDataEntry.SINGLE_MEAL)
 
         try:
-            with get_session() as session:
-                update_meals.delete_meal_eaten(session, meal)
+            await update_meals.delete_meal_eaten_async(meal.id)
         except Exception as e:
             return await handle_exception_back_to_day_view(update, context, e)
 
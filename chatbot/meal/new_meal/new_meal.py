@@ -8,18 +8,20 @@ from chatbot.meal.new_meal.new_meal_utils import (
     ConfirmAiOption, ConfirmManualOption, KeepUpdateOption, SkipDescriptionBtnValue, EditMode
 )
 from chatbot.config import DataKeys
+from chatbot import config as chatbot_config
 from chatbot.parent_child_utils import pop_parent_data, ConversationID, ChildEndStage
 from chatbot.start_menu import start_menu_utils
-from database import common_sql
-from database.common_sql import get_session
-from database.food_database_model import MealEaten, User
+from database.food_database_model import (
+    MealSnapshot, UserSnapshot, FoodProductSnapshot, MealForFutureUseSnapshot, TimeOfDay
+)
 from database.update import update_meals
-from database.select import select_meals
+from database.select import select_meals, select_food_products
 from chatbot import dialog_utils
 from chatbot.inline_key_utils import (
     InlineButtonDataKeyValue, StartConversationDataKey
 )
 from ai_interface import openai_meal_chat
+from barcode_reader import reader as barcode_reader
 import logging
 import traceback
 import datetime
@@ -47,6 +49,13 @@ class NewMealStages(Enum):
     CHOOSE_ENTER_ONE_OR_MANY_INGREDIENTS = auto()
     ADD_NUTRITION_SINGLE_ENTRY_MANUALLY = auto()
     ADD_NUTRITION_MULTIPLE_ENTRIES_MANUALLY = auto()
+    ADD_INGREDIENTS_LIST_FOR_AI = auto()
+
+    ENTER_FOOD_PRODUCT_SEARCH = auto()
+    CHOOSE_FOOD_PRODUCT = auto()
+    ENTER_FOOD_PRODUCT_WEIGHT = auto()
+    CHOOSE_SAVED_MEAL = auto()
+    ENTER_SAVED_MEAL_WEIGHT = auto()
     ADD_MORE_INGREDIENTS_OR_FINISH = auto()
     CONFIRM_FULL_DATA_MANUAL_ENTRY = auto()
 
@@ -122,6 +131,41 @@ def get_new_meal_conversation_handler():
         NewMealStages.ADD_NUTRITION_MULTIPLE_ENTRIES_MANUALLY: [
             MessageHandler(text_only_filter, handle_add_nutrition_one_of_multiple)
         ],
+        NewMealStages.ENTER_FOOD_PRODUCT_SEARCH: [
+            MessageHandler(text_only_filter, handle_food_product_search),
+            MessageHandler(filters.PHOTO, handle_food_product_barcode_photo)
+        ],
+        NewMealStages.CHOOSE_FOOD_PRODUCT: [
+            CallbackQueryHandler(
+                callback=choose_food_product_callback,
+                pattern=NewMealInlineDataKey.CHOOSE_FOOD_PRODUCT.to_str()
+            ),
+            MessageHandler(text_only_filter, handle_food_product_search)
+        ],
+        NewMealStages.ENTER_FOOD_PRODUCT_WEIGHT: [
+            MessageHandler(text_only_filter, handle_food_product_weight)
+        ],
+        NewMealStages.CHOOSE_SAVED_MEAL: [
+            CallbackQueryHandler(
+                callback=choose_saved_meal_callback,
+                pattern=NewMealInlineDataKey.CHOOSE_SAVED_MEAL.to_str()
+            ),
+            CallbackQueryHandler(
+                callback=choose_suggested_meal_callback,
+                pattern=NewMealInlineDataKey.CHOOSE_SUGGESTED_MEAL.to_str()
+            ),
+            CallbackQueryHandler(
+                callback=saved_meals_page_callback,
+                pattern=NewMealInlineDataKey.SAVED_MEALS_PAGE.to_str()
+            ),
+            MessageHandler(text_only_filter, handle_saved_meal_search)
+        ],
+        NewMealStages.ENTER_SAVED_MEAL_WEIGHT: [
+            MessageHandler(text_only_filter, handle_saved_meal_weight)
+        ],
+        NewMealStages.ADD_INGREDIENTS_LIST_FOR_AI: [
+            MessageHandler(text_only_filter, handle_ingredients_list_for_ai)
+        ],
         NewMealStages.ADD_MORE_INGREDIENTS_OR_FINISH: [
             MessageHandler(text_only_filter, handle_choose_more_ingredients_or_finish)
         ],
@@ -160,6 +204,8 @@ def get_new_meal_conversation_handler():
         entry_points=entry_points,
         states=states,
         fallbacks=fallbacks,
+        name=ConversationID.NEW_MEAL.value,
+        persistent=True,
         map_to_parent={
             ConversationHandler.END: ChildEndStage.NEW_MEAL_END,
             ChildEndStage.RETURN_TO_START: ChildEndStage.RETURN_TO_START
@@ -174,7 +220,7 @@ async def init_meal_dialog_data(update, context):
             context, context.user_data[DataKeys.MEAL_DATA]
         )
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA] = dict()
-    user = dialog_utils.get_tg_user_obj(update)
+    user = await dialog_utils.get_tg_user_snapshot(update)
     if user is None:
         await dialog_utils.user_does_not_exist_message(update)
         raise RuntimeError("User does not exist")
@@ -198,10 +244,12 @@ async def handle_new_meal_inline_callback(update, context):
     parent_id = ConversationID(data_value)
     meal_dialog_data[MealDataEntry.PARENT_ID] = parent_id
 
-    user: User = meal_dialog_data[MealDataEntry.USER]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
     datetime_now = user.get_datetime_now()
 
     if parent_id == ConversationID.DAY_VIEW:
+        # the date of the day view shown to the user, not of the clicks that are not rendered yet
+        await meals_dataview_utils.cancel_day_view_render(context)
         date = pop_parent_data(context, parent_id, ConversationID.NEW_MEAL)
         meal_dialog_data[MealDataEntry.MEAL_DATE] = date
 
@@ -219,7 +267,7 @@ async def handle_new_meal_inline_callback(update, context):
 async def handle_new_meal_command(update, context):
     await init_meal_dialog_data(update, context)
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    user: User = meal_dialog_data[MealDataEntry.USER]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
     datetime_now = user.get_datetime_now()
     meal_dialog_data[MealDataEntry.MEAL_DATE] = datetime_now.date()
     meal_dialog_data[MealDataEntry.MEAL_TIME] = datetime_now.time()
@@ -229,8 +277,8 @@ async def handle_new_meal_command(update, context):
 async def start_new_meal(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
     meal_dialog_data[MealDataEntry.UPDATING_EXISTING] = False
-    user: User = meal_dialog_data[MealDataEntry.USER]
-    new_meal = MealEaten(user_id=user.id)
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
+    new_meal = MealSnapshot(user_id=user.id)
     meal_dialog_data[MealDataEntry.MEAL_OBJECT] = new_meal
 
     await dialog_utils.no_markup_message(
@@ -283,7 +331,7 @@ async def confirm_date_time_callback(update, context):
 
 async def handle_change_date(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    user: User = meal_dialog_data[MealDataEntry.USER]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
     datetime_obj = user.parse_datetime(update.message.text)
     if datetime_obj is None:
         await dialog_utils.wrong_value_message(update)
@@ -296,7 +344,7 @@ async def handle_change_date(update, context):
 
 async def handle_change_time(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    user: User = meal_dialog_data[MealDataEntry.USER]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
     datetime_obj = user.parse_datetime(update.message.text)
 
     if datetime_obj is None:
@@ -335,6 +383,7 @@ async def handle_choose_input_mode(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
 
     new_meal_utils.reset_ai_data(meal_dialog_data)
+    new_meal_utils.reset_chosen_product_and_saved_meal(meal_dialog_data)
 
     input_mode = update.message.text
 
@@ -347,15 +396,217 @@ async def handle_choose_input_mode(update, context):
         return NewMealStages.DESCRIBE_MEAL_MANUALLY
 
     elif input_mode == InputMode.BARCODE.value:
-        await dialog_utils.wrong_value_message(update, "not implemented")
-        await new_meal_utils.ask_input_mode(update)
-        return NewMealStages.CHOOSE_INPUT_MODE
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+
+    elif input_mode == InputMode.HISTORY.value:
+        meal_dialog_data.pop(MealDataEntry.SAVED_MEALS_SEARCH, None)
+        return await show_saved_meals_page(update, context)
     else:
         # assume input is a description for AI
         await dialog_utils.no_markup_message(update, f"Assuming input for AI")
         return await handle_describe_for_ai(update, context)
 
 
+async def handle_food_product_search(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    search_text = update.message.text.strip()
+
+    barcode = select_food_products.normalize_barcode(search_text)
+    if barcode == search_text.replace(" ", "") and 8 <= len(barcode) <= 14:
+        product = await select_food_products.select_food_product_by_barcode_async(barcode)
+        if product is None:
+            await dialog_utils.no_markup_message(
+                update, f"Product with barcode {barcode} not found"
+            )
+            await new_meal_utils.ask_for_food_product_search(update)
+            return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+        return await handle_food_product_chosen(update, meal_dialog_data, product)
+
+    products = await select_food_products.search_food_products_async(search_text)
+    if len(products) == 0:
+        await dialog_utils.no_markup_message(update, "No products found")
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+
+    await new_meal_utils.ask_to_choose_food_product(update, products)
+    return NewMealStages.CHOOSE_FOOD_PRODUCT
+
+
+async def handle_food_product_barcode_photo(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    photo_sizes = update.message.photo
+    if len(photo_sizes) == 0:
+        await dialog_utils.no_markup_message(update, "Failed to get an image")
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+
+    # bars need the highest available resolution
+    image_bytes = await new_meal_utils.download_telegram_photo(photo_sizes[-1])
+    barcode = await barcode_reader.decode_barcode_async(image_bytes)
+    if barcode is None:
+        await dialog_utils.no_markup_message(
+            update, "Barcode not recognized, you can send another photo or type the number"
+        )
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+
+    product = await select_food_products.select_food_product_by_barcode_async(barcode)
+    if product is None:
+        await dialog_utils.no_markup_message(
+            update, f"Product with barcode {barcode} not found"
+        )
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+    return await handle_food_product_chosen(update, meal_dialog_data, product)
+
+
+async def choose_food_product_callback(update, context):
+    await dialog_utils.handle_inline_keyboard_callback(
+        update, delete_keyboard=True
+    )
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    data = InlineButtonDataKeyValue.from_str(update.callback_query.data)
+
+    product = await select_food_products.select_food_product_by_id_async(data.value)
+    if product is None:
+        await dialog_utils.no_markup_message(update, "Product not found")
+        await new_meal_utils.ask_for_food_product_search(update)
+        return NewMealStages.ENTER_FOOD_PRODUCT_SEARCH
+    return await handle_food_product_chosen(update, meal_dialog_data, product)
+
+
+async def handle_food_product_chosen(update, meal_dialog_data, product):
+    product = FoodProductSnapshot.from_orm(product)
+    meal_dialog_data[MealDataEntry.FOOD_PRODUCT] = product
+    await new_meal_utils.ask_for_food_product_weight(update, product)
+    return NewMealStages.ENTER_FOOD_PRODUCT_WEIGHT
+
+
+async def handle_food_product_weight(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    product = meal_dialog_data[MealDataEntry.FOOD_PRODUCT]
+
+    weight = new_meal_utils.parse_weight(update.message.text)
+    if weight is None:
+        await dialog_utils.wrong_value_message(update)
+        await new_meal_utils.ask_for_food_product_weight(update, product)
+        return NewMealStages.ENTER_FOOD_PRODUCT_WEIGHT
+
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    new_meal_utils.assign_food_product(meal, product, weight)
+    await new_meal_utils.ask_to_confirm_manual_entry_data(
+        update, meal, long_nutrition=True
+    )
+    return NewMealStages.CONFIRM_FULL_DATA_MANUAL_ENTRY
+
+
+async def show_saved_meals_page(update, context, after_id=None, before_id=None):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
+    search_text = meal_dialog_data.get(MealDataEntry.SAVED_MEALS_SEARCH, None)
+    page_size = chatbot_config.saved_meals_page_size
+
+    meals, has_previous, has_next = await select_meals.select_meals_for_future_use_page_async(
+        user.id, page_size, after_id=after_id, before_id=before_id, name_prefix=search_text
+    )
+    if len(meals) == 0 and search_text:
+        # no names start with the search text, fall back to the fuzzy search
+        meals = await select_meals.search_meals_for_future_use_async(
+            user.id, search_text, limit=page_size
+        )
+        has_previous = has_next = False
+
+    suggestions = []
+    if not search_text and after_id is None and before_id is None:
+        time_of_day = TimeOfDay.from_time(meal_dialog_data[MealDataEntry.MEAL_TIME])
+        suggestions = await select_meals.select_suggested_meals_for_future_use_async(
+            user.id, time_of_day, limit=chatbot_config.saved_meal_suggestions
+        )
+        suggestions = [m for m in suggestions if m.default_weight_grams > 0]
+
+    if len(meals) == 0:
+        if search_text:
+            await dialog_utils.no_markup_message(
+                update, "No saved meals found, you can send another search"
+            )
+            return NewMealStages.CHOOSE_SAVED_MEAL
+        await dialog_utils.no_markup_message(update, "You have no saved meals yet")
+        await new_meal_utils.ask_input_mode(update)
+        return NewMealStages.CHOOSE_INPUT_MODE
+
+    await new_meal_utils.show_saved_meals_page(
+        update, meals, has_previous, has_next, suggestions
+    )
+    return NewMealStages.CHOOSE_SAVED_MEAL
+
+
+async def handle_saved_meal_search(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    meal_dialog_data[MealDataEntry.SAVED_MEALS_SEARCH] = update.message.text.strip()
+    return await show_saved_meals_page(update, context)
+
+
+async def saved_meals_page_callback(update, context):
+    await update.callback_query.answer()
+    data = InlineButtonDataKeyValue.from_str(update.callback_query.data)
+    after_id, before_id = new_meal_utils.parse_saved_meals_page_cursor(data.value)
+    return await show_saved_meals_page(update, context, after_id=after_id, before_id=before_id)
+
+
+async def choose_saved_meal_callback(update, context):
+    return await handle_saved_meal_chosen(update, context, use_default_weight=False)
+
+
+async def choose_suggested_meal_callback(update, context):
+    return await handle_saved_meal_chosen(update, context, use_default_weight=True)
+
+
+async def handle_saved_meal_chosen(update, context, use_default_weight):
+    await dialog_utils.handle_inline_keyboard_callback(
+        update, delete_keyboard=True
+    )
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
+    data = InlineButtonDataKeyValue.from_str(update.callback_query.data)
+
+    saved_meal = await select_meals.select_meal_for_future_use_by_id_async(data.value)
+    if saved_meal is None or saved_meal.user_id != user.id:
+        await dialog_utils.no_markup_message(update, "Saved meal not found")
+        return await show_saved_meals_page(update, context)
+
+    saved_meal = MealForFutureUseSnapshot.from_orm(saved_meal)
+    meal_dialog_data[MealDataEntry.SAVED_MEAL] = saved_meal
+    if use_default_weight and saved_meal.default_weight_grams > 0:
+        meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+        new_meal_utils.assign_saved_meal(meal, saved_meal, saved_meal.default_weight_grams)
+        await new_meal_utils.ask_to_confirm_manual_entry_data(
+            update, meal, long_nutrition=True
+        )
+        return NewMealStages.CONFIRM_FULL_DATA_MANUAL_ENTRY
+
+    await new_meal_utils.ask_for_saved_meal_weight(update, saved_meal)
+    return NewMealStages.ENTER_SAVED_MEAL_WEIGHT
+
+
+async def handle_saved_meal_weight(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    saved_meal = meal_dialog_data[MealDataEntry.SAVED_MEAL]
+
+    weight = new_meal_utils.parse_weight(update.message.text)
+    if weight is None:
+        await dialog_utils.wrong_value_message(update)
+        await new_meal_utils.ask_for_saved_meal_weight(update, saved_meal)
+        return NewMealStages.ENTER_SAVED_MEAL_WEIGHT
+
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    new_meal_utils.assign_saved_meal(meal, saved_meal, weight)
+    await new_meal_utils.ask_to_confirm_manual_entry_data(
+        update, meal, long_nutrition=True
+    )
+    return NewMealStages.CONFIRM_FULL_DATA_MANUAL_ENTRY
+
+
 async def handle_describe_for_ai(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
     await new_meal_utils.remove_last_skip_button(context, meal_dialog_data)
@@ -387,17 +638,15 @@ async def handle_image_for_ai(update, context):
         await new_meal_utils.ask_for_image(update, meal_dialog_data)
         return NewMealStages.ADD_IMAGE_FOR_AI
 
-    image_highest_res = images_different_res[-1]
-    image_data = await new_meal_utils.telegram_photo_obj_to_image_data(
-        image_highest_res
-    )
+    photo_obj = new_meal_utils.choose_photo_size_for_ai(images_different_res)
 
     if MealDataEntry.IMAGE_DATA_FOR_AI in meal_dialog_data:
         await dialog_utils.no_markup_message(
             update, "Multiple images received. Using the latest message."
         )
 
-    meal_dialog_data[MealDataEntry.IMAGE_DATA_FOR_AI] = image_data
+    # the photo itself is not kept in user_data, which is stored on every persistence round
+    meal_dialog_data[MealDataEntry.IMAGE_DATA_FOR_AI] = photo_obj.file_id
 
     # add caption to description
     if caption is not None:
@@ -446,18 +695,30 @@ async def skip_description_callback(update, context):
 async def process_ai_request(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
     description = meal_dialog_data.get(MealDataEntry.DESCRIPTION_FOR_AI, None)
-    image_data = meal_dialog_data.get(MealDataEntry.IMAGE_DATA_FOR_AI, None)
+    image_file_id = meal_dialog_data.get(MealDataEntry.IMAGE_DATA_FOR_AI, None)
 
+    progress_message = None
     try:
-        await dialog_utils.no_markup_message(update, "Sending request to AI...\nPlease wait")
-        ai_response = openai_meal_chat.get_meal_estimate(
-            description, image_data
+        message = await dialog_utils.no_markup_message(
+            update, "Sending request to AI...\nPlease wait", standalone=True
+        )
+        progress_message = new_meal_utils.AiEstimateProgressMessage(message)
+        image_data = None
+        if image_file_id is not None:
+            image_data = await new_meal_utils.telegram_file_id_to_image_data(
+                context.bot, image_file_id
+            )
+        ai_response = await openai_meal_chat.get_meal_estimate_async(
+            description, image_data, on_partial=progress_message.on_partial
         )
     except Exception as e:
         logger.error(f"get_meal_estimate exception: {e}" + "\n" + f"{traceback.format_exc()}")
         message = f"Error!\n Internal function get_meal_estimate exception\n{e}"
         await dialog_utils.no_markup_message(update, message)
         return await handle_cancel(update, context)
+    finally:
+        if progress_message is not None:
+            await progress_message.finish()
 
     new_data_added = await new_meal_utils.handle_new_ai_response(
         ai_response, update, meal_dialog_data
@@ -465,9 +726,12 @@ async def process_ai_request(update, context):
 
     if not new_data_added:
         new_meal_utils.reset_ai_data(meal_dialog_data)
-        await dialog_utils.no_markup_message(
-            update, "Please try again"
-        )
+        if ai_response.ai_unavailable:
+            await new_meal_utils.ai_unavailable_message(update)
+        else:
+            await dialog_utils.no_markup_message(
+                update, "Please try again"
+            )
         # give user an option not to use AI if there is a repeated problem with it
         # go back to input_mode choice question
         await new_meal_utils.ask_input_mode(update)
@@ -484,24 +748,33 @@ async def handle_more_info_for_ai(update, context):
     extra_info = update.message.text
     prev_ai_messages = meal_dialog_data[MealDataEntry.LAST_AI_MESSAGE_LIST]
 
+    progress_message = None
     try:
-        await dialog_utils.no_markup_message(update, "Sending request to AI...\nPlease wait")
-        ai_response = openai_meal_chat.update_meal_estimate(
-            prev_ai_messages, extra_info
+        message = await dialog_utils.no_markup_message(
+            update, "Sending request to AI...\nPlease wait", standalone=True
+        )
+        progress_message = new_meal_utils.AiEstimateProgressMessage(message)
+        ai_response = await openai_meal_chat.update_meal_estimate_async(
+            prev_ai_messages, extra_info, on_partial=progress_message.on_partial
         )
     except Exception as e:
         logger.error(f"update_meal_estimate exception: {e}" + "\n" + f"{traceback.format_exc()}")
         message = f"Error!\n Internal function update_meal_estimate exception\n{e}"
         await dialog_utils.no_markup_message(update, message)
         return await handle_cancel(update, context)
+    finally:
+        if progress_message is not None:
+            await progress_message.finish()
 
     new_data_added = await new_meal_utils.handle_new_ai_response(
         ai_response, update, meal_dialog_data
     )
     if not new_data_added:
-        await dialog_utils.no_markup_message(
-            update, "You can try and send another text message"
-        )
+        if ai_response.ai_unavailable:
+            message = "AI is temporarily unavailable, you can send the message again in a minute"
+        else:
+            message = "You can try and send another text message"
+        await dialog_utils.no_markup_message(update, message)
         return NewMealStages.ADD_MORE_INFO_FOR_AI
     else:
         await new_meal_utils.ask_to_confirm_ai_estimate(
@@ -538,7 +811,7 @@ async def handle_describe_manually(update, context):
     name = lines[0]
     description = lines[1] if len(lines) > 1 else ""
 
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
 
     meal.name = name
     if len(lines) > 1:
@@ -568,6 +841,9 @@ async def handle_choose_one_or_many_ingredients(update, context):
         await new_meal_utils.ask_for_multiple_ingredients_nutrition(update)
         await new_meal_utils.ask_for_next_ingredient(update, meal_dialog_data)
         return NewMealStages.ADD_NUTRITION_MULTIPLE_ENTRIES_MANUALLY
+    elif decision == new_meal_utils.OneMultipleIngredients.MULTIPLE_AI.value:
+        await new_meal_utils.ask_for_ingredients_list_for_ai(update)
+        return NewMealStages.ADD_INGREDIENTS_LIST_FOR_AI
     else:
         await dialog_utils.wrong_value_message(update)
         await new_meal_utils.ask_one_or_many_ingredients_to_enter(update)
@@ -586,7 +862,7 @@ async def handle_add_nutrition_single_entry(update, context):
         await new_meal_utils.ask_for_single_entry_nutrition(update, format_only=True)
         return NewMealStages.ADD_NUTRITION_SINGLE_ENTRY_MANUALLY
 
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     new_meal_utils.assign_nutrition_values_from_dict(
         meal, nutrition_data
     )
@@ -625,6 +901,45 @@ async def handle_add_nutrition_one_of_multiple(update, context):
     return NewMealStages.ADD_MORE_INGREDIENTS_OR_FINISH
 
 
+async def handle_ingredients_list_for_ai(update, context):
+    meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
+    ingredients_text = update.message.text.strip()
+
+    try:
+        await dialog_utils.no_markup_message(update, "Sending request to AI...\nPlease wait")
+        ingredients_output = await openai_meal_chat.get_ingredients_estimate_async(
+            ingredients_text
+        )
+    except Exception as e:
+        logger.error(f"get_ingredients_estimate exception: {e}" + "\n" + f"{traceback.format_exc()}")
+        message = f"Error!\n Internal function get_ingredients_estimate exception\n{e}"
+        await dialog_utils.no_markup_message(update, message)
+        return await handle_cancel(update, context)
+
+    if ingredients_output.ai_unavailable:
+        # same as for a meal estimate, the user can start again without AI
+        meal_dialog_data.pop(MealDataEntry.INGREDIENT_NUTRITION_DATA, None)
+        await new_meal_utils.ai_unavailable_message(update)
+        await new_meal_utils.ask_input_mode(update)
+        return NewMealStages.CHOOSE_INPUT_MODE
+
+    if not ingredients_output.success_flag or len(ingredients_output.ingredients) == 0:
+        await dialog_utils.no_markup_message(
+            update, f"OpenAI error message: \n{ingredients_output.error_message}"
+        )
+        await dialog_utils.no_markup_message(
+            update, "You can try and send another list"
+        )
+        return NewMealStages.ADD_INGREDIENTS_LIST_FOR_AI
+
+    new_meal_utils.add_ai_ingredients(meal_dialog_data, ingredients_output)
+    await new_meal_utils.describe_ingredients(
+        update, meal_dialog_data, include_total=True
+    )
+    await new_meal_utils.ask_more_ingredients_or_finish(update)
+    return NewMealStages.ADD_MORE_INGREDIENTS_OR_FINISH
+
+
 async def handle_choose_more_ingredients_or_finish(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
     decision = update.message.text
@@ -638,7 +953,7 @@ async def handle_choose_more_ingredients_or_finish(update, context):
         )
         new_meal_utils.combine_ingredients(meal_dialog_data)
         await new_meal_utils.ask_to_confirm_manual_entry_data(
-            update, meal_dialog_data, long_nutrition=True
+            update, meal_dialog_data[MealDataEntry.MEAL_OBJECT], long_nutrition=True
         )
         return NewMealStages.CONFIRM_FULL_DATA_MANUAL_ENTRY
     else:
@@ -663,7 +978,7 @@ async def handle_confirm_existing_description_manual_entry(update, context):
 
 async def handle_confirm_existing_nutrition_manual_entry(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
 
     decision = update.message.text
     if decision == KeepUpdateOption.UPDATE.value:
@@ -684,15 +999,20 @@ async def handle_confirm_existing_nutrition_manual_entry(update, context):
 
 async def handle_confirm_manual_entry_data(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     choice = update.message.text
     if choice == ConfirmManualOption.CONFIRM.value:
         if meal_dialog_data[MealDataEntry.UPDATING_EXISTING]:
             return await handle_update_meal_data(update, context)
+        elif MealDataEntry.SAVED_MEAL in meal_dialog_data:
+            # the meal is already saved
+            meal_dialog_data[MealDataEntry.SAVE_FOR_FUTURE_USE] = False
+            return await handle_new_meal_data(update, context)
         else:
             await new_meal_utils.ask_to_save_meal_for_future_use(update)
             return NewMealStages.CHOOSE_TO_SAVE_MEAL_FOR_FUTURE_USE
     elif choice == ConfirmManualOption.REENTER.value:
+        new_meal_utils.reset_chosen_product_and_saved_meal(meal_dialog_data)
         await new_meal_utils.ask_to_confirm_existing_description(
             update, meal
         )
@@ -715,7 +1035,7 @@ async def handle_confirm_save_meal_for_future_use(update, context):
     save_for_future_use = (confirm == dialog_utils.YesNo.YES.value)
 
     if save_for_future_use:
-        meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+        meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
         if meal.weight > 0:
             meal_dialog_data[MealDataEntry.SAVE_FOR_FUTURE_USE] = True
         else:
@@ -754,34 +1074,38 @@ async def handle_corrected_weight(update, context):
         return NewMealStages.ENTER_CORRECTED_WEIGHT
     else:
         meal_dialog_data[MealDataEntry.SAVE_FOR_FUTURE_USE] = True
-        meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+        meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
         meal.weight = new_weight
         return await handle_new_meal_data(update, context)
 
 
 async def handle_new_meal_data(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     save_for_future_use = meal_dialog_data[MealDataEntry.SAVE_FOR_FUTURE_USE]
+    saved_meal = meal_dialog_data.get(MealDataEntry.SAVED_MEAL, None)
 
     try:
-        with common_sql.get_session() as session:
-            if save_for_future_use:
-                update_meals.add_new_meal_for_future_use_from_meal_eaten(
-                    session, meal
-                )
-                await dialog_utils.no_markup_message(
-                    update, "New meal saved for future use"
-                )
-
-            update_meals.add_new_eaten_meal(session, meal)
-            await new_meal_utils.new_meal_added_message(
-                update, meal,
-                # offer to transfer to meal view dialog only if this is not a child conversation
-                # ie does not have a parent
-                view_meals_inline_btn=MealDataEntry.PARENT_ID not in meal_dialog_data
+        if save_for_future_use:
+            saved_meal = await update_meals.add_new_meal_for_future_use_from_meal_eaten_async(meal)
+            await dialog_utils.no_markup_message(
+                update, "New meal saved for future use"
             )
 
+        # logging a saved meal makes it rank higher among the suggestions
+        meal_eaten = meal.to_orm()
+        await update_meals.add_new_eaten_meal_async(
+            meal_eaten, meal_for_future_use_id=saved_meal.id if saved_meal is not None else None
+        )
+        # id and times are assigned on insert
+        meal = MealSnapshot.from_orm(meal_eaten)
+        await new_meal_utils.new_meal_added_message(
+            update, meal,
+            # offer to transfer to meal view dialog only if this is not a child conversation
+            # ie does not have a parent
+            view_meals_inline_btn=MealDataEntry.PARENT_ID not in meal_dialog_data
+        )
+
     except Exception as e:
         logging.exception(e)
         await dialog_utils.no_markup_message(
@@ -793,17 +1117,16 @@ async def handle_new_meal_data(update, context):
 
 async def handle_update_meal_data(update, context):
     meal_dialog_data = context.user_data[DataKeys.MEAL_DATA]
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     try:
-        with common_sql.get_session() as session:
-            updated_meal = update_meals.update_eaten_meal(session, meal)
-            meal_dialog_data[MealDataEntry.MEAL_OBJECT] = updated_meal
-            # single meal view will show description on its own
-            show_description = \
-                meal_dialog_data[MealDataEntry.PARENT_ID] != ConversationID.SINGLE_MEAL_VIEW
-            await new_meal_utils.meal_updated_message(
-                update, updated_meal, show_description
-            )
+        meal = MealSnapshot.from_orm(await update_meals.update_eaten_meal_async(meal.to_orm()))
+        meal_dialog_data[MealDataEntry.MEAL_OBJECT] = meal
+        # single meal view will show description on its own
+        show_description = \
+            meal_dialog_data[MealDataEntry.PARENT_ID] != ConversationID.SINGLE_MEAL_VIEW
+        await new_meal_utils.meal_updated_message(
+            update, meal, show_description
+        )
 
     except Exception as e:
         logging.exception(e)
@@ -863,10 +1186,9 @@ async def handle_edit_meal_inline_callback(update, context):
     meal_dialog_data[MealDataEntry.PARENT_ID] = parent_id
     meal_id = pop_parent_data(context, parent_id, ConversationID.EDIT_MEAL)
 
-    with get_session() as session:
-        existing_meal = select_meals.select_meal_eaten_by_meal_id(
-            session, meal_id
-        )
+    existing_meal = MealSnapshot.from_orm(
+        await select_meals.select_meal_eaten_by_meal_id_async(meal_id)
+    )
     if existing_meal is None:
         await dialog_utils.no_markup_message(update, "Meal data is missing")
         logger.error(f"Meal data for meal_id={meal_id} is missing")
@@ -1,22 +1,27 @@
 from telegram import ReplyKeyboardRemove, ReplyKeyboardMarkup, KeyboardButton
-from database.food_database_model import User, UserTarget
+from database.food_database_model import (
+    UserSnapshot, UserTarget, FoodProduct, MealForFutureUse, FoodProductSnapshot, MealForFutureUseSnapshot
+)
 from database.select import select_meals
-from database.common_sql import get_session
 from ai_interface.openai_meal_chat import ImageData
 from chatbot import dialog_utils
 from chatbot.inline_key_utils import (
     InlineButtonDataValueGroup, InlineButtonDataKey, inline_keys_markup,
     StartConversationDataKey
 )
-from ai_interface import openai_meal_chat
+from ai_interface import openai_meal_chat, image_utils
+from ai_interface import config as ai_config
+from chatbot import config as chatbot_config
 from database.food_database_model import (
-    MealEaten, NutritionType
+    MealSnapshot, NutritionType
 )
 from enum import Enum, auto
-from pathlib import Path
 import telegram.error
+import asyncio
 import logging
 import io
+import math
+import time
 
 
 logger = logging.getLogger(__name__)
@@ -55,6 +60,7 @@ class ConfirmManualOption(Enum):
 class OneMultipleIngredients(Enum):
     ONE = "Single meal entry"
     MULTIPLE = "Multiple ingredients"
+    MULTIPLE_AI = "Ingredients list for AI"
 
 
 class MoreIngredientsOrFinish(Enum):
@@ -96,12 +102,18 @@ class MealDataEntry(Enum):
     MEAL_DATE = auto()
     MEAL_TIME = auto()
 
+    # telegram file id of the photo, None if the photo was skipped
     IMAGE_DATA_FOR_AI = auto()
     DESCRIPTION_FOR_AI = auto()
     LAST_AI_MESSAGE_LIST = auto()
 
     INGREDIENT_NUTRITION_DATA = auto()
 
+    FOOD_PRODUCT = auto()
+
+    SAVED_MEAL = auto()
+    SAVED_MEALS_SEARCH = auto()
+
     MEAL_OBJECT = auto()
     UPDATING_EXISTING = auto()
     SAVE_FOR_FUTURE_USE = auto()
@@ -116,11 +128,21 @@ def reset_ai_data(meal_dialog_data):
     meal_dialog_data.pop(MealDataEntry.LAST_AI_MESSAGE_LIST, None)
 
 
+def reset_chosen_product_and_saved_meal(meal_dialog_data):
+    # values entered by the user no longer come from the chosen product or saved meal,
+    # the meal is not logged as a use of the saved meal
+    meal_dialog_data.pop(MealDataEntry.FOOD_PRODUCT, None)
+    meal_dialog_data.pop(MealDataEntry.SAVED_MEAL, None)
+
 
 class NewMealInlineDataKey(InlineButtonDataKey):
     SKIP_DESCRIPTION_FOR_AI = auto()
     SKIP_SAVING_FOR_FUTURE_USE = auto()
     CONFIRM_DATE_TIME = auto()
+    CHOOSE_FOOD_PRODUCT = auto()
+    CHOOSE_SAVED_MEAL = auto()
+    CHOOSE_SUGGESTED_MEAL = auto()
+    SAVED_MEALS_PAGE = auto()
 
 
 class ConfirmDateTimeBtnValue(InlineButtonDataValueGroup):
@@ -152,8 +174,8 @@ def input_mode_markup():
 
 
 async def ask_input_mode(update):
-    await update.effective_message.reply_text(
-        "Please choose input mode",
+    await dialog_utils.reply_message(
+        update, "Please choose input mode",
         reply_markup=input_mode_markup()
     )
 
@@ -169,8 +191,8 @@ def edit_mode_markup():
 
 
 async def ask_edit_mode(update):
-    await update.effective_message.reply_text(
-        "Please choose edit option",
+    await dialog_utils.reply_message(
+        update, "Please choose edit option",
         reply_markup=edit_mode_markup()
     )
 
@@ -184,8 +206,8 @@ async def ask_confirm_date_time(update, meal_dialog_data):
         f"Time: {time}\n"
     )
     markup = confirm_date_time_markup()
-    await update.effective_message.reply_text(
-        message, reply_markup=markup
+    await dialog_utils.reply_message(
+        update, message, reply_markup=markup
     )
 
 
@@ -227,8 +249,8 @@ async def ask_time_of_meal(update, date=None):
 
 
 async def ask_ai_input(update):
-    await update.message.reply_text(
-        "Using AI to determine nutrition.\n"
+    await dialog_utils.reply_message(
+        update, "Using AI to determine nutrition.\n"
         "Describe your meal. It is helpful to specify the weight.\n"
         "Optionally, attach one picture.",
         reply_markup=ReplyKeyboardRemove()
@@ -236,16 +258,16 @@ async def ask_ai_input(update):
 
 
 async def ask_for_image(update, meal_dialog_data):
-    message_obj = await update.effective_message.reply_text(
-        "Add an image",
+    message_obj = await dialog_utils.reply_message(
+        update, "Add an image",
         reply_markup=inline_keys_markup("skip", SkipDescriptionBtnValue.IMAGE_DATA_FOR_AI.to_key_value_str())
     )
     meal_dialog_data[MealDataEntry.LAST_SKIP_BUTTON_ID] = (message_obj.chat.id, message_obj.id)
 
 
 async def ask_for_description(update, meal_dialog_data):
-    message_obj = await update.effective_message.reply_text(
-        "Type your description",
+    message_obj = await dialog_utils.reply_message(
+        update, "Type your description",
         reply_markup=inline_keys_markup("skip", SkipDescriptionBtnValue.DESCRIPTION_FOR_AI.to_key_value_str())
     )
     meal_dialog_data[MealDataEntry.LAST_SKIP_BUTTON_ID] = (message_obj.chat.id, message_obj.id)
@@ -270,12 +292,12 @@ async def ask_for_meal_description(update):
         "Enter the name of the meal on the first line.\n"
         "Enter an optional description on the next line."
     )
-    await update.message.reply_text(
-        message, reply_markup=ReplyKeyboardRemove()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=ReplyKeyboardRemove()
     )
 
 
-async def ask_to_confirm_existing_description(update, meal: MealEaten):
+async def ask_to_confirm_existing_description(update, meal: MealSnapshot):
     message = (
         "Meal data:\n" +
         meal.describe_no_nutrition(with_time=False)
@@ -284,8 +306,8 @@ async def ask_to_confirm_existing_description(update, meal: MealEaten):
         update, message
     )
     await ask_for_meal_description(update)
-    await update.effective_message.reply_text(
-        "Enter new values?", reply_markup=keep_update_markup()
+    await dialog_utils.reply_message(
+        update, "Enter new values?", reply_markup=keep_update_markup()
     )
 
 def keep_update_markup():
@@ -297,22 +319,22 @@ def keep_update_markup():
 
 
 async def ask_to_confirm_existing_nutrition(update, meal_dialog_data):
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     message = (
         f"Nutrition data:\n" +
         meal.describe_nutrition_only_long() + "\n"
     )
     await dialog_utils.no_markup_message(update, message)
     await ask_for_single_entry_nutrition(update)
-    await update.effective_message.reply_text(
-        "Enter new values?", reply_markup=keep_update_markup()
+    await dialog_utils.reply_message(
+        update, "Enter new values?", reply_markup=keep_update_markup()
     )
 
 
 async def ask_one_or_many_ingredients_to_enter(update):
     message = "Specify as a single entry or as multiple ingredients?"
-    await update.message.reply_text(
-        message, reply_markup=one_multiple_markup()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=one_multiple_markup()
     )
 
 
@@ -325,8 +347,8 @@ def one_multiple_markup():
 
 async def ask_more_ingredients_or_finish(update):
     message = "Add more or finish?"
-    await update.message.reply_text(
-        message, reply_markup=add_finish_markup()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=add_finish_markup()
     )
 
 
@@ -349,8 +371,8 @@ async def ask_for_single_entry_nutrition(update, format_only=False):
     else:
         message = request_line + "\n" + format_message
 
-    await update.message.reply_text(
-        message,
+    await dialog_utils.reply_message(
+        update, message,
         reply_markup=ReplyKeyboardRemove()
     )
 
@@ -366,16 +388,170 @@ async def ask_for_multiple_ingredients_nutrition(update, format_only=False):
         message = format_message
     else:
         message = request_line + "\n" + format_message
-    await update.message.reply_text(
-        message, reply_markup=ReplyKeyboardRemove()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=ReplyKeyboardRemove()
+    )
+
+
+async def ask_for_food_product_search(update):
+    await dialog_utils.reply_message(
+        update, "Send a photo of the barcode, the barcode number or a product name",
+        reply_markup=ReplyKeyboardRemove()
+    )
+
+
+async def ask_to_choose_food_product(update, products: list[FoodProduct]):
+    text_values = [p.full_name()[:60] for p in products]
+    callback_data = [NewMealInlineDataKey.CHOOSE_FOOD_PRODUCT(p.id) for p in products]
+    await dialog_utils.reply_message(
+        update, "Choose the product or send another search",
+        reply_markup=inline_keys_markup(text_values, callback_data, n_btn_in_row=1)
+    )
+
+
+async def ask_for_food_product_weight(update, product: FoodProductSnapshot):
+    message = (
+        f"{product.full_name()}\n"
+        f"Per 100 g: {product.calories:.0f} kcal, "
+        f"fat {product.fat:.1f} g, carbs {product.carbs:.1f} g, protein {product.protein:.1f} g\n\n"
+        "Enter the weight in grams"
     )
+    await dialog_utils.reply_message(
+        update, message, reply_markup=ReplyKeyboardRemove()
+    )
+
+
+def assign_food_product(meal: MealSnapshot, product: FoodProductSnapshot, weight):
+    meal.name = product.full_name()[:100]
+    meal.description = f"{product.full_name()}, {weight:g} g"
+    assign_nutrition_values_from_dict(
+        meal, product.nutrition_for_weight_as_dict(weight)
+    )
+
+
+def saved_meals_page_markup(
+        meals: list[MealForFutureUse], has_previous, has_next,
+        suggestions: list[MealForFutureUse] = ()
+):
+    # page cursors hold only the id of the first or last meal on the page,
+    # the search text stays in the dialog data to keep callback data within 64 bytes
+    # suggestions are logged with the default weight with one tap
+    text_values = [
+        f"★ {m.name[:50]}, {float(m.default_weight_grams):g} g" for m in suggestions
+    ]
+    callback_data = [NewMealInlineDataKey.CHOOSE_SUGGESTED_MEAL(m.id) for m in suggestions]
+    text_values += [m.name[:60] for m in meals]
+    callback_data += [NewMealInlineDataKey.CHOOSE_SAVED_MEAL(m.id) for m in meals]
+    n_btn_in_row = [1] * len(text_values)
+
+    navigation = []
+    if has_previous:
+        text_values.append("◀")
+        callback_data.append(NewMealInlineDataKey.SAVED_MEALS_PAGE(f"p{meals[0].id}"))
+        navigation.append(1)
+    if has_next:
+        text_values.append("▶")
+        callback_data.append(NewMealInlineDataKey.SAVED_MEALS_PAGE(f"n{meals[-1].id}"))
+        navigation.append(1)
+    if navigation:
+        n_btn_in_row.append(len(navigation))
+
+    return inline_keys_markup(text_values, callback_data, n_btn_in_row=n_btn_in_row)
+
+
+def parse_weight(text):
+    # returns None for text that is not a weight in grams,
+    # float() also accepts nan, inf and values too large for the database
+    try:
+        weight = float(text.strip())
+    except ValueError:
+        return None
+    if not math.isfinite(weight) or weight <= 0 or weight > chatbot_config.max_meal_weight_grams:
+        return None
+    return weight
+
+
+def parse_saved_meals_page_cursor(value):
+    # returns (after_id, before_id)
+    value = str(value)
+    meal_id = int(value[1:])
+    if value[0] == "p":
+        return None, meal_id
+    return meal_id, None
+
+
+async def show_saved_meals_page(
+        update, meals: list[MealForFutureUse], has_previous, has_next,
+        suggestions: list[MealForFutureUse] = ()
+):
+    markup = saved_meals_page_markup(meals, has_previous, has_next, suggestions)
+    if update.callback_query is not None:
+        # page navigation replaces the keyboard of the same message
+        try:
+            await update.callback_query.edit_message_reply_markup(markup)
+        except telegram.error.BadRequest as e:
+            dialog_utils.pass_exception_if_message_not_modified(e)
+    else:
+        await dialog_utils.reply_message(
+            update, "Choose a saved meal or send a part of its name to search",
+            reply_markup=markup
+        )
+
+
+async def ask_for_saved_meal_weight(update, saved_meal: MealForFutureUseSnapshot):
+    message = (
+        f"{saved_meal.name}\n"
+        f"Per 100 g: {saved_meal.calories_per_100g:.0f} kcal, "
+        f"fat {saved_meal.fat_per_100g:.1f} g, carbs {saved_meal.carbs_per_100g:.1f} g, "
+        f"protein {saved_meal.protein_per_100g:.1f} g\n\n"
+        "Enter the weight in grams"
+    )
+    if saved_meal.default_weight_grams > 0:
+        reply_markup = ReplyKeyboardMarkup(
+            [[KeyboardButton(f"{float(saved_meal.default_weight_grams):g}")]], resize_keyboard=True
+        )
+    else:
+        reply_markup = ReplyKeyboardRemove()
+    await dialog_utils.reply_message(update, message, reply_markup=reply_markup)
+
+
+def assign_saved_meal(meal: MealSnapshot, saved_meal: MealForFutureUseSnapshot, weight):
+    meal.name = saved_meal.name
+    meal.description = saved_meal.description
+    assign_nutrition_values_from_dict(
+        meal, saved_meal.nutrition_for_weight_as_dict(weight)
+    )
+
+
+async def ask_for_ingredients_list_for_ai(update):
+    message = (
+        "Send the list of ingredients in one message, for example:\n"
+        "oatmeal 80g, banana, 2 eggs"
+    )
+    await dialog_utils.reply_message(
+        update, message, reply_markup=ReplyKeyboardRemove()
+    )
+
+
+def add_ai_ingredients(meal_dialog_data, ingredients_output):
+    named_ingredients = meal_dialog_data.get(MealDataEntry.INGREDIENT_NUTRITION_DATA, [])
+    for ingredient in ingredients_output.ingredients:
+        nutrition_data = {
+            NutritionType.CALORIES: float(ingredient.calories),
+            NutritionType.FAT: float(ingredient.fat),
+            NutritionType.PROTEIN: float(ingredient.protein),
+            NutritionType.CARBS: float(ingredient.carbohydrate),
+            NutritionType.WEIGHT: float(ingredient.total_weight),
+        }
+        named_ingredients.append((ingredient.name, nutrition_data))
+    meal_dialog_data[MealDataEntry.INGREDIENT_NUTRITION_DATA] = named_ingredients
 
 
 async def ask_for_next_ingredient(update, meal_dialog_data):
     n_ingredients = len(meal_dialog_data.get(MealDataEntry.INGREDIENT_NUTRITION_DATA, []))
     new_ingredient_ord = n_ingredients + 1
-    await update.message.reply_text(
-        f"Ingredient {new_ingredient_ord}:",
+    await dialog_utils.reply_message(
+        update, f"Ingredient {new_ingredient_ord}:",
         reply_markup=ReplyKeyboardRemove()
     )
 
@@ -399,8 +575,8 @@ async def ask_to_confirm_ai_estimate(update, meal, show_estimates=True):
     # need to use update.effective_message
     # choosing to skip description or image input for AI
     # will make update.message None
-    await update.effective_message.reply_text(
-        "Confirm data?", reply_markup=confirm_ai_markup()
+    await dialog_utils.reply_message(
+        update, "Confirm data?", reply_markup=confirm_ai_markup()
     )
 
 
@@ -414,17 +590,17 @@ def confirm_ai_markup():
     )
 
 
-async def ask_to_confirm_manual_entry_data(update, meal: MealEaten, long_nutrition=False):
+async def ask_to_confirm_manual_entry_data(update, meal: MealSnapshot, long_nutrition=False):
     await dialog_utils.no_markup_message(
         update, meal.describe(long_format=long_nutrition)
     )
-    await update.message.reply_text(
-        "Confirm data?", reply_markup=confirm_data_markup()
+    await dialog_utils.reply_message(
+        update, "Confirm data?", reply_markup=confirm_data_markup()
     )
 
-def get_warning_if_calories_exceeded(meal_dialog_data):
-    total_calories, calories_target = get_calories_check_values(meal_dialog_data)
-    user: User = meal_dialog_data[MealDataEntry.USER]
+async def get_warning_if_calories_exceeded(meal_dialog_data):
+    total_calories, calories_target = await get_calories_check_values(meal_dialog_data)
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
     print(user.user_target_obj.target_type, total_calories, calories_target)
     if (
         user.user_target_obj.target_type == UserTarget.Type.MAXIMUM.value and
@@ -434,9 +610,9 @@ def get_warning_if_calories_exceeded(meal_dialog_data):
     else:
         return None
 
-def get_calories_check_values(meal_dialog_data):
-    user: User = meal_dialog_data[MealDataEntry.USER]
-    new_meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+async def get_calories_check_values(meal_dialog_data):
+    user: UserSnapshot = meal_dialog_data[MealDataEntry.USER]
+    new_meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
 
     calories_target = user.user_target_obj.calories
     if new_meal.created_local_datetime is None:
@@ -444,9 +620,8 @@ def get_calories_check_values(meal_dialog_data):
     else:
         date = new_meal.created_local_datetime.date()
 
-    with get_session() as session:
-        meals = select_meals.get_meals_for_one_day(session, date, user)
-    total_calories = sum([float(m.calories) for m in meals]) + float(new_meal.calories)
+    nutrition_total = await select_meals.get_nutrition_totals_for_one_day_async(date, user)
+    total_calories = float(nutrition_total[NutritionType.CALORIES]) + float(new_meal.calories)
     return total_calories, calories_target
 
 
@@ -469,8 +644,8 @@ async def describe_ingredients(update, meal_dialog_data, include_total=False):
         message_lines.append(total_line)
 
     message = "\n".join(message_lines)
-    await update.message.reply_text(
-        message, reply_markup=ReplyKeyboardRemove()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=ReplyKeyboardRemove()
     )
 
 
@@ -481,7 +656,7 @@ def combine_ingredients(meal_dialog_data):
         [nut for (name, nut) in named_ingredients]
     )
 
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     assign_nutrition_values_from_dict(meal, nutrition_added)
 
     if len(names) > 0:
@@ -510,7 +685,7 @@ def confirm_data_markup():
 
 
 def nutrition_data_two_lines(meal_dialog_data):
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
     nutrition_data = meal.nutrition_as_dict()
     nutrition_format = one_line_nutrition_format()
     nutrition_string = nutrition_dict_to_str(nutrition_data)
@@ -530,19 +705,115 @@ def float_val_to_string(val):
     return val_string
 
 
-async def telegram_photo_obj_to_image_data(photo_obj):
-    image_info = await photo_obj.get_file()
-    extension = Path(image_info.file_path).suffix[1:]
+def choose_photo_size_for_ai(photo_sizes):
+    # telegram sends the same photo in several resolutions,
+    # the smallest one covering the resolution used by the model is enough
+    min_side = ai_config.image_max_side
+    adequate_sizes = [p for p in photo_sizes if max(p.width, p.height) >= min_side]
+    if len(adequate_sizes) == 0:
+        return max(photo_sizes, key=lambda p: p.width * p.height)
+    return min(adequate_sizes, key=lambda p: p.width * p.height)
+
+
+async def download_telegram_photo(photo_obj):
+    return await download_telegram_file(await photo_obj.get_file())
+
+
+async def download_telegram_file(image_info):
     with io.BytesIO() as bytes_io:
         await image_info.download_to_memory(bytes_io)
         bytes_io.seek(0)
-        image_bytes = bytes_io.read()
-    return ImageData(image_data=image_bytes, extension=extension)
+        return bytes_io.read()
+
+
+async def telegram_file_id_to_image_data(bot, file_id):
+    # the dialog data keeps only the file id of the photo,
+    # it is downloaded again when the AI request is made
+    image_bytes = await download_telegram_file(await bot.get_file(file_id))
+    # decoding and encoding is CPU work, keep it off the event loop
+    jpeg_bytes = await asyncio.to_thread(image_utils.downscale_to_jpeg, image_bytes)
+    return ImageData(image_data=jpeg_bytes, extension="jpeg")
+
+
+class AiEstimateProgressMessage:
+    # shows the partial AI estimate by editing one message while the response is streamed
+    # edits run in a separate task, so that the stream is not blocked by telegram requests
+    partial_number_fields = [
+        ("calories", "Calories"),
+        ("protein", "Protein"),
+        ("fat", "Fat"),
+        ("carbohydrate", "Carbs"),
+        ("total_weight", "Weight"),
+    ]
+
+    def __init__(self, message, min_interval_seconds=None):
+        if min_interval_seconds is None:
+            min_interval_seconds = chatbot_config.ai_progress_edit_interval_seconds
+        self.message = message
+        self.min_interval_seconds = min_interval_seconds
+        self._shown_text = message.text
+        self._pending_text = None
+        self._last_edit_time = 0.0
+        self._edit_task = None
+
+    def on_partial(self, partial_output):
+        text = AiEstimateProgressMessage.describe_partial_output(partial_output)
+        if text is None:
+            return
+        self._pending_text = text
+        if self._edit_task is None or self._edit_task.done():
+            self._edit_task = asyncio.create_task(self._edit_loop())
+
+    async def _edit_loop(self):
+        while self._pending_text is not None and self._pending_text != self._shown_text:
+            delay = self._last_edit_time + self.min_interval_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            text = self._pending_text
+            try:
+                await self.message.edit_text(text)
+            except telegram.error.TelegramError as e:
+                logger.warning(f"failed to edit AI estimate progress message: {e}")
+            self._shown_text = text
+            self._last_edit_time = time.monotonic()
+
+    async def finish(self):
+        # the complete estimate is sent as separate messages, pending edits are not needed
+        if self._edit_task is not None and not self._edit_task.done():
+            self._edit_task.cancel()
+            try:
+                await self._edit_task
+            except asyncio.CancelledError:
+                pass
+
+    @staticmethod
+    def describe_partial_output(partial_output):
+        lines = []
+        name = partial_output.get("name", "")
+        if isinstance(name, str) and len(name) > 0:
+            lines.append(name)
+        for key, label in AiEstimateProgressMessage.partial_number_fields:
+            value = partial_output.get(key, None)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"{label}: {value:.0f}")
+
+        if len(lines) == 0:
+            return None
+        return "Receiving AI estimate...\n\n" + "\n".join(lines)
+
+
+async def ai_unavailable_message(update):
+    await dialog_utils.no_markup_message(
+        update,
+        "AI is temporarily unavailable.\n"
+        f"Please choose \"{InputMode.MANUAL.value}\" input mode to enter the meal manually"
+    )
 
 
 async def ask_for_more_information(update):
-    await update.message.reply_text(
-        "Send a message with additional information about the meal",
+    await dialog_utils.reply_message(
+        update, "Send a message with additional information about the meal",
         reply_markup=ReplyKeyboardRemove()
     )
 
@@ -555,7 +826,7 @@ async def handle_new_ai_response(ai_response, update, meal_dialog_data):
         )
         return False
 
-    meal: MealEaten = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
+    meal: MealSnapshot = meal_dialog_data[MealDataEntry.MEAL_OBJECT]
 
     print("ai_meal_data", ai_meal_data)
 
@@ -581,8 +852,8 @@ def make_ai_message_list_from_meal(meal_dialog_data):
 
 async def ask_to_save_meal_for_future_use(update):
     message = "Save meal for future use?"
-    await update.message.reply_text(
-        message, reply_markup=dialog_utils.yes_no_markup()
+    await dialog_utils.reply_message(
+        update, message, reply_markup=dialog_utils.yes_no_markup()
     )
 
 
@@ -591,8 +862,8 @@ async def ask_for_positive_weight(update, meal_dialog_data):
         "To save data for future use, weight must be positive.\n"
         "Please enter a new meal weight value"
     )
-    message_obj = await update.message.reply_text(
-        message, reply_markup=inline_keys_markup(
+    message_obj = await dialog_utils.reply_message(
+        update, message, reply_markup=inline_keys_markup(
             "skip saving for future use", NewMealInlineDataKey.SKIP_SAVING_FOR_FUTURE_USE.to_str()
         )
     )
@@ -600,7 +871,7 @@ async def ask_for_positive_weight(update, meal_dialog_data):
 
 
 
-async def new_meal_added_message(update, meal: MealEaten, view_meals_inline_btn=False):
+async def new_meal_added_message(update, meal: MealSnapshot, view_meals_inline_btn=False):
     if view_meals_inline_btn:
         reply_markup = inline_keys_markup(
             "View meals",
@@ -612,12 +883,12 @@ async def new_meal_added_message(update, meal: MealEaten, view_meals_inline_btn=
     await dialog_utils.no_markup_message(
         update, meal.describe()
     )
-    await update.message.reply_text(
-        "New meal added", reply_markup=reply_markup
+    await dialog_utils.reply_message(
+        update, "New meal added", reply_markup=reply_markup
     )
 
 
-async def meal_updated_message(update, meal: MealEaten, show_description=True):
+async def meal_updated_message(update, meal: MealSnapshot, show_description=True):
     if show_description:
         await dialog_utils.no_markup_message(
             update, meal.describe()
@@ -20,6 +20,8 @@ class ConversationID(TextEnum):
     NUTRITION = auto()
     NEW_MEAL = auto()
     EDIT_MEAL = auto()
+    NEW_USER = auto()
+    UPDATE_USER = auto()
 
 
 def set_parent_data(context, parent_id, child_id, data):
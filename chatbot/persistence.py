@@ -0,0 +1,167 @@
+from telegram.ext import BasePersistence, PersistenceInput
+from database.select import select_bot_state
+from database.update import update_bot_state
+import asyncio
+import logging
+import pickle
+import json
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+
+class MysqlPersistence(BasePersistence):
+    # stores context.user_data and conversation handler states in mysql
+    # application calls update_* for changed data every update_interval seconds,
+    # the changes of one call round are collected and written in one transaction
+    # user_data is loaded when the first update of the user is processed after a restart,
+    # conversation states are small and are loaded when the application starts
+    # failed writes are retried with a growing delay, until then the changes are kept in memory
+    min_retry_delay_seconds = 1
+    max_retry_delay_seconds = 60
+
+    def __init__(self, update_interval=60):
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval
+        )
+        self._loaded_user_ids = set()
+        self._pending_user_data = dict()
+        self._pending_conversation_states = dict()
+        self._write_task = None
+        self._retry_handle = None
+        self._retry_delay = 0
+
+    async def get_user_data(self):
+        return dict()
+
+    async def get_chat_data(self):
+        return dict()
+
+    async def get_bot_data(self):
+        return dict()
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        stored_states = await select_bot_state.select_bot_conversation_states_async(name)
+        conversations = dict()
+        for key_str, state_data in stored_states.items():
+            try:
+                conversations[tuple(json.loads(key_str))] = pickle.loads(state_data)
+            except Exception as e:
+                # a state from an older version of the dialogs, the conversation starts over
+                logger.warning(f"conversation {name} {key_str} state can not be restored: {e}")
+        return conversations
+
+    async def update_conversation(self, name, key, new_state):
+        key_str = json.dumps(key)
+        if new_state is None:
+            state_data = None
+        else:
+            state_data = pickle.dumps(new_state, protocol=pickle.HIGHEST_PROTOCOL)
+        self._pending_conversation_states[(name, key_str)] = state_data
+        self._schedule_write()
+
+    async def update_user_data(self, user_id, data):
+        try:
+            self._pending_user_data[user_id] = dump_user_data(data)
+        except Exception as e:
+            logger.error(f"user_data of user {user_id} can not be stored: {e}")
+            return
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def drop_user_data(self, user_id):
+        self._pending_user_data[user_id] = None
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._loaded_user_ids:
+            return
+        stored_data = await select_bot_state.select_bot_user_data_async(user_id)
+        # data of the user may have been loaded by a concurrent update
+        if user_id in self._loaded_user_ids:
+            return
+        self._loaded_user_ids.add(user_id)
+        if stored_data is None:
+            return
+        try:
+            user_data.update(load_user_data(stored_data))
+        except Exception as e:
+            logger.warning(f"user_data of user {user_id} can not be restored: {e}")
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        # the application is stopped, a retry that is not due yet is made now
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+            self._retry_handle = None
+        if self._write_task is not None:
+            await self._write_task
+        await self._write_pending()
+
+    def _schedule_write(self):
+        # after a failed write the new changes wait for the retry
+        if self._retry_handle is not None:
+            return
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_pending())
+
+    def _retry_write(self):
+        self._retry_handle = None
+        self._schedule_write()
+
+    async def _write_pending(self):
+        # changes added while a batch is written are written by the next iteration
+        while True:
+            # let the other update_* calls of the same round add their changes
+            await asyncio.sleep(0)
+            if not self._pending_user_data and not self._pending_conversation_states:
+                return
+
+            user_data, self._pending_user_data = self._pending_user_data, dict()
+            conversation_states, self._pending_conversation_states = self._pending_conversation_states, dict()
+            try:
+                await update_bot_state.write_bot_state_async(user_data, conversation_states)
+            except Exception as e:
+                # newer changes made while writing take precedence
+                self._pending_user_data = user_data | self._pending_user_data
+                self._pending_conversation_states = conversation_states | self._pending_conversation_states
+                self._retry_delay = min(
+                    max(2 * self._retry_delay, self.min_retry_delay_seconds), self.max_retry_delay_seconds
+                )
+                logger.error(f"bot state write failed: {e}, retrying in {self._retry_delay} seconds")
+                self._retry_handle = asyncio.get_running_loop().call_later(
+                    self._retry_delay, self._retry_write
+                )
+                return
+            self._retry_delay = 0
+
+
+def dump_user_data(data):
+    return zlib.compress(pickle.dumps(dict(data), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_user_data(stored_data):
+    return pickle.loads(zlib.decompress(stored_data))
@@ -0,0 +1,123 @@
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from itertools import count
+import datetime
+import asyncio
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # allows bursts of up to capacity requests, then rate requests per second
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # waiters acquire tokens in FIFO order
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def is_full(self):
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+class ChatRateLimiter(BaseRateLimiter):
+    # delays bot api requests to stay within the overall and per chat limits of telegram
+    # when telegram answers with a flood control error anyway, all requests wait for
+    # the time given in the error and the request is repeated
+    max_chat_buckets = 1000
+
+    def __init__(
+        self, requests_per_second, chat_messages_per_second, chat_message_burst,
+        group_messages_per_minute, max_retries
+    ):
+        self.chat_messages_per_second = chat_messages_per_second
+        self.chat_message_burst = chat_message_burst
+        self.group_messages_per_minute = group_messages_per_minute
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(requests_per_second, requests_per_second)
+        self._chat_buckets = dict()
+        self._paused_until = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id", None)
+        for attempt in count():
+            await self._wait_for_flood_control()
+            # the chat limit is applied first, waiting for a busy chat does not hold overall capacity
+            if chat_id is not None:
+                await self._get_chat_bucket(chat_id).acquire()
+            await self._global_bucket.acquire()
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = get_retry_after_seconds(e)
+                logger.warning(
+                    f"flood control on {endpoint} for chat {chat_id}, "
+                    f"retrying in {retry_after} seconds"
+                )
+                # flood control applies to the whole bot
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    async def _wait_for_flood_control(self):
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+    def _get_chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id, None)
+        if bucket is not None:
+            return bucket
+
+        if len(self._chat_buckets) >= self.max_chat_buckets:
+            # full buckets are in the same state as new ones
+            self._chat_buckets = {
+                k: b for k, b in self._chat_buckets.items() if not b.is_full()
+            }
+
+        if is_group_chat_id(chat_id):
+            bucket = TokenBucket(self.group_messages_per_minute / 60, 1)
+        else:
+            bucket = TokenBucket(self.chat_messages_per_second, self.chat_message_burst)
+        self._chat_buckets[chat_id] = bucket
+        return bucket
+
+
+def is_group_chat_id(chat_id):
+    # group and channel ids are negative, channels can also be referred to by @username
+    if isinstance(chat_id, str):
+        return not chat_id.lstrip("-").isdigit() or chat_id.startswith("-")
+    return chat_id < 0
+
+
+def get_retry_after_seconds(e: RetryAfter):
+    retry_after = e.retry_after
+    if isinstance(retry_after, datetime.timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
@@ -2,7 +2,7 @@ from telegram.ext import ConversationHandler, CommandHandler
 from chatbot.config import Commands
 from enum import Enum, auto
 from chatbot import dialog_utils
-from chatbot.parent_child_utils import ChildEndStage
+from chatbot.parent_child_utils import ChildEndStage, ConversationID
 from database import common_sql
 from database.select import select_users
 from chatbot.start_menu import start_menu_utils
@@ -45,12 +45,14 @@ def get_start_menu_conversation_handler(
         entry_points=entry_points,
         states=states,
         fallbacks=fallbacks,
+        name=ConversationID.START_MENU.value,
+        persistent=True
     )
     return handler
 
 
 async def create_start_options(update, callback):
-    user = dialog_utils.get_tg_user_obj(update)
+    user = await dialog_utils.get_tg_user_snapshot(update)
     if user is None:
         await start_menu_utils.send_new_user_options(update)
         return StartStages.NEW_USER_CHOOSE_ACTION
@@ -11,8 +11,8 @@ async def send_new_user_options(update):
         ["Register new user"],
         [StartConversationDataKey.NEW_USER.to_str(ConversationID.START_MENU.value)]
     )
-    await update.effective_message.reply_text(
-        "Your user account does not exist. You need to register.",
+    await dialog_utils.reply_message(
+        update, "Your user account does not exist. You need to register.",
         reply_markup=reply_markup
     )
 
@@ -39,13 +39,13 @@ async def send_existing_user_options(update, user):
         ],
         1
     )
-    await update.effective_message.reply_text(
-        "Please select an action", reply_markup=reply_markup
+    await dialog_utils.reply_message(
+        update, "Please select an action", reply_markup=reply_markup
     )
 
 
 async def handle_return_to_start(update, context):
     # common handler for child conversation to return to start menu
-    user = dialog_utils.get_tg_user_obj(update)
+    user = await dialog_utils.get_tg_user_snapshot(update)
     await send_existing_user_options(update, user)
     return ChildEndStage.RETURN_TO_START
@@ -0,0 +1,57 @@
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import asyncio
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # processes updates from different users concurrently,
+    # while updates from the same user are processed one at a time in arrival order
+    # (conversation handler states depend on the order of user updates)
+    def __init__(self, workers, max_pending_updates=None):
+        if max_pending_updates is None:
+            max_pending_updates = 64 * workers
+        # the base class semaphore only limits the number of updates in flight
+        # (processed or waiting for the previous update of the same user)
+        # the number of updates processed at once is limited by the number of workers
+        # this way a user with a queue of updates does not occupy the slots of other users
+        super().__init__(max_pending_updates)
+        self.workers = workers
+        self._workers_semaphore = asyncio.Semaphore(workers)
+        # order key -> [lock, number of updates holding or waiting for the lock]
+        self._order_locks = dict()
+
+    async def do_process_update(self, update, coroutine):
+        key = get_update_order_key(update)
+        if key is None:
+            async with self._workers_semaphore:
+                await coroutine
+            return
+
+        lock_entry = self._order_locks.setdefault(key, [asyncio.Lock(), 0])
+        lock_entry[1] += 1
+        try:
+            # asyncio.Lock wakes up waiters in FIFO order
+            # and update tasks reach this point in the order updates were received
+            async with lock_entry[0]:
+                async with self._workers_semaphore:
+                    await coroutine
+        finally:
+            lock_entry[1] -= 1
+            if lock_entry[1] == 0:
+                self._order_locks.pop(key, None)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def get_update_order_key(update):
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return "user", update.effective_user.id
+    if update.effective_chat is not None:
+        return "chat", update.effective_chat.id
+    return None
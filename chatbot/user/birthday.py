@@ -2,8 +2,8 @@ import datetime
 import logging
 from telegram.ext import filters, MessageHandler
 from chatbot import dialog_utils
-from database import common_sql
 from database.select import select_users
+from database.update import update_users
 import calendar
 
 
@@ -75,19 +75,18 @@ async def send_birthday_message(update, user):
 
 
 async def _check_for_birthday_unsafe(update, context):
-    with common_sql.get_session() as session:
-        user = select_users.select_user_by_telegram_id(
-            session, update.message.from_user.id
-        )
-        if user is None:
-            return
+    user = await select_users.select_user_snapshot_by_telegram_id_cached_async(
+        update.message.from_user.id
+    )
+    if user is None:
+        return
 
-        birthday_message_sent = await send_birthday_message(update, user)
+    birthday_message_sent = await send_birthday_message(update, user)
 
-        if birthday_message_sent:
-            user.last_birthday_congratulated = user.get_datetime_now().year
-            session.merge(user)
-            session.commit()
+    if birthday_message_sent:
+        await update_users.set_last_birthday_congratulated_async(
+            user.id, user.get_datetime_now().year
+        )
 
 
 async def check_for_birthday(update, context):
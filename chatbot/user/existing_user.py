@@ -1,4 +1,3 @@
-from database import common_sql
 from database.select import select_users
 from database.update import update_users
 from chatbot.config import Commands
@@ -7,7 +6,7 @@ import logging
 
 
 async def get_existing_user_data(update, context):
-    user = dialog_utils.get_tg_user_obj(update)
+    user = await dialog_utils.get_tg_user_obj(update)
 
     if user is None:
         await dialog_utils.no_markup_message(
@@ -30,8 +29,7 @@ async def delete_user(update, context):
     # todo only for testing
     tg_id = str(update.message.from_user.id)
     try:
-        with common_sql.get_session() as session:
-            success = update_users.delete_user_by_telegram_id(session, tg_id)
+        success = await update_users.delete_user_by_telegram_id_async(tg_id)
 
         if success:
             await dialog_utils.no_markup_message(
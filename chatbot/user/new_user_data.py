@@ -9,7 +9,6 @@ import dateparser
 import timezonefinder
 from chatbot.config import Commands, registration_password
 from dateutil import tz
-from database import common_sql
 from database.update import update_users
 from database.select import select_users
 from chatbot.user import user_utils
@@ -20,6 +19,7 @@ from chatbot.user.user_utils import (
 )
 from chatbot.config import DataKeys
 from chatbot.inline_key_utils import StartConversationDataKey
+from chatbot.parent_child_utils import ConversationID
 from database.food_database_model import (
     User, TimeZone, GoalSqlEntry, MaleFemaleSqlEntry, ActivityLevelSqlEntry, NutritionType, UserTarget
 )
@@ -102,11 +102,15 @@ def get_new_user_update_user_conv_handlers():
         entry_points=new_user_entry_points,
         states=new_user_states,
         fallbacks=fallbacks,
+        name=ConversationID.NEW_USER.value,
+        persistent=True
     )
     update_user_handler = ConversationHandler(
         entry_points=update_user_entry_points,
         states=update_user_states,
         fallbacks=fallbacks,
+        name=ConversationID.UPDATE_USER.value,
+        persistent=True
     )
     return new_user_handler, update_user_handler
 
@@ -119,7 +123,7 @@ async def handle_new_user_command(update, context):
     context.user_data[DataKeys.USER_DATA] = dict()
     user_data = context.user_data[DataKeys.USER_DATA]
 
-    old_user = dialog_utils.get_tg_user_obj(update)
+    old_user = await dialog_utils.get_tg_user_snapshot(update)
 
     if old_user is not None:
         response = "User exists. "
@@ -128,8 +132,8 @@ async def handle_new_user_command(update, context):
         else:
             response += "User awaits activation"
         response += f"\nUse /{Commands.UPDATE_USER.value} instead"
-        await update.message.reply_text(
-            response, reply_markup=ReplyKeyboardRemove()
+        await dialog_utils.reply_message(
+            update, response, reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
 
@@ -162,7 +166,7 @@ async def handle_update_user_command(update, context):
     context.user_data[DataKeys.USER_DATA] = dict()
     user_data = context.user_data[DataKeys.USER_DATA]
 
-    old_user = dialog_utils.get_tg_user_obj(update)
+    old_user = await dialog_utils.get_tg_user_obj(update)
 
     if old_user is None:
         await dialog_utils.user_does_not_exist_message(update)
@@ -278,7 +282,7 @@ async def handle_timezone(update, context):
         timezone_obj = None
 
     if timezone_obj is not None:
-        new_user.timezone_obj = TimeZone.get_if_exists_or_create_new(timezone=timezone_str)
+        new_user.timezone_obj = await TimeZone.get_if_exists_or_create_new_async(timezone=timezone_str)
     else:
         await dialog_utils.wrong_value_message(update)
         return NewUserStages.TIMEZONE
@@ -534,13 +538,12 @@ async def process_new_user_data(update, context):
     await dialog_utils.no_markup_message(update, summary)
 
     try:
-        with common_sql.get_session() as session:
-            if old_user is not None:
-                new_user.id = old_user.id
-                updated_user = update_users.update_user(session, new_user)
-                user_data[UserDataEntry.NEW_USER_OBJECT] = updated_user
-            else:
-                update_users.add_new_user(session, new_user)
+        if old_user is not None:
+            new_user.id = old_user.id
+            updated_user = await update_users.update_user_async(new_user)
+            user_data[UserDataEntry.NEW_USER_OBJECT] = updated_user
+        else:
+            await update_users.add_new_user_async(new_user)
         await dialog_utils.no_markup_message(update, "New data added")
     except Exception as e:
         logging.exception(e)
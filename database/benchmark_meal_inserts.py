@@ -0,0 +1,64 @@
+from database.food_database_model import MealEaten, User, food_database_callbacks, utils
+from database import common_sql
+import sqlalchemy as sa
+import argparse
+import datetime
+import time
+
+
+# compares the timezone lookup of the MealEaten before_insert hook,
+# a nested session loading the user for every row against the cached lookup by user id
+# meals are inserted one flush at a time as add_new_eaten_meal does,
+# the transaction is rolled back and the database is left unchanged
+
+
+def get_timezone_with_nested_session(connection, meal: MealEaten):
+    # the lookup used before the cache
+    with sa.orm.Session(bind=connection) as session:
+        return utils.get_user_timezone(session, meal.user_id)
+
+
+def insert_meals(user_id, n_meals):
+    start_local_datetime = datetime.datetime(2000, 1, 1)
+    with common_sql.get_session() as session:
+        start = time.perf_counter()
+        for i in range(n_meals):
+            # only the local time is given, the hook computes the utc time in the user's timezone
+            session.add(MealEaten(
+                user_id=user_id, name="benchmark meal",
+                created_local_datetime=start_local_datetime + datetime.timedelta(minutes=i)
+            ))
+            session.flush()
+        elapsed = time.perf_counter() - start
+        session.rollback()
+    return elapsed
+
+
+def run_benchmark(user_id, n_meals):
+    with common_sql.get_session() as session:
+        if session.get(User, user_id) is None:
+            print(f"user with id {user_id} not found")
+            return
+
+    cached_lookup = food_database_callbacks.get_inserted_meal_timezone
+    try:
+        food_database_callbacks.get_inserted_meal_timezone = get_timezone_with_nested_session
+        elapsed = insert_meals(user_id, n_meals)
+    finally:
+        food_database_callbacks.get_inserted_meal_timezone = cached_lookup
+    print(f"nested session: {elapsed:.2f} s, {n_meals / elapsed:.0f} rows per second")
+
+    utils.user_timezone_names.clear()
+    elapsed = insert_meals(user_id, n_meals)
+    print(f"cached lookup: {elapsed:.2f} s, {n_meals / elapsed:.0f} rows per second")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark inserting meals with and without the cached timezone lookup"
+    )
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--meals", type=int, default=10000)
+    args = parser.parse_args()
+    common_sql.init_sqlalchemy_engine()
+    run_benchmark(args.user_id, args.meals)
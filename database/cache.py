@@ -0,0 +1,70 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class TtlLruCache:
+    # thread-safe in-memory cache with least-recently-used eviction
+    # and a time-to-live for every entry
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # incremented on every invalidation, allows readers to detect
+        # that data they have read from the database may already be outdated
+        self._generation = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            # value was produced before the last invalidation and may be stale
+            if generation is not None and generation != self._generation:
+                return False
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def pop_where(self, predicate):
+        with self._lock:
+            self._generation += 1
+            keys = [k for k, (_, v) in self._entries.items() if predicate(k, v)]
+            for k in keys:
+                del self._entries[k]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,5 +1,8 @@
 from database import config
+from concurrent.futures import ThreadPoolExecutor
 import sqlalchemy as sa
+import asyncio
+import functools
 import logging
 
 
@@ -7,6 +10,9 @@ logging.basicConfig()
 logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
 
 _engine: sa.engine.Engine = None
+_session_executor = ThreadPoolExecutor(
+    max_workers=config.session_threads, thread_name_prefix="sql_session"
+)
 
 
 def init_sqlalchemy_engine():
@@ -24,6 +30,29 @@ def get_session():
     return sa.orm.Session(_engine, expire_on_commit=False)
 
 
+async def run_in_session(func, *args, **kwargs):
+    # runs func(session, *args, **kwargs) in a worker thread with its own session
+    # so that database round trips do not block the event loop
+    def run():
+        with get_session() as session:
+            return func(session, *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_session_executor, run)
+
+
+def async_session_variant(func):
+    # builds an async variant of a "func(session, ...)" database function
+    # the variant takes the same arguments except the session
+    @functools.wraps(func)
+    async def async_func(*args, **kwargs):
+        return await run_in_session(func, *args, **kwargs)
+
+    async_func.__name__ = func.__name__ + "_async"
+    async_func.__qualname__ = func.__qualname__ + "_async"
+    return async_func
+
+
 def validate_table_name(table_name):
     if not table_name.isidentifier():
         raise ValueError(f"Invalid table name: {table_name}")
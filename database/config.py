@@ -10,4 +10,16 @@ host = os.getenv("MYSQL_HOST", "0.0.0.0")
 driver = "mysql+mysqldb"
 sqlalchemy_url = f"{driver}://{username}:{password}@{host}/{database}"
 
+# number of worker threads running sessions for the async interface
+# matches the default sqlalchemy connection pool size
+session_threads = int(os.getenv("MYSQL_SESSION_THREADS", "5"))
+
+# per-process cache of users selected by telegram id
+user_cache_size = int(os.getenv("USER_CACHE_SIZE", "1000"))
+user_cache_ttl_seconds = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+# saved meal suggestions lose half of the weight of a use after this number of days
+# stored usage scores are only comparable while the value is unchanged
+saved_meal_usage_half_life_days = float(os.getenv("SAVED_MEAL_USAGE_HALF_LIFE_DAYS", "14"))
+
 # root_password = open("secrets/mysql/root_password.txt").read()
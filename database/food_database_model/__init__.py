@@ -1,3 +1,4 @@
 from database.food_database_model.food_database_objects import *
 from database.food_database_model.food_database_callbacks import *
 from database.food_database_model.food_database_constants import *
+from database.food_database_model.food_database_snapshots import *
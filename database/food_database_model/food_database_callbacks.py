@@ -12,22 +12,31 @@ def before_insert_user(mapper, connection, target: User):
 
 @sa.event.listens_for(MealEaten, "before_insert")
 def before_insert_meal_eaten(mapper, connection, target: MealEaten):
+    if target.created_utc_datetime is not None and target.created_local_datetime is not None:
+        return
+
+    if target.created_utc_datetime is None and target.created_local_datetime is None:
+        target.created_utc_datetime = datetime.datetime.now(datetime.UTC)
+
+    tz = get_inserted_meal_timezone(connection, target)
     if target.created_utc_datetime is None:
-        if target.created_local_datetime is None:
-            target.created_utc_datetime = datetime.datetime.now(datetime.UTC)
-        else:
-            with sa.orm.Session(bind=connection) as session:
-                local_datetime = localize_to_user_tz(
-                    session, target.user_id, target.created_local_datetime
-                )
-                target.created_utc_datetime = local_datetime.astimezone(pytz.utc)
+        local_datetime = tz.localize(target.created_local_datetime)
+        target.created_utc_datetime = local_datetime.astimezone(pytz.utc)
 
     if target.created_local_datetime is None:
-        with sa.orm.Session(bind=connection) as session:
-            target.created_local_datetime = convert_to_user_tz(
-                session, target.user_id,
-                target.created_utc_datetime
-            )
+        utc_datetime = target.created_utc_datetime
+        # if tzinfo is None, assume UTC
+        if utc_datetime.tzinfo is None:
+            utc_datetime = utc_datetime.replace(tzinfo=pytz.UTC)
+        target.created_local_datetime = utc_datetime.astimezone(tz)
+
+
+def get_inserted_meal_timezone(connection, meal: MealEaten):
+    # use the user object if it is already loaded, without triggering lazy loads
+    user = meal.__dict__.get("user", None)
+    if user is not None and "timezone_obj" in user.__dict__:
+        return pytz.timezone(user.timezone_obj.timezone)
+    return get_user_timezone_by_user_id(connection, meal.user_id)
 
 
 @sa.event.listens_for(MealForFutureUse, "before_insert")
@@ -9,7 +9,9 @@ import threading
 import datetime
 import decimal
 import pytz
+import math
 from database import common_sql
+from database import config as database_config
 from enum import Enum
 
 
@@ -110,19 +112,50 @@ class TimeZone(Base):
     @staticmethod
     def get_if_exists_or_create_new(timezone):
         with common_sql.get_session() as s:
-            existing_tz = s.scalar(
-                sa.select(TimeZone).where(TimeZone.timezone == timezone)
-            )
-            if existing_tz is not None:
-                return existing_tz
-            else:
-                new_tz = TimeZone(timezone=timezone)
-                s.add(new_tz)
-                s.commit()
-                return new_tz
-
-
-class User(Base):
+            return TimeZone.get_if_exists_or_create_new_in_session(s, timezone)
+
+    @staticmethod
+    async def get_if_exists_or_create_new_async(timezone):
+        return await common_sql.run_in_session(
+            TimeZone.get_if_exists_or_create_new_in_session, timezone
+        )
+
+    @staticmethod
+    def get_if_exists_or_create_new_in_session(s, timezone):
+        existing_tz = s.scalar(
+            sa.select(TimeZone).where(TimeZone.timezone == timezone)
+        )
+        if existing_tz is not None:
+            return existing_tz
+        else:
+            new_tz = TimeZone(timezone=timezone)
+            s.add(new_tz)
+            s.commit()
+            return new_tz
+
+
+class UserTimezoneMixin:
+    # methods shared by User and UserSnapshot, both provide timezone_name
+    __slots__ = ()
+
+    def get_datetime_now(self):
+        now = datetime.datetime.now(
+            tz=pytz.timezone(self.timezone_name)
+        )
+        return now
+
+    def parse_datetime(self, text):
+        # dateparser can handle today / yesterday word
+        return dateparser.parse(
+            text,
+            settings={
+                "DATE_ORDER": "DMY",
+                "TIMEZONE": self.timezone_name
+            }
+        )
+
+
+class User(UserTimezoneMixin, Base):
     __tablename__ = "users"
     __table_args__ = (
         sa.CheckConstraint("(`weight` >= 0)", name="non_negative_weight"),
@@ -174,22 +207,13 @@ class User(Base):
         "UserTarget", back_populates="user", lazy="joined",
         cascade="all, delete-orphan"
     )
+    daily_nutrition_totals: Mapped[List["DailyNutritionTotal"]] = relationship(
+        "DailyNutritionTotal", back_populates="user", cascade="all, delete-orphan"
+    )
 
-    def get_datetime_now(self):
-        now = datetime.datetime.now(
-            tz=pytz.timezone(self.timezone_obj.timezone)
-        )
-        return now
-
-    def parse_datetime(self, text):
-        # dateparser can handle today / yesterday word
-        return dateparser.parse(
-            text,
-            settings={
-                "DATE_ORDER": "DMY",
-                "TIMEZONE": self.timezone_obj.timezone
-            }
-        )
+    @property
+    def timezone_name(self):
+        return self.timezone_obj.timezone
 
     def get_age(self):
         now = self.get_datetime_now()
@@ -217,40 +241,9 @@ class User(Base):
         return description
 
 
-class MealEaten(Base):
-    __tablename__ = "meals_eaten"
-    __table_args__ = (
-        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
-    )
-
-    id: Mapped[int] = mapped_column(
-        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
-        autoincrement=True
-    )
-    user_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    created_utc_datetime: Mapped[datetime.datetime] = mapped_column(
-        mysql.DATETIME, nullable=False
-    )
-    created_local_datetime: Mapped[datetime.datetime] = mapped_column(mysql.DATETIME, nullable=False)
-    name: Mapped[str] = mapped_column(mysql.VARCHAR(100), nullable=False)
-    weight: Mapped[decimal.Decimal] = mapped_column(
-        mysql.DECIMAL(10, 4), nullable=False, default=0
-    )
-    calories: Mapped[decimal.Decimal] = mapped_column(
-        mysql.DECIMAL(10, 4), nullable=False, default=0
-    )
-    carbs: Mapped[decimal.Decimal] = mapped_column(
-        mysql.DECIMAL(10, 4), nullable=False, default=0
-    )
-    protein: Mapped[decimal.Decimal] = mapped_column(
-        mysql.DECIMAL(10, 4), nullable=False, default=0
-    )
-    fat: Mapped[decimal.Decimal] = mapped_column(
-        mysql.DECIMAL(10, 4), nullable=False, default=0
-    )
-    description: Mapped[Optional[str]] = mapped_column(mysql.VARCHAR(5000))
-
-    user: Mapped["User"] = relationship("User", back_populates="meals_eaten")
+class MealEatenMixin:
+    # methods shared by MealEaten and MealSnapshot
+    __slots__ = ()
 
     def nutrition_as_dict(self):
         return NutritionType.nutrition_as_dict(self)
@@ -335,6 +328,45 @@ class MealEaten(Base):
         return description
 
 
+class MealEaten(MealEatenMixin, Base):
+    __tablename__ = "meals_eaten"
+    __table_args__ = (
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        # meals are selected by user and a range of local or utc time
+        sa.Index("ix_meals_eaten_user_id_created_local_datetime", "user_id", "created_local_datetime"),
+        sa.Index("ix_meals_eaten_user_id_created_utc_datetime", "user_id", "created_utc_datetime"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    user_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    created_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
+    )
+    created_local_datetime: Mapped[datetime.datetime] = mapped_column(mysql.DATETIME, nullable=False)
+    name: Mapped[str] = mapped_column(mysql.VARCHAR(100), nullable=False)
+    weight: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    calories: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    carbs: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    protein: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    fat: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    description: Mapped[Optional[str]] = mapped_column(mysql.VARCHAR(5000))
+
+    user: Mapped["User"] = relationship("User", back_populates="meals_eaten")
+
+
 class NutritionType(Enum):
     CALORIES = "Calories"
     FAT = "Fat"
@@ -386,10 +418,32 @@ class NutritionType(Enum):
         }
 
 
-class MealForFutureUse(Base):
+class MealForFutureUseMixin:
+    # methods shared by MealForFutureUse and MealForFutureUseSnapshot
+    __slots__ = ()
+
+    def nutrition_for_weight_as_dict(self, weight):
+        weight = decimal.Decimal(str(weight))
+        ratio = weight / 100
+        return {
+            NutritionType.CALORIES: self.calories_per_100g * ratio,
+            NutritionType.FAT: self.fat_per_100g * ratio,
+            NutritionType.PROTEIN: self.protein_per_100g * ratio,
+            NutritionType.CARBS: self.carbs_per_100g * ratio,
+            NutritionType.WEIGHT: weight
+        }
+
+
+class MealForFutureUse(MealForFutureUseMixin, Base):
     __tablename__ = "meals_for_future_use"
     __table_args__ = (
         sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        # keyset pagination in (name, id) order and name prefix search
+        sa.Index("ix_meals_for_future_use_user_id_name_id", "user_id", "name", "id"),
+        sa.Index(
+            "ix_meals_for_future_use_name_fulltext", "name",
+            mysql_prefix="FULLTEXT", mysql_with_parser="ngram"
+        ),
     )
 
     id: Mapped[int] = mapped_column(
@@ -419,34 +473,207 @@ class MealForFutureUse(Base):
     description: Mapped[Optional[str]] = mapped_column(mysql.VARCHAR(5000))
 
     users: Mapped["User"] = relationship("User", back_populates="meals_for_future_use")
+    usage_stats: Mapped[List["MealForFutureUseUsage"]] = relationship(
+        "MealForFutureUseUsage", back_populates="meal_for_future_use",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
-class UserTarget(Base):
-    __tablename__ = "users_targets"
+class TimeOfDay(Enum):
+    NIGHT = 0
+    MORNING = 1
+    AFTERNOON = 2
+    EVENING = 3
+
+    @staticmethod
+    def from_time(local_time: datetime.time):
+        hour = local_time.hour
+        if 5 <= hour < 11:
+            return TimeOfDay.MORNING
+        if 11 <= hour < 16:
+            return TimeOfDay.AFTERNOON
+        if 16 <= hour < 22:
+            return TimeOfDay.EVENING
+        return TimeOfDay.NIGHT
+
+
+class MealForFutureUseUsage(Base):
+    # how often and how recently a saved meal was logged at a time of day
+    # log_score is the log of the sum of exp(decay_rate * (t - usage_score_epoch)) over all uses,
+    # exponentially decayed counts of all meals share the same factor at any moment,
+    # so ordering by log_score is ordering by the decayed count, and it never needs to be recomputed
+    __tablename__ = "meals_for_future_use_usage"
     __table_args__ = (
         sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
-        sa.UniqueConstraint("user_id"),
+        # the conventional name is longer than the 64 characters allowed by mysql
+        sa.ForeignKeyConstraint(
+            ["meal_for_future_use_id"], ["meals_for_future_use.id"], ondelete="CASCADE",
+            name="fk_meals_for_future_use_usage_meal_id"
+        ),
+        sa.UniqueConstraint("meal_for_future_use_id", "time_of_day"),
+        # top suggestions for a user and a time of day
+        sa.Index(
+            "ix_meals_for_future_use_usage_user_id_time_of_day_log_score",
+            "user_id", "time_of_day", "log_score"
+        ),
     )
 
-    class Type(Enum):
-        MAXIMUM = "MAXIMUM"
-        MINIMUM = "MINIMUM"
+    usage_score_epoch = datetime.datetime(2025, 1, 1)
 
     id: Mapped[int] = mapped_column(
-        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False, autoincrement=True
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
     )
     user_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    calories: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    protein: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    fat: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    carbs: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
-    target_type: Mapped[str] = mapped_column(
-        mysql.ENUM(*[t.value for t in Type]), nullable=False
+    meal_for_future_use_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    time_of_day: Mapped[int] = mapped_column(mysql.TINYINT(unsigned=True), nullable=False)
+    use_count: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False, default=0)
+    log_score: Mapped[float] = mapped_column(mysql.DOUBLE, nullable=False)
+    last_used_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
     )
-    user: Mapped["User"] = relationship(
-        "User", back_populates="user_target_obj",
+
+    meal_for_future_use: Mapped["MealForFutureUse"] = relationship(
+        "MealForFutureUse", back_populates="usage_stats"
+    )
+
+    @staticmethod
+    def get_use_log_score(utc_datetime: datetime.datetime):
+        utc_datetime = utc_datetime.replace(tzinfo=None)
+        days = (utc_datetime - MealForFutureUseUsage.usage_score_epoch).total_seconds() / 86400
+        decay_rate = math.log(2) / database_config.saved_meal_usage_half_life_days
+        return decay_rate * days
+
+
+class DailyNutritionTotal(Base):
+    # sum of nutrition of all meals eaten by a user during one local date
+    # maintained together with meals_eaten rows by the database.update.update_meals functions
+    __tablename__ = "daily_nutrition_totals"
+    __table_args__ = (
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.UniqueConstraint("user_id", "local_date"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    user_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    local_date: Mapped[datetime.date] = mapped_column(mysql.DATE, nullable=False)
+    weight: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(12, 4), nullable=False, default=0
+    )
+    calories: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(12, 4), nullable=False, default=0
+    )
+    carbs: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(12, 4), nullable=False, default=0
+    )
+    protein: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(12, 4), nullable=False, default=0
+    )
+    fat: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(12, 4), nullable=False, default=0
+    )
+    # rows are deleted when the last meal of the day is deleted or moved to another day
+    # signed, the upserts that subtract a meal insert a count of -1
+    meal_count: Mapped[int] = mapped_column(
+        mysql.INTEGER(), nullable=False, default=0
+    )
+
+    user: Mapped["User"] = relationship("User", back_populates="daily_nutrition_totals")
+
+    nutrition_columns = ["weight", "calories", "carbs", "protein", "fat"]
+
+    def nutrition_as_dict(self):
+        return NutritionType.nutrition_as_dict(self)
+
+
+class FoodProductMixin:
+    # methods shared by FoodProduct and FoodProductSnapshot
+    __slots__ = ()
+
+    def full_name(self):
+        if self.brand:
+            return f"{self.name} ({self.brand})"
+        return self.name
+
+    def nutrition_for_weight_as_dict(self, weight):
+        weight = decimal.Decimal(str(weight))
+        ratio = weight / 100
+        return {
+            NutritionType.CALORIES: self.calories * ratio,
+            NutritionType.FAT: self.fat * ratio,
+            NutritionType.PROTEIN: self.protein * ratio,
+            NutritionType.CARBS: self.carbs * ratio,
+            NutritionType.WEIGHT: weight
+        }
+
+
+class FoodProduct(FoodProductMixin, Base):
+    # offline food composition data, nutrition values are given per 100 g
+    __tablename__ = "food_products"
+    __table_args__ = (
+        sa.UniqueConstraint("barcode"),
+        # ngram parser splits names into bigrams, matches tolerate typos and partial words
+        sa.Index(
+            "ix_food_products_name_fulltext", "name",
+            mysql_prefix="FULLTEXT", mysql_with_parser="ngram"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    barcode: Mapped[Optional[str]] = mapped_column(mysql.VARCHAR(32), nullable=True)
+    name: Mapped[str] = mapped_column(mysql.VARCHAR(300), nullable=False)
+    brand: Mapped[Optional[str]] = mapped_column(mysql.VARCHAR(200), nullable=True)
+    calories: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    carbs: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    protein: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
+    )
+    fat: Mapped[decimal.Decimal] = mapped_column(
+        mysql.DECIMAL(10, 4), nullable=False, default=0
     )
 
+
+class AiMealEstimateCacheEntry(Base):
+    # successful AI meal estimates reused for repeated requests
+    __tablename__ = "ai_meal_estimates_cache"
+    __table_args__ = (
+        sa.UniqueConstraint("cache_key"),
+        sa.Index("ix_ai_meal_estimates_cache_created_utc_datetime", "created_utc_datetime"),
+        sa.Index("ix_ai_meal_estimates_cache_last_used_utc_datetime", "last_used_utc_datetime"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    # sha256 hex digest of the normalized request
+    cache_key: Mapped[str] = mapped_column(mysql.CHAR(64), nullable=False)
+    created_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
+    )
+    last_used_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
+    )
+    hit_count: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), nullable=False, default=0
+    )
+    meal_data_json: Mapped[str] = mapped_column(mysql.TEXT, nullable=False)
+
+
+class UserTargetMixin:
+    # methods shared by UserTarget and UserTargetSnapshot
+    __slots__ = ()
+
     def describe(self):
         if self.target_type == UserTarget.Type.MAXIMUM.value:
             type_description = "Consume no more than the following amount"
@@ -470,3 +697,67 @@ class UserTarget(Base):
             f" - Protein: {self.protein:.1f} g ({p_protein:.0f}%)"
         )
         return description
+
+
+class UserTarget(UserTargetMixin, Base):
+    __tablename__ = "users_targets"
+    __table_args__ = (
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.UniqueConstraint("user_id"),
+    )
+
+    class Type(Enum):
+        MAXIMUM = "MAXIMUM"
+        MINIMUM = "MINIMUM"
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False, autoincrement=True
+    )
+    user_id: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    calories: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    protein: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    fat: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    carbs: Mapped[int] = mapped_column(mysql.INTEGER(unsigned=True), nullable=False)
+    target_type: Mapped[str] = mapped_column(
+        mysql.ENUM(*[t.value for t in Type]), nullable=False
+    )
+    user: Mapped["User"] = relationship(
+        "User", back_populates="user_target_obj",
+    )
+
+
+class BotUserData(Base):
+    # compressed pickled context.user_data of the telegram bot, see chatbot.persistence
+    __tablename__ = "bot_user_data"
+    __table_args__ = (
+        sa.UniqueConstraint("telegram_user_id"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    telegram_user_id: Mapped[int] = mapped_column(mysql.BIGINT, nullable=False)
+    data: Mapped[bytes] = mapped_column(mysql.MEDIUMBLOB, nullable=False)
+    updated_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
+    )
+
+
+class BotConversationState(Base):
+    # current state of a persistent conversation handler for one conversation key
+    __tablename__ = "bot_conversation_states"
+    __table_args__ = (
+        sa.UniqueConstraint("name", "conversation_key"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        mysql.INTEGER(unsigned=True), primary_key=True, nullable=False,
+        autoincrement=True
+    )
+    name: Mapped[str] = mapped_column(mysql.VARCHAR(100), nullable=False)
+    conversation_key: Mapped[str] = mapped_column(mysql.VARCHAR(200), nullable=False)
+    state: Mapped[bytes] = mapped_column(mysql.BLOB, nullable=False)
+    updated_utc_datetime: Mapped[datetime.datetime] = mapped_column(
+        mysql.DATETIME, nullable=False
+    )
@@ -0,0 +1,119 @@
+from dataclasses import dataclass, fields
+from typing import Optional
+from database.food_database_model.food_database_objects import (
+    User, UserTarget, MealEaten, MealForFutureUse, FoodProduct,
+    UserTimezoneMixin, UserTargetMixin, MealEatenMixin, MealForFutureUseMixin, FoodProductMixin
+)
+import datetime
+import decimal
+
+
+# plain copies of database rows kept by the dialogs in context.user_data
+# unlike detached orm objects they do not hold a session state or related objects,
+# are small to keep in memory and cheap to pickle
+# orm objects are converted explicitly when data is read from or written to the database
+
+
+def get_field_values(snapshot_class, obj):
+    return {f.name: getattr(obj, f.name) for f in fields(snapshot_class)}
+
+
+@dataclass(frozen=True, slots=True)
+class UserTargetSnapshot(UserTargetMixin):
+    id: int
+    user_id: int
+    calories: int
+    protein: int
+    fat: int
+    carbs: int
+    target_type: str
+
+    @staticmethod
+    def from_orm(target: UserTarget):
+        if target is None:
+            return None
+        return UserTargetSnapshot(**get_field_values(UserTargetSnapshot, target))
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot(UserTimezoneMixin):
+    id: int
+    telegram_id: str
+    name: str
+    is_activated: bool
+    timezone_name: str
+    date_of_birth: datetime.date
+    last_birthday_congratulated: Optional[int]
+    user_target_obj: Optional[UserTargetSnapshot]
+
+    @staticmethod
+    def from_orm(user: User):
+        if user is None:
+            return None
+        values = get_field_values(UserSnapshot, user)
+        values["user_target_obj"] = UserTargetSnapshot.from_orm(user.user_target_obj)
+        return UserSnapshot(**values)
+
+
+@dataclass(slots=True)
+class MealSnapshot(MealEatenMixin):
+    # not frozen, the new meal dialog fills the values step by step
+    user_id: int
+    id: Optional[int] = None
+    created_utc_datetime: Optional[datetime.datetime] = None
+    created_local_datetime: Optional[datetime.datetime] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    weight: Optional[decimal.Decimal] = None
+    calories: Optional[decimal.Decimal] = None
+    carbs: Optional[decimal.Decimal] = None
+    protein: Optional[decimal.Decimal] = None
+    fat: Optional[decimal.Decimal] = None
+
+    @staticmethod
+    def from_orm(meal: MealEaten):
+        if meal is None:
+            return None
+        return MealSnapshot(**get_field_values(MealSnapshot, meal))
+
+    def to_orm(self) -> MealEaten:
+        # values that were not set are left to the database defaults and insert hooks
+        values = get_field_values(MealSnapshot, self)
+        return MealEaten(**{k: v for k, v in values.items() if v is not None})
+
+
+@dataclass(frozen=True, slots=True)
+class MealForFutureUseSnapshot(MealForFutureUseMixin):
+    id: int
+    user_id: int
+    name: str
+    description: Optional[str]
+    default_weight_grams: decimal.Decimal
+    calories_per_100g: decimal.Decimal
+    protein_per_100g: decimal.Decimal
+    fat_per_100g: decimal.Decimal
+    carbs_per_100g: decimal.Decimal
+
+    @staticmethod
+    def from_orm(meal: MealForFutureUse):
+        if meal is None:
+            return None
+        return MealForFutureUseSnapshot(**get_field_values(MealForFutureUseSnapshot, meal))
+
+
+@dataclass(frozen=True, slots=True)
+class FoodProductSnapshot(FoodProductMixin):
+    id: int
+    barcode: Optional[str]
+    name: str
+    brand: Optional[str]
+    calories: decimal.Decimal
+    carbs: decimal.Decimal
+    protein: decimal.Decimal
+    fat: decimal.Decimal
+
+    @staticmethod
+    def from_orm(product: FoodProduct):
+        if product is None:
+            return None
+        return FoodProductSnapshot(**get_field_values(FoodProductSnapshot, product))
@@ -1,7 +1,52 @@
 from database.food_database_model.food_database_objects import *
+from database.cache import TtlLruCache
+from database import config
 import pytz
 
 
+# timezone names keyed by user id, used when meals are inserted
+user_timezone_names = TtlLruCache(config.user_cache_size, config.user_cache_ttl_seconds)
+
+
+def get_user_timezone_by_user_id(connection, user_id):
+    timezone_name = user_timezone_names.get(user_id)
+    if timezone_name is None:
+        generation = user_timezone_names.generation
+        timezone_name = connection.scalar(
+            sa.select(TimeZone.timezone)
+            .join(User, User.timezone_id == TimeZone.id)
+            .where(User.id == user_id)
+        )
+        if timezone_name is None:
+            raise ValueError(f"User with user_id={user_id} not found")
+        user_timezone_names.set(user_id, timezone_name, generation)
+    # pytz keeps its own cache of timezone objects
+    return pytz.timezone(timezone_name)
+
+
+def invalidate_user_timezone(user_id):
+    user_timezone_names.pop(user_id)
+
+
+def get_assigned_column_values(obj):
+    # values of the columns assigned to the object
+    # and foreign keys of the assigned many-to-one related objects
+    mapper = sa.inspect(obj).mapper
+    values = {
+        c.key: obj.__dict__[c.key]
+        for c in mapper.column_attrs if c.key in obj.__dict__
+    }
+    for relationship_prop in mapper.relationships:
+        if relationship_prop.direction != sa.orm.MANYTOONE:
+            continue
+        related_obj = obj.__dict__.get(relationship_prop.key, None)
+        if related_obj is None:
+            continue
+        for local_column, remote_column in relationship_prop.local_remote_pairs:
+            values[local_column.key] = getattr(related_obj, remote_column.key)
+    return values
+
+
 def get_user_timezone(session, user):
     if not isinstance(user, User):
         user_id = user
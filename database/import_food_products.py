@@ -0,0 +1,89 @@
+from database import common_sql
+from database.food_database_model import FoodProduct
+from database.select.select_food_products import normalize_barcode
+from sqlalchemy.dialects import mysql
+import argparse
+import csv
+import sys
+
+
+# columns of the Open Food Facts csv export (tab separated),
+# https://world.openfoodfacts.org/data
+open_food_facts_columns = {
+    "barcode": "code",
+    "name": "product_name",
+    "brand": "brands",
+    "calories": "energy-kcal_100g",
+    "fat": "fat_100g",
+    "carbs": "carbohydrates_100g",
+    "protein": "proteins_100g",
+}
+
+nutrition_columns = ["calories", "fat", "carbs", "protein"]
+
+
+def read_products(file_path, delimiter="\t"):
+    # the export is several gigabytes, rows are read one at a time
+    csv.field_size_limit(sys.maxsize)
+    with open(file_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for row in reader:
+            product = row_to_product_values(row)
+            if product is not None:
+                yield product
+
+
+def row_to_product_values(row):
+    values = {k: (row.get(c) or "").strip() for k, c in open_food_facts_columns.items()}
+    values["barcode"] = normalize_barcode(values["barcode"])
+    if len(values["barcode"]) == 0 or len(values["barcode"]) > 32 or len(values["name"]) == 0:
+        return None
+
+    try:
+        for k in nutrition_columns:
+            values[k] = float(values[k]) if values[k] != "" else 0.0
+    except ValueError:
+        return None
+    # energy is required, other missing values are assumed to be zero
+    if values["calories"] <= 0 or any(values[k] < 0 or values[k] > 1000 for k in nutrition_columns):
+        return None
+
+    values["name"] = values["name"][:300]
+    values["brand"] = values["brand"].split(",")[0].strip()[:200] or None
+    return values
+
+
+def insert_batch(session, batch):
+    insert_stmt = mysql.insert(FoodProduct).values(batch)
+    session.execute(insert_stmt.on_duplicate_key_update({
+        k: insert_stmt.inserted[k] for k in ["name", "brand", *nutrition_columns]
+    }))
+    session.commit()
+
+
+def import_products(file_path, batch_size=1000):
+    common_sql.init_sqlalchemy_engine()
+    n_imported = 0
+    batch = []
+    with common_sql.get_session() as session:
+        for product in read_products(file_path):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                insert_batch(session, batch)
+                n_imported += len(batch)
+                batch = []
+                print(f"imported {n_imported} products")
+        if len(batch) > 0:
+            insert_batch(session, batch)
+            n_imported += len(batch)
+    print(f"import finished, {n_imported} products")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import Open Food Facts csv export into the food_products table"
+    )
+    parser.add_argument("file_path")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    import_products(args.file_path, args.batch_size)
@@ -0,0 +1,18 @@
+from database.food_database_model import AiMealEstimateCacheEntry
+from database import common_sql
+import sqlalchemy as sa
+import datetime
+
+
+def select_ai_meal_estimate(
+    session, cache_key, created_after: datetime.datetime
+) -> AiMealEstimateCacheEntry:
+    return session.scalar(
+        sa.select(AiMealEstimateCacheEntry).where(
+            AiMealEstimateCacheEntry.cache_key == cache_key,
+            AiMealEstimateCacheEntry.created_utc_datetime >= created_after.replace(tzinfo=None)
+        )
+    )
+
+
+select_ai_meal_estimate_async = common_sql.async_session_variant(select_ai_meal_estimate)
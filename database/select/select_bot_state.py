@@ -0,0 +1,21 @@
+from database.food_database_model import BotUserData, BotConversationState
+from database import common_sql
+import sqlalchemy as sa
+
+
+def select_bot_user_data(session, telegram_user_id) -> bytes:
+    return session.scalar(
+        sa.select(BotUserData.data).where(BotUserData.telegram_user_id == telegram_user_id)
+    )
+
+
+def select_bot_conversation_states(session, name) -> dict[str, bytes]:
+    rows = session.execute(
+        sa.select(BotConversationState.conversation_key, BotConversationState.state)
+        .where(BotConversationState.name == name)
+    ).fetchall()
+    return {row.conversation_key: row.state for row in rows}
+
+
+select_bot_user_data_async = common_sql.async_session_variant(select_bot_user_data)
+select_bot_conversation_states_async = common_sql.async_session_variant(select_bot_conversation_states)
@@ -0,0 +1,47 @@
+from database.food_database_model import FoodProduct
+from database import common_sql
+from sqlalchemy.dialects import mysql
+import sqlalchemy as sa
+import re
+
+
+def normalize_barcode(barcode):
+    return re.sub(r"\D", "", barcode)
+
+
+def get_barcode_variants(barcode):
+    # UPC-A codes are stored as EAN-13 with a leading zero by some sources
+    barcode = normalize_barcode(barcode)
+    variants = [barcode]
+    if len(barcode) == 12:
+        variants.append("0" + barcode)
+    elif len(barcode) == 13 and barcode.startswith("0"):
+        variants.append(barcode[1:])
+    return variants
+
+
+def select_food_product_by_barcode(session, barcode) -> FoodProduct:
+    return session.scalar(
+        sa.select(FoodProduct).where(
+            FoodProduct.barcode.in_(get_barcode_variants(barcode))
+        ).limit(1)
+    )
+
+
+def select_food_product_by_id(session, product_id) -> FoodProduct:
+    return session.scalar(sa.select(FoodProduct).where(FoodProduct.id == product_id))
+
+
+def search_food_products(session, search_text, limit=10) -> list[FoodProduct]:
+    relevance = mysql.match(FoodProduct.name, against=search_text).in_natural_language_mode()
+    return session.scalars(
+        sa.select(FoodProduct)
+        .where(relevance > 0)
+        .order_by(relevance.desc(), FoodProduct.id)
+        .limit(limit)
+    ).fetchall()
+
+
+select_food_product_by_barcode_async = common_sql.async_session_variant(select_food_product_by_barcode)
+select_food_product_by_id_async = common_sql.async_session_variant(select_food_product_by_id)
+search_food_products_async = common_sql.async_session_variant(search_food_products)
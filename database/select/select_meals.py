@@ -1,8 +1,29 @@
 import pytz
 
-from database.food_database_model import User, MealEaten, MealForFutureUse
+from database.food_database_model import (
+    User, MealEaten, MealForFutureUse, MealForFutureUseUsage, DailyNutritionTotal, NutritionType,
+    TimeOfDay
+)
+from database import common_sql
+from sqlalchemy.dialects import mysql
 import sqlalchemy as sa
 import datetime
+import itertools
+
+
+# per process version of the meals eaten by each user, changed on every insert, update and delete
+# cached views of the meals are keyed by the version and are not used after a change
+# versions are unique over all users, a version is never reused after a change
+meals_eaten_versions = dict()
+meals_eaten_version_counter = itertools.count(1)
+
+
+def get_meals_eaten_version(user_id):
+    return meals_eaten_versions.get(user_id, 0)
+
+
+def change_meals_eaten_version(user_id):
+    meals_eaten_versions[user_id] = next(meals_eaten_version_counter)
 
 
 def select_meals_for_future_use(session, user_id):
@@ -16,6 +37,96 @@ def select_meals_for_future_use(session, user_id):
     return meals
 
 
+def select_meal_for_future_use_by_id(session, meal_id) -> MealForFutureUse:
+    return session.scalar(sa.select(MealForFutureUse).where(MealForFutureUse.id == meal_id))
+
+
+def select_meals_for_future_use_page(
+        session, user_id, page_size, after_id=None, before_id=None, name_prefix=None
+) -> tuple[list[MealForFutureUse], bool, bool]:
+    # keyset pagination in (name, id) order, served by ix_meals_for_future_use_user_id_name_id
+    # the page starts after the meal after_id or ends before the meal before_id,
+    # only the id is passed around so the cursor fits into the callback data
+    # returns meals of the page and whether previous and next pages exist
+    condition = (MealForFutureUse.user_id == user_id)
+    if name_prefix:
+        condition = sa.and_(
+            condition, MealForFutureUse.name.startswith(name_prefix, autoescape=True)
+        )
+
+    cursor_id = after_id if after_id is not None else before_id
+    cursor_name = None
+    if cursor_id is not None:
+        cursor_name = session.scalar(
+            sa.select(MealForFutureUse.name).where(
+                MealForFutureUse.user_id == user_id,
+                MealForFutureUse.id == cursor_id
+            )
+        )
+
+    # the cursor meal was deleted, start from the first page
+    if cursor_name is None:
+        after_id = before_id = None
+
+    backward = before_id is not None
+    if after_id is not None:
+        condition = sa.and_(condition, sa.or_(
+            MealForFutureUse.name > cursor_name,
+            sa.and_(MealForFutureUse.name == cursor_name, MealForFutureUse.id > after_id)
+        ))
+    elif backward:
+        condition = sa.and_(condition, sa.or_(
+            MealForFutureUse.name < cursor_name,
+            sa.and_(MealForFutureUse.name == cursor_name, MealForFutureUse.id < before_id)
+        ))
+
+    if backward:
+        order = [MealForFutureUse.name.desc(), MealForFutureUse.id.desc()]
+    else:
+        order = [MealForFutureUse.name.asc(), MealForFutureUse.id.asc()]
+
+    # one extra row tells if there is a page further in the same direction
+    meals = list(session.scalars(
+        sa.select(MealForFutureUse).where(condition)
+        .order_by(*order).limit(page_size + 1)
+    ).fetchall())
+    has_more = len(meals) > page_size
+    meals = meals[:page_size]
+
+    if backward:
+        meals.reverse()
+        return meals, has_more, True
+    return meals, after_id is not None, has_more
+
+
+def select_suggested_meals_for_future_use(
+        session, user_id, time_of_day: TimeOfDay, limit=3
+) -> list[MealForFutureUse]:
+    # most used saved meals at the time of day, with older uses exponentially decayed
+    # a single range of ix_meals_for_future_use_usage_user_id_time_of_day_log_score is read
+    return session.scalars(
+        sa.select(MealForFutureUse)
+        .join(MealForFutureUseUsage, MealForFutureUseUsage.meal_for_future_use_id == MealForFutureUse.id)
+        .where(
+            MealForFutureUseUsage.user_id == user_id,
+            MealForFutureUseUsage.time_of_day == time_of_day.value
+        )
+        .order_by(MealForFutureUseUsage.log_score.desc())
+        .limit(limit)
+    ).fetchall()
+
+
+def search_meals_for_future_use(session, user_id, search_text, limit=10) -> list[MealForFutureUse]:
+    # fuzzy name search, ngram FULLTEXT matches tolerate typos and words in any order
+    relevance = mysql.match(MealForFutureUse.name, against=search_text).in_natural_language_mode()
+    return session.scalars(
+        sa.select(MealForFutureUse)
+        .where(MealForFutureUse.user_id == user_id, relevance > 0)
+        .order_by(relevance.desc(), MealForFutureUse.id)
+        .limit(limit)
+    ).fetchall()
+
+
 def select_meals_eaten_include_to(
         session: sa.orm.Session, user_id,
         datetime_from: datetime.datetime,
@@ -38,6 +149,23 @@ def select_meals_eaten_by_datetime(
         datetime_to: datetime.datetime,
         left_closed, right_closed, as_utc
 ) -> list[MealEaten]:
+    meals = session.scalars(
+        meals_eaten_by_datetime_statement(
+            user_id, datetime_from, datetime_to, left_closed, right_closed, as_utc
+        )
+    ).fetchall()
+
+    return meals
+
+
+def meals_eaten_by_datetime_statement(
+        user_id,
+        datetime_from: datetime.datetime,
+        datetime_to: datetime.datetime,
+        left_closed, right_closed, as_utc
+) -> sa.Select:
+    # a range read of the (user_id, created_*_datetime) index,
+    # the rows are already in the order of the index
     # make sure existing tzinfo is ignored
     datetime_from_naive = datetime_from.replace(tzinfo=None)
     datetime_to_naive = datetime_to.replace(tzinfo=None)
@@ -62,12 +190,10 @@ def select_meals_eaten_by_datetime(
         from_clause, to_clause
     )
 
-    meals = session.scalars(
+    return (
         sa.select(MealEaten).where(condition)
         .order_by(datetime_column.asc())
-    ).fetchall()
-
-    return meals
+    )
 
 
 def select_meal_eaten_by_meal_id(
@@ -77,19 +203,95 @@ def select_meal_eaten_by_meal_id(
 
 
 def get_meals_for_one_day(session, date, user: User):
-    user_id = user.id
-    user_timezone = user.timezone_obj.timezone
-
     if isinstance(date, datetime.datetime):
         date = date.date()
+    return get_meals_for_days_include_to(session, date, date, user)[date]
+
 
-    start_day = datetime.datetime.combine(
-        date, datetime.time(0, 0),
-        tzinfo=pytz.timezone(user_timezone)
+def get_meals_for_days_include_to(
+        session, date_from: datetime.date, date_to: datetime.date, user: User
+) -> dict[datetime.date, list[MealEaten]]:
+    # meals of several local days are read with one range query
+    user_timezone = pytz.timezone(user.timezone_name)
+    start_day = datetime.datetime.combine(date_from, datetime.time(0, 0), tzinfo=user_timezone)
+    next_day = datetime.datetime.combine(
+        date_to + datetime.timedelta(days=1), datetime.time(0, 0), tzinfo=user_timezone
     )
-    one_day_offset = datetime.timedelta(days=1)
-    next_day = start_day + one_day_offset
-    meals_day = select_meals_eaten_right_exclude_to(
-        session, user_id, start_day, next_day
+    meals = select_meals_eaten_right_exclude_to(
+        session, user.id, start_day, next_day
     )
-    return meals_day
+
+    meals_by_date = {
+        date_from + datetime.timedelta(days=i): []
+        for i in range((date_to - date_from).days + 1)
+    }
+    for meal in meals:
+        meals_by_date[meal.created_local_datetime.date()].append(meal)
+    return meals_by_date
+
+
+def select_daily_nutrition_total(session, user_id, date) -> DailyNutritionTotal:
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+
+    return session.scalar(
+        sa.select(DailyNutritionTotal).where(
+            DailyNutritionTotal.user_id == user_id,
+            DailyNutritionTotal.local_date == date,
+            DailyNutritionTotal.meal_count > 0
+        )
+    )
+
+
+def select_daily_nutrition_totals_include_to(
+        session, user_id, date_from: datetime.date, date_to: datetime.date
+) -> dict[datetime.date, dict]:
+    # per-day sums are kept up to date in daily_nutrition_totals,
+    # a period is a single range read of the (user_id, local_date) unique index
+    # days without meals are missing from the result,
+    # rows of emptied days are deleted and also excluded here by their meal count
+    rows = session.execute(
+        sa.select(
+            DailyNutritionTotal.local_date,
+            *[getattr(DailyNutritionTotal, c) for c in DailyNutritionTotal.nutrition_columns]
+        ).where(
+            DailyNutritionTotal.user_id == user_id,
+            DailyNutritionTotal.local_date >= date_from,
+            DailyNutritionTotal.local_date <= date_to,
+            DailyNutritionTotal.meal_count > 0
+        ).order_by(DailyNutritionTotal.local_date.asc())
+    ).fetchall()
+    return {row.local_date: NutritionType.nutrition_as_dict(row) for row in rows}
+
+
+def get_nutrition_totals_for_one_day(session, date, user: User):
+    daily_total = select_daily_nutrition_total(session, user.id, date)
+    if daily_total is None:
+        return {n: 0 for n in NutritionType}
+    return daily_total.nutrition_as_dict()
+
+
+select_meals_for_future_use_async = common_sql.async_session_variant(select_meals_for_future_use)
+select_meal_for_future_use_by_id_async = common_sql.async_session_variant(select_meal_for_future_use_by_id)
+select_meals_for_future_use_page_async = common_sql.async_session_variant(
+    select_meals_for_future_use_page
+)
+search_meals_for_future_use_async = common_sql.async_session_variant(search_meals_for_future_use)
+select_suggested_meals_for_future_use_async = common_sql.async_session_variant(
+    select_suggested_meals_for_future_use
+)
+select_meals_eaten_include_to_async = common_sql.async_session_variant(select_meals_eaten_include_to)
+select_meals_eaten_right_exclude_to_async = common_sql.async_session_variant(
+    select_meals_eaten_right_exclude_to
+)
+select_meals_eaten_by_datetime_async = common_sql.async_session_variant(select_meals_eaten_by_datetime)
+select_meal_eaten_by_meal_id_async = common_sql.async_session_variant(select_meal_eaten_by_meal_id)
+get_meals_for_one_day_async = common_sql.async_session_variant(get_meals_for_one_day)
+get_meals_for_days_include_to_async = common_sql.async_session_variant(get_meals_for_days_include_to)
+select_daily_nutrition_total_async = common_sql.async_session_variant(select_daily_nutrition_total)
+select_daily_nutrition_totals_include_to_async = common_sql.async_session_variant(
+    select_daily_nutrition_totals_include_to
+)
+get_nutrition_totals_for_one_day_async = common_sql.async_session_variant(
+    get_nutrition_totals_for_one_day
+)
@@ -1,7 +1,14 @@
-from database.food_database_model import User
+from database.food_database_model import User, UserSnapshot
+from database import common_sql, config
+from database.cache import TtlLruCache
 import sqlalchemy as sa
 
 
+# user snapshots keyed by telegram id
+# snapshots are immutable, so entries are shared between callers without copying
+user_cache = TtlLruCache(config.user_cache_size, config.user_cache_ttl_seconds)
+
+
 def select_users(session) -> list[User]:
     users = session.scalars(sa.select(User)).fetchall()
     return users
@@ -14,3 +21,34 @@ def select_user_by_user_id(session, user_id) -> User:
 def select_user_by_telegram_id(session, tg_id) -> User:
     return session.scalar(sa.select(User).where(User.telegram_id == tg_id))
 
+
+def select_user_snapshot_by_telegram_id_cached(session, tg_id) -> UserSnapshot:
+    user = user_cache.get(str(tg_id))
+    if user is not None:
+        return user
+
+    generation = user_cache.generation
+    user = UserSnapshot.from_orm(select_user_by_telegram_id(session, tg_id))
+    if user is not None:
+        user_cache.set(str(tg_id), user, generation)
+    return user
+
+
+async def select_user_snapshot_by_telegram_id_cached_async(tg_id) -> UserSnapshot:
+    # cache hits are served without leaving the event loop
+    user = user_cache.get(str(tg_id))
+    if user is not None:
+        return user
+    return await common_sql.run_in_session(select_user_snapshot_by_telegram_id_cached, tg_id)
+
+
+def invalidate_cached_user(user_id=None, telegram_id=None):
+    if telegram_id is not None:
+        user_cache.pop(str(telegram_id))
+    if user_id is not None:
+        user_cache.pop_where(lambda k, user: user.id == user_id)
+
+
+select_users_async = common_sql.async_session_variant(select_users)
+select_user_by_user_id_async = common_sql.async_session_variant(select_user_by_user_id)
+select_user_by_telegram_id_async = common_sql.async_session_variant(select_user_by_telegram_id)
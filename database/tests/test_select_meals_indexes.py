@@ -0,0 +1,46 @@
+from database.food_database_model import MealEaten
+from database.select import select_meals
+from sqlalchemy.dialects import sqlite
+import sqlalchemy as sa
+import datetime
+
+
+# the query plan of sqlite shows whether a statement is answered by a range read
+# of an index or by a scan of the table, the composite indexes of meals_eaten
+# are used the same way by mysql
+
+
+def get_query_plan(statement):
+    engine = sa.create_engine("sqlite://")
+    MealEaten.__table__.create(engine)
+    compiled = statement.compile(dialect=sqlite.dialect(paramstyle="named"))
+    params = {
+        k: (v.isoformat(" ") if isinstance(v, datetime.datetime) else v)
+        for k, v in compiled.params.items()
+    }
+    with engine.connect() as connection:
+        rows = connection.execute(sa.text("EXPLAIN QUERY PLAN " + compiled.string), params)
+        return [row[-1] for row in rows]
+
+
+def get_meals_of_one_day_statement(as_utc):
+    datetime_from = datetime.datetime(2025, 1, 27)
+    return select_meals.meals_eaten_by_datetime_statement(
+        1, datetime_from, datetime_from + datetime.timedelta(days=1),
+        left_closed=True, right_closed=False, as_utc=as_utc
+    )
+
+
+def test_local_datetime_range_uses_index():
+    plan = get_query_plan(get_meals_of_one_day_statement(as_utc=False))
+    assert any("ix_meals_eaten_user_id_created_local_datetime" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    # the rows are read in the order of the index
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_utc_datetime_range_uses_index():
+    plan = get_query_plan(get_meals_of_one_day_statement(as_utc=True))
+    assert any("ix_meals_eaten_user_id_created_utc_datetime" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
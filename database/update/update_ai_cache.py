@@ -0,0 +1,64 @@
+from sqlalchemy.dialects import mysql
+from database.food_database_model import AiMealEstimateCacheEntry
+from database import common_sql
+import sqlalchemy as sa
+import datetime
+
+
+def add_ai_meal_estimate(session, cache_key, meal_data_json):
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    insert_stmt = mysql.insert(AiMealEstimateCacheEntry).values(
+        cache_key=cache_key,
+        created_utc_datetime=now,
+        last_used_utc_datetime=now,
+        hit_count=0,
+        meal_data_json=meal_data_json
+    )
+    # an expired entry with the same key is replaced
+    session.execute(insert_stmt.on_duplicate_key_update(
+        created_utc_datetime=insert_stmt.inserted.created_utc_datetime,
+        last_used_utc_datetime=insert_stmt.inserted.last_used_utc_datetime,
+        hit_count=insert_stmt.inserted.hit_count,
+        meal_data_json=insert_stmt.inserted.meal_data_json
+    ))
+    session.commit()
+
+
+def record_ai_meal_estimate_hit(session, entry_id):
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    session.execute(
+        sa.update(AiMealEstimateCacheEntry)
+        .where(AiMealEstimateCacheEntry.id == entry_id)
+        .values(
+            hit_count=AiMealEstimateCacheEntry.hit_count + 1,
+            last_used_utc_datetime=now
+        )
+    )
+    session.commit()
+
+
+def evict_ai_meal_estimates(session, created_before: datetime.datetime, max_entries):
+    session.execute(
+        sa.delete(AiMealEstimateCacheEntry).where(
+            AiMealEstimateCacheEntry.created_utc_datetime < created_before.replace(tzinfo=None)
+        )
+    )
+
+    # least recently used entries above the size limit
+    oldest_kept_last_used = session.scalar(
+        sa.select(AiMealEstimateCacheEntry.last_used_utc_datetime)
+        .order_by(AiMealEstimateCacheEntry.last_used_utc_datetime.desc())
+        .offset(max_entries - 1).limit(1)
+    )
+    if oldest_kept_last_used is not None:
+        session.execute(
+            sa.delete(AiMealEstimateCacheEntry).where(
+                AiMealEstimateCacheEntry.last_used_utc_datetime < oldest_kept_last_used
+            )
+        )
+    session.commit()
+
+
+add_ai_meal_estimate_async = common_sql.async_session_variant(add_ai_meal_estimate)
+record_ai_meal_estimate_hit_async = common_sql.async_session_variant(record_ai_meal_estimate_hit)
+evict_ai_meal_estimates_async = common_sql.async_session_variant(evict_ai_meal_estimates)
@@ -0,0 +1,59 @@
+from sqlalchemy.dialects import mysql
+from database.food_database_model import BotUserData, BotConversationState
+from database import common_sql
+import sqlalchemy as sa
+import datetime
+
+
+def write_bot_state(
+    session,
+    user_data: dict[int, bytes],
+    conversation_states: dict[tuple[str, str], bytes]
+):
+    # writes a batch of changes in one transaction, None values delete the stored rows
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+    user_data_values = [
+        dict(telegram_user_id=user_id, data=data, updated_utc_datetime=now)
+        for user_id, data in user_data.items() if data is not None
+    ]
+    if user_data_values:
+        insert_stmt = mysql.insert(BotUserData)
+        session.execute(
+            insert_stmt.on_duplicate_key_update(
+                data=insert_stmt.inserted.data,
+                updated_utc_datetime=insert_stmt.inserted.updated_utc_datetime
+            ),
+            user_data_values
+        )
+    deleted_user_ids = [user_id for user_id, data in user_data.items() if data is None]
+    if deleted_user_ids:
+        session.execute(
+            sa.delete(BotUserData).where(BotUserData.telegram_user_id.in_(deleted_user_ids))
+        )
+
+    state_values = [
+        dict(name=name, conversation_key=key, state=state, updated_utc_datetime=now)
+        for (name, key), state in conversation_states.items() if state is not None
+    ]
+    if state_values:
+        insert_stmt = mysql.insert(BotConversationState)
+        session.execute(
+            insert_stmt.on_duplicate_key_update(
+                state=insert_stmt.inserted.state,
+                updated_utc_datetime=insert_stmt.inserted.updated_utc_datetime
+            ),
+            state_values
+        )
+    for (name, key), state in conversation_states.items():
+        if state is None:
+            session.execute(
+                sa.delete(BotConversationState).where(
+                    BotConversationState.name == name,
+                    BotConversationState.conversation_key == key
+                )
+            )
+    session.commit()
+
+
+write_bot_state_async = common_sql.async_session_variant(write_bot_state)
@@ -1,26 +1,128 @@
 import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
 from database.food_database_model import *
+from database import common_sql
+from database.select.select_meals import change_meals_eaten_version
 import numpy as np
 
 
 def add_new_eaten_meal(
-    session, meal_eaten
+    session, meal_eaten, meal_for_future_use_id=None
 ):
     session.add(meal_eaten)
+    # local time can be assigned by before_insert hook, it is needed for the daily totals
+    session.flush()
+    add_meal_to_daily_totals(session, meal_eaten)
+    if meal_for_future_use_id is not None:
+        add_meal_for_future_use_usage(session, meal_for_future_use_id, meal_eaten)
     session.commit()
+    change_meals_eaten_version(meal_eaten.user_id)
+
+
+def add_meal_for_future_use_usage(session, meal_for_future_use_id, meal_eaten: MealEaten):
+    # counts are updated incrementally, meals_eaten are never scanned to rank saved meals
+    time_of_day = TimeOfDay.from_time(meal_eaten.created_local_datetime.time())
+    insert_stmt = mysql.insert(MealForFutureUseUsage).values(
+        user_id=meal_eaten.user_id,
+        meal_for_future_use_id=meal_for_future_use_id,
+        time_of_day=time_of_day.value,
+        use_count=1,
+        log_score=MealForFutureUseUsage.get_use_log_score(meal_eaten.created_utc_datetime),
+        last_used_utc_datetime=meal_eaten.created_utc_datetime.replace(tzinfo=None)
+    )
+    table_columns = MealForFutureUseUsage.__table__.c
+    stored_score = table_columns.log_score
+    new_score = insert_stmt.inserted.log_score
+    session.execute(insert_stmt.on_duplicate_key_update({
+        "use_count": table_columns.use_count + 1,
+        # log(exp(a) + exp(b)) without overflow
+        "log_score": sa.func.greatest(stored_score, new_score) + sa.func.ln(
+            1 + sa.func.exp(-sa.func.abs(stored_score - new_score))
+        ),
+        "last_used_utc_datetime": sa.func.greatest(
+            table_columns.last_used_utc_datetime, insert_stmt.inserted.last_used_utc_datetime
+        )
+    }))
 
 
 def update_eaten_meal(session, meal):
     if meal.id is None:
         raise ValueError("Meal ID is None, cannot update")
 
-    object_exists = session.scalar(sa.select(True).where(MealEaten.id == meal.id))
-    if object_exists is None:
+    # only the values assigned to the object are updated,
+    # so a partially constructed object can be used to update a subset of values
+    values = get_assigned_column_values(meal)
+    values.pop("id", None)
+    if len(values) == 0:
+        raise ValueError("Meal has no values to update")
+
+    # the stored version of the meal may belong to a different day
+    add_stored_meal_to_daily_totals(session, meal.id, sign=-1)
+    result = session.execute(
+        sa.update(MealEaten).where(MealEaten.id == meal.id).values(**values)
+    )
+    # rowcount is the number of matched rows (mysqldb dialect sets FOUND_ROWS flag)
+    if result.rowcount == 0:
+        session.rollback()
         raise ValueError("Meal to be updated does not exist")
 
-    updated_meal = session.merge(meal)
+    add_stored_meal_to_daily_totals(session, meal.id)
     session.commit()
-    return updated_meal
+    # the stored row, the given object may hold only a subset of the values
+    stored_meal = session.scalar(sa.select(MealEaten).where(MealEaten.id == meal.id))
+    change_meals_eaten_version(stored_meal.user_id)
+    return stored_meal
+
+
+def add_meal_to_daily_totals(session, meal: MealEaten):
+    values = {
+        c: (getattr(meal, c) if getattr(meal, c) is not None else 0)
+        for c in DailyNutritionTotal.nutrition_columns
+    }
+    insert_stmt = mysql.insert(DailyNutritionTotal).values(
+        user_id=meal.user_id,
+        local_date=meal.created_local_datetime.date(),
+        meal_count=1,
+        **values
+    )
+    session.execute(add_to_existing_daily_totals(insert_stmt))
+
+
+def add_stored_meal_to_daily_totals(session, meal_id, sign=1):
+    # INSERT ... SELECT is evaluated by the database,
+    # the stored meal row does not need to be selected first
+    columns = DailyNutritionTotal.nutrition_columns
+    select_stmt = sa.select(
+        MealEaten.user_id,
+        sa.func.date(MealEaten.created_local_datetime),
+        *[sign * getattr(MealEaten, c) for c in columns],
+        sa.literal(sign)
+    ).where(MealEaten.id == meal_id)
+    insert_stmt = mysql.insert(DailyNutritionTotal).from_select(
+        ["user_id", "local_date", *columns, "meal_count"], select_stmt
+    )
+    session.execute(add_to_existing_daily_totals(insert_stmt))
+
+    if sign < 0:
+        # drop the row when the day of the stored meal has no meals left,
+        # the meal row itself still exists at this point
+        day_of_meal = sa.select(
+            MealEaten.user_id, sa.func.date(MealEaten.created_local_datetime)
+        ).where(MealEaten.id == meal_id)
+        session.execute(
+            sa.delete(DailyNutritionTotal).where(
+                sa.tuple_(DailyNutritionTotal.user_id, DailyNutritionTotal.local_date).in_(day_of_meal),
+                DailyNutritionTotal.meal_count == 0
+            )
+        )
+
+
+def add_to_existing_daily_totals(insert_stmt):
+    table_columns = DailyNutritionTotal.__table__.c
+    return insert_stmt.on_duplicate_key_update({
+        c: table_columns[c] + insert_stmt.inserted[c]
+        for c in [*DailyNutritionTotal.nutrition_columns, "meal_count"]
+    })
 
 
 def add_new_meal_for_future_use(
@@ -59,17 +161,31 @@ def add_new_meal_for_future_use_from_meal_eaten(
     )
     session.add(meal_for_future_use)
     session.commit()
+    return meal_for_future_use
 
 
 def delete_meal_eaten(
     session, meal_value
 ):
+    if isinstance(meal_value, MealEaten):
+        meal_id = meal_value.id
+    else:
+        meal_id = meal_value
+    user_id = select_meal_user_id(session, meal_id)
+    add_stored_meal_to_daily_totals(session, meal_id, sign=-1)
+
     if isinstance(meal_value, MealEaten):
         session.delete(meal_value)
     else:
         sql = sa.delete(MealEaten).where(MealEaten.id == meal_value)
         session.execute(sql)
     session.commit()
+    if user_id is not None:
+        change_meals_eaten_version(user_id)
+
+
+def select_meal_user_id(session, meal_id):
+    return session.scalar(sa.select(MealEaten.user_id).where(MealEaten.id == meal_id))
 
 
 def delete_meal_for_future_use(
@@ -82,3 +198,12 @@ def delete_meal_for_future_use(
         session.execute(sql)
     session.commit()
 
+
+add_new_eaten_meal_async = common_sql.async_session_variant(add_new_eaten_meal)
+update_eaten_meal_async = common_sql.async_session_variant(update_eaten_meal)
+add_new_meal_for_future_use_async = common_sql.async_session_variant(add_new_meal_for_future_use)
+add_new_meal_for_future_use_from_meal_eaten_async = common_sql.async_session_variant(
+    add_new_meal_for_future_use_from_meal_eaten
+)
+delete_meal_eaten_async = common_sql.async_session_variant(delete_meal_eaten)
+delete_meal_for_future_use_async = common_sql.async_session_variant(delete_meal_for_future_use)
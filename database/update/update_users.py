@@ -1,5 +1,10 @@
+from sqlalchemy.dialects import mysql
 from database.food_database_model import *
-from database.select.select_users import select_user_by_telegram_id
+from database import common_sql
+from database.select.select_users import (
+    select_user_by_user_id, select_user_by_telegram_id, invalidate_cached_user
+)
+from database.select.select_meals import change_meals_eaten_version
 
 def add_new_user(session, user):
     session.add(user)
@@ -10,41 +15,91 @@ def update_user(session, user):
     if user.id is None:
         raise ValueError("User ID is None, cannot update")
 
-    object_exists = session.scalar(sa.select(True).where(User.id == user.id))
-    if object_exists is None:
-        raise ValueError("User to be updated does not exist")
-
     # it appears that when sqlalchemy ORM object is created
     # without explicitly setting its field/column values,
     # the unspecified values do not exist in the object (not even as "None" placeholders)
-    # and so session.merge won't update them
+    # and so they are not included in the update
     #
-    # It's possible to use partially constructed object in merge function to
+    # It's possible to use partially constructed object to
     # make an update to only a subset of values, leaving other values intact
-    updated_user = session.merge(user)
+    values = get_assigned_column_values(user)
+    values.pop("id", None)
+    user_target = user.__dict__.get("user_target_obj", None)
+    if len(values) == 0 and user_target is None:
+        raise ValueError("User has no values to update")
+
+    if len(values) > 0:
+        result = session.execute(
+            sa.update(User).where(User.id == user.id).values(**values)
+        )
+        # rowcount is the number of matched rows (mysqldb dialect sets FOUND_ROWS flag)
+        user_exists = result.rowcount > 0
+    else:
+        user_exists = select_user_by_user_id(session, user.id) is not None
+    if not user_exists:
+        session.rollback()
+        raise ValueError("User to be updated does not exist")
+
+    if user_target is not None:
+        upsert_user_target(session, user.id, user_target)
+
     session.commit()
-    return updated_user
+    invalidate_cached_user(user_id=user.id)
+    invalidate_user_timezone(user.id)
+    # days of the cached meal views depend on the timezone
+    change_meals_eaten_version(user.id)
+    # the stored row, the given object may hold only a subset of the values
+    # the user loaded by the existence check is reloaded with the new target
+    session.expire_all()
+    return select_user_by_user_id(session, user.id)
+
+
+def upsert_user_target(session, user_id, user_target):
+    # users have at most one target, user_id is a unique key
+    values = get_assigned_column_values(user_target)
+    values.pop("id", None)
+    values["user_id"] = user_id
+    insert_stmt = mysql.insert(UserTarget).values(**values)
+    session.execute(insert_stmt.on_duplicate_key_update({
+        k: insert_stmt.inserted[k] for k in values if k != "user_id"
+    }))
 
 
 def activate_user(session, user_id):
     user = session.scalar(sa.select(User).where(User.id == user_id))
     user.is_activated = True
     session.commit()
+    invalidate_cached_user(user_id=user_id)
 
 
 def deactivate_user(session, user_id):
     user = session.scalar(sa.select(User).where(User.id == user_id))
     user.is_activated = False
     session.commit()
+    invalidate_cached_user(user_id=user_id)
+
+
+def set_last_birthday_congratulated(session, user_id, year):
+    session.execute(
+        sa.update(User).where(User.id == user_id).values(
+            last_birthday_congratulated=year
+        )
+    )
+    session.commit()
+    invalidate_cached_user(user_id=user_id)
 
 
 def delete_user(session, user_value):
     if isinstance(user_value, User):
+        user_id = user_value.id
         session.delete(user_value)
     else:
+        user_id = user_value
         sql = sa.delete(User).where(User.id == user_value)
         session.execute(sql)
     session.commit()
+    invalidate_cached_user(user_id=user_id)
+    invalidate_user_timezone(user_id)
 
 
 def delete_user_by_telegram_id(session, tg_id):
@@ -55,3 +110,12 @@ def delete_user_by_telegram_id(session, tg_id):
     delete_user(session, user)
     session.commit()
     return True
+
+
+add_new_user_async = common_sql.async_session_variant(add_new_user)
+update_user_async = common_sql.async_session_variant(update_user)
+activate_user_async = common_sql.async_session_variant(activate_user)
+deactivate_user_async = common_sql.async_session_variant(deactivate_user)
+set_last_birthday_congratulated_async = common_sql.async_session_variant(set_last_birthday_congratulated)
+delete_user_async = common_sql.async_session_variant(delete_user)
+delete_user_by_telegram_id_async = common_sql.async_session_variant(delete_user_by_telegram_id)
@@ -0,0 +1,54 @@
+"""Add daily nutrition totals
+
+Revision ID: 5c1e9a7d3b2f
+Revises: 0238f7423a3a
+Create Date: 2025-01-27 21:13:24.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d3b2f'
+down_revision: Union[str, None] = '0238f7423a3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_table(
+        'daily_nutrition_totals',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('user_id', mysql.INTEGER(unsigned=True), nullable=False),
+        sa.Column('local_date', mysql.DATE(), nullable=False),
+        sa.Column('weight', mysql.DECIMAL(precision=12, scale=4), nullable=False),
+        sa.Column('calories', mysql.DECIMAL(precision=12, scale=4), nullable=False),
+        sa.Column('carbs', mysql.DECIMAL(precision=12, scale=4), nullable=False),
+        sa.Column('protein', mysql.DECIMAL(precision=12, scale=4), nullable=False),
+        sa.Column('fat', mysql.DECIMAL(precision=12, scale=4), nullable=False),
+        sa.Column('meal_count', mysql.INTEGER(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'], name=op.f('fk_daily_nutrition_totals_user_id_users')
+        ),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_daily_nutrition_totals')),
+        sa.UniqueConstraint('user_id', 'local_date', name=op.f('uq_daily_nutrition_totals_user_id'))
+    )
+    # totals of the meals added before this revision
+    op.execute(
+        "INSERT INTO daily_nutrition_totals "
+        "(user_id, local_date, weight, calories, carbs, protein, fat, meal_count) "
+        "SELECT user_id, DATE(created_local_datetime), "
+        "COALESCE(SUM(weight), 0), COALESCE(SUM(calories), 0), COALESCE(SUM(carbs), 0), "
+        "COALESCE(SUM(protein), 0), COALESCE(SUM(fat), 0), COUNT(*) "
+        "FROM meals_eaten "
+        "GROUP BY user_id, DATE(created_local_datetime)"
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_table('daily_nutrition_totals')
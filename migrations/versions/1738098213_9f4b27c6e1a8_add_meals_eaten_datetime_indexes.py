@@ -0,0 +1,36 @@
+"""Add meals eaten datetime indexes
+
+Revision ID: 9f4b27c6e1a8
+Revises: 5c1e9a7d3b2f
+Create Date: 2025-01-28 21:03:33.104857
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '9f4b27c6e1a8'
+down_revision: Union[str, None] = '5c1e9a7d3b2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_index(
+        'ix_meals_eaten_user_id_created_local_datetime', 'meals_eaten',
+        ['user_id', 'created_local_datetime'], unique=False
+    )
+    op.create_index(
+        'ix_meals_eaten_user_id_created_utc_datetime', 'meals_eaten',
+        ['user_id', 'created_utc_datetime'], unique=False
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_index('ix_meals_eaten_user_id_created_utc_datetime', table_name='meals_eaten')
+    op.drop_index('ix_meals_eaten_user_id_created_local_datetime', table_name='meals_eaten')
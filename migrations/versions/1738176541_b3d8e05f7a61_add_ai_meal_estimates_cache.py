@@ -0,0 +1,46 @@
+"""Add ai meal estimates cache
+
+Revision ID: b3d8e05f7a61
+Revises: 9f4b27c6e1a8
+Create Date: 2025-01-29 18:49:01.772915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d8e05f7a61'
+down_revision: Union[str, None] = '9f4b27c6e1a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_table(
+        'ai_meal_estimates_cache',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('cache_key', mysql.CHAR(length=64), nullable=False),
+        sa.Column('created_utc_datetime', mysql.DATETIME(), nullable=False),
+        sa.Column('last_used_utc_datetime', mysql.DATETIME(), nullable=False),
+        sa.Column('hit_count', mysql.INTEGER(unsigned=True), nullable=False),
+        sa.Column('meal_data_json', mysql.TEXT(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_ai_meal_estimates_cache')),
+        sa.UniqueConstraint('cache_key', name=op.f('uq_ai_meal_estimates_cache_cache_key'))
+    )
+    op.create_index(
+        'ix_ai_meal_estimates_cache_created_utc_datetime', 'ai_meal_estimates_cache',
+        ['created_utc_datetime'], unique=False
+    )
+    op.create_index(
+        'ix_ai_meal_estimates_cache_last_used_utc_datetime', 'ai_meal_estimates_cache',
+        ['last_used_utc_datetime'], unique=False
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_table('ai_meal_estimates_cache')
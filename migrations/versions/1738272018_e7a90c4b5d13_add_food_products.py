@@ -0,0 +1,44 @@
+"""Add food products
+
+Revision ID: e7a90c4b5d13
+Revises: b3d8e05f7a61
+Create Date: 2025-01-30 21:20:18.402193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a90c4b5d13'
+down_revision: Union[str, None] = 'b3d8e05f7a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_table(
+        'food_products',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('barcode', mysql.VARCHAR(length=32), nullable=True),
+        sa.Column('name', mysql.VARCHAR(length=300), nullable=False),
+        sa.Column('brand', mysql.VARCHAR(length=200), nullable=True),
+        sa.Column('calories', mysql.DECIMAL(precision=10, scale=4), nullable=False),
+        sa.Column('carbs', mysql.DECIMAL(precision=10, scale=4), nullable=False),
+        sa.Column('protein', mysql.DECIMAL(precision=10, scale=4), nullable=False),
+        sa.Column('fat', mysql.DECIMAL(precision=10, scale=4), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_food_products')),
+        sa.UniqueConstraint('barcode', name=op.f('uq_food_products_barcode'))
+    )
+    op.create_index(
+        'ix_food_products_name_fulltext', 'food_products', ['name'], unique=False,
+        mysql_prefix='FULLTEXT', mysql_with_parser='ngram'
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_table('food_products')
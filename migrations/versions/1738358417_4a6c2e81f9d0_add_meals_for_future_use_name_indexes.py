@@ -0,0 +1,36 @@
+"""Add meals for future use name indexes
+
+Revision ID: 4a6c2e81f9d0
+Revises: e7a90c4b5d13
+Create Date: 2025-01-31 21:20:17.615820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a6c2e81f9d0'
+down_revision: Union[str, None] = 'e7a90c4b5d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_index(
+        'ix_meals_for_future_use_user_id_name_id', 'meals_for_future_use',
+        ['user_id', 'name', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_meals_for_future_use_name_fulltext', 'meals_for_future_use', ['name'], unique=False,
+        mysql_prefix='FULLTEXT', mysql_with_parser='ngram'
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_index('ix_meals_for_future_use_name_fulltext', table_name='meals_for_future_use')
+    op.drop_index('ix_meals_for_future_use_user_id_name_id', table_name='meals_for_future_use')
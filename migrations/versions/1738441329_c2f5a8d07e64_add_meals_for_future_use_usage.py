@@ -0,0 +1,57 @@
+"""Add meals for future use usage
+
+Revision ID: c2f5a8d07e64
+Revises: 4a6c2e81f9d0
+Create Date: 2025-02-01 20:22:09.281734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f5a8d07e64'
+down_revision: Union[str, None] = '4a6c2e81f9d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    # meals eaten do not reference the saved meal they were made from,
+    # so there is no usage history to backfill
+    op.create_table(
+        'meals_for_future_use_usage',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('user_id', mysql.INTEGER(unsigned=True), nullable=False),
+        sa.Column('meal_for_future_use_id', mysql.INTEGER(unsigned=True), nullable=False),
+        sa.Column('time_of_day', mysql.TINYINT(unsigned=True), nullable=False),
+        sa.Column('use_count', mysql.INTEGER(unsigned=True), nullable=False),
+        sa.Column('log_score', mysql.DOUBLE(), nullable=False),
+        sa.Column('last_used_utc_datetime', mysql.DATETIME(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.id'],
+            name=op.f('fk_meals_for_future_use_usage_user_id_users')
+        ),
+        sa.ForeignKeyConstraint(
+            ['meal_for_future_use_id'], ['meals_for_future_use.id'],
+            name=op.f('fk_meals_for_future_use_usage_meal_id'),
+            ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_meals_for_future_use_usage')),
+        sa.UniqueConstraint(
+            'meal_for_future_use_id', 'time_of_day',
+            name=op.f('uq_meals_for_future_use_usage_meal_for_future_use_id')
+        )
+    )
+    op.create_index(
+        'ix_meals_for_future_use_usage_user_id_time_of_day_log_score', 'meals_for_future_use_usage',
+        ['user_id', 'time_of_day', 'log_score'], unique=False
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_table('meals_for_future_use_usage')
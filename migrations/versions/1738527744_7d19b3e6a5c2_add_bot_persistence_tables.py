@@ -0,0 +1,49 @@
+"""Add bot persistence tables
+
+Revision ID: 7d19b3e6a5c2
+Revises: c2f5a8d07e64
+Create Date: 2025-02-02 20:22:24.907315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '7d19b3e6a5c2'
+down_revision: Union[str, None] = 'c2f5a8d07e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    print(f"running upgrade for revision {revision}")
+    op.create_table(
+        'bot_user_data',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('telegram_user_id', mysql.BIGINT(), nullable=False),
+        sa.Column('data', mysql.MEDIUMBLOB(), nullable=False),
+        sa.Column('updated_utc_datetime', mysql.DATETIME(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_bot_user_data')),
+        sa.UniqueConstraint('telegram_user_id', name=op.f('uq_bot_user_data_telegram_user_id'))
+    )
+    op.create_table(
+        'bot_conversation_states',
+        sa.Column('id', mysql.INTEGER(unsigned=True), autoincrement=True, nullable=False),
+        sa.Column('name', mysql.VARCHAR(length=100), nullable=False),
+        sa.Column('conversation_key', mysql.VARCHAR(length=200), nullable=False),
+        sa.Column('state', mysql.BLOB(), nullable=False),
+        sa.Column('updated_utc_datetime', mysql.DATETIME(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_bot_conversation_states')),
+        sa.UniqueConstraint(
+            'name', 'conversation_key', name=op.f('uq_bot_conversation_states_name')
+        )
+    )
+
+
+def downgrade() -> None:
+    print(f"running downgrade for revision {revision}")
+    op.drop_table('bot_conversation_states')
+    op.drop_table('bot_user_data')